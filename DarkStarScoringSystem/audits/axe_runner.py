@@ -2,8 +2,10 @@
 import json
 import logging
 from pathlib import Path
-from typing import Dict, Any, List
-from playwright.sync_api import Page
+from typing import Dict, Any, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +16,7 @@ class AxeRunner:
         """Initialize with artifacts directory."""
         self.artifacts_dir = artifacts_dir
     
-    def run_audit(self, page: Page, submission_id: str) -> Dict[str, Any]:
+    def run_audit(self, page: 'Page', submission_id: str) -> Dict[str, Any]:
         """
         Run axe-core audit on the page.
         Returns violation count and top violations.
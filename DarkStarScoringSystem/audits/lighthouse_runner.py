@@ -1,85 +1,401 @@
 """Lighthouse audit runner."""
+import asyncio
 import json
 import logging
+import mmap
+import os
+import re
+import shutil
+import statistics
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Category id -> metric key
+CATEGORY_METRICS = {
+    'performance': 'lighthousePerformance',
+    'accessibility': 'lighthouseAccessibility',
+    'seo': 'lighthouseSEO',
+    'best-practices': 'lighthouseBestPractices'
+}
+
+# Audit id -> metric key for its numericValue
+KEY_AUDITS = {
+    'first-contentful-paint': 'lighthouseFcpMs',
+    'largest-contentful-paint': 'lighthouseLcpMs',
+    'cumulative-layout-shift': 'lighthouseCls',
+    'total-blocking-time': 'lighthouseTbtMs',
+    'interactive': 'lighthouseTtiMs',
+    'speed-index': 'lighthouseSpeedIndexMs',
+    'total-byte-weight': 'lighthouseTotalBytes'
+}
+
+# Top-level report fields copied into the summary
+SUMMARY_FIELDS = ('lighthouseVersion', 'fetchTime', 'requestedUrl', 'finalDisplayedUrl', 'finalUrl', 'runtimeError')
+
+# Bulky screenshot and treemap audits left out unless the full report is kept
+TRIMMED_AUDITS = ('screenshot-thumbnails', 'final-screenshot', 'script-treemap-data')
+
+# Everything up to the next bracket outside a string, then that bracket.
+# Strings are consumed whole, so brackets inside them are never counted.
+_BRACKET = re.compile(rb'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*([{}\[\]])')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR_END = re.compile(rb'[,}\]\s]')
+_WHITESPACE = re.compile(rb'\s*')
+
+# (key, value_start) -> value_end, or None to skip the value
+Visitor = Callable[[str, int], Optional[int]]
+
+
+def _skip_ws(buf, pos: int) -> int:
+    return _WHITESPACE.match(buf, pos).end()
+
+
+def _value_end(buf, pos: int) -> int:
+    """Index just past the JSON value starting at pos, without decoding it."""
+    first = buf[pos]
+    if first == ord('"'):
+        match = _STRING.match(buf, pos)
+        if match is None:
+            raise ValueError("Unterminated string in Lighthouse report")
+        return match.end()
+    if first not in b'{[':
+        match = _SCALAR_END.search(buf, pos)
+        return match.start() if match else len(buf)
+    depth = 0
+    for match in _BRACKET.finditer(buf, pos):
+        if buf[match.end() - 1] in b'{[':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    raise ValueError("Unterminated value in Lighthouse report")
+
+
+def _decode(buf, start: int, end: int) -> Any:
+    return json.loads(bytes(buf[start:end]))
+
+
+def scan_object(buf, pos: int, visit: Visitor) -> int:
+    """
+    Call visit(key, value_start) for each member of the JSON object at pos
+    and return the index just past the object. A visitor that reads a
+    value returns where it ended; members it skips are only bracket-matched,
+    so base64 screenshots and treemaps are never decoded.
+    """
+    pos = _skip_ws(buf, pos)
+    if buf[pos] != ord('{'):
+        raise ValueError("Expected a JSON object in Lighthouse report")
+    pos = _skip_ws(buf, pos + 1)
+    if buf[pos] == ord('}'):
+        return pos + 1
+    while True:
+        key_end = _value_end(buf, pos)
+        key = _decode(buf, pos, key_end)
+        start = _skip_ws(buf, _skip_ws(buf, key_end) + 1)  # past ':'
+        end = visit(key, start)
+        pos = _skip_ws(buf, end if end is not None else _value_end(buf, start))
+        if buf[pos] == ord('}'):
+            return pos + 1
+        pos = _skip_ws(buf, pos + 1)  # past ','
+
+
+def read_summary(path: Path) -> Dict[str, Any]:
+    """
+    Category scores and key audits from a Lighthouse JSON report.
+    The file is memory-mapped and scanned; only category scores, a few
+    top-level fields and the KEY_AUDITS entries are decoded. Raises
+    ValueError for a malformed or truncated report.
+    """
+    summary: Dict[str, Any] = {'categories': {}, 'audits': {}}
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        
+        def category(name: str, start: int) -> int:
+            def field(key: str, field_start: int) -> Optional[int]:
+                if key != 'score':
+                    return None
+                end = _value_end(buf, field_start)
+                summary['categories'][name] = _decode(buf, field_start, end)
+                return end
+            return scan_object(buf, start, field)
+        
+        def audit(audit_id: str, start: int) -> Optional[int]:
+            if audit_id not in KEY_AUDITS:
+                return None
+            end = _value_end(buf, start)
+            result = _decode(buf, start, end)
+            summary['audits'][audit_id] = {
+                'score': result.get('score'),
+                'numericValue': result.get('numericValue'),
+                'displayValue': result.get('displayValue')
+            }
+            return end
+        
+        def top_level(key: str, start: int) -> Optional[int]:
+            if key == 'categories':
+                return scan_object(buf, start, category)
+            if key == 'audits':
+                return scan_object(buf, start, audit)
+            if key in SUMMARY_FIELDS:
+                end = _value_end(buf, start)
+                summary[key] = _decode(buf, start, end)
+                return end
+            return None
+        
+        try:
+            scan_object(buf, 0, top_level)
+        except IndexError:
+            raise ValueError("Truncated Lighthouse report") from None
+    return summary
+
+
+def cpu_groups(runs: int, cores_per_run: int) -> List[Optional[List[int]]]:
+    """
+    Disjoint CPU sets for parallel runs, one per run that fits at once.
+    Returns [None] (a single unpinned slot) when affinity isn't available.
+    """
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return [None]
+    slots = max(1, min(runs, len(cpus) // max(1, cores_per_run)))
+    if slots == 1:
+        return [cpus]
+    return [cpus[i * cores_per_run:(i + 1) * cores_per_run] for i in range(slots)]
+
+
+def category_scores(summary: Dict[str, Any]) -> Dict[str, int]:
+    """0-100 score per category metric key, 0 for missing or failed categories."""
+    categories = summary['categories']
+    return {
+        metric: int((categories.get(category) or 0) * 100)
+        for category, metric in CATEGORY_METRICS.items()
+    }
+
+
+def summary_metrics(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Category scores and key audit values of one run."""
+    metrics: Dict[str, Any] = category_scores(summary)
+    for audit_id, metric in KEY_AUDITS.items():
+        value = summary['audits'].get(audit_id, {}).get('numericValue')
+        if value is not None:
+            metrics[metric] = round(value, 3) if audit_id == 'cumulative-layout-shift' else int(value)
+    return metrics
+
+
 class LighthouseRunner:
     """Run Lighthouse audits and parse results."""
     
-    def __init__(self, artifacts_dir: Path):
-        """Initialize with artifacts directory."""
-        self.artifacts_dir = artifacts_dir
-    
-    def run_audit(self, url: str, submission_id: str) -> Dict[str, Any]:
+    def __init__(
+        self,
+        artifacts_dir: Path,
+        keep_full_report: bool = True,
+        runs: int = 1,
+        cores_per_run: int = 2,
+        pin_cpus: bool = True
+    ):
         """
-        Run Lighthouse audit and return metrics.
-        Returns dict with performance, accessibility, SEO, best practices scores.
+        Initialize with artifacts directory. Without keep_full_report,
+        screenshot and treemap audits are skipped and the report is deleted once
+        its summary has been written.
+        With runs > 1 each URL is audited that many times and the median
+        per metric is reported. Runs go in parallel, each pinned with
+        taskset to its own cores_per_run CPUs, as many at once as the
+        CPUs allow.
         """
-        output_path = self.artifacts_dir / f"{submission_id}_lighthouse.json"
-        
+        self.artifacts_dir = artifacts_dir
+        self.keep_full_report = keep_full_report
+        self.runs = max(1, runs)
+        self.cores_per_run = cores_per_run
+        self.taskset = shutil.which('taskset') if pin_cpus and self.runs > 1 else None
+        if pin_cpus and self.runs > 1 and not self.taskset:
+            logger.warning("taskset not found; parallel Lighthouse runs will not be pinned to CPUs")
+    
+    TIMEOUT_SECONDS = 120
+    
+    def _build_command(self, url: str, output_path: Path, cpus: Optional[List[int]] = None) -> List[str]:
+        """Lighthouse CLI invocation for url, pinned to cpus when given."""
+        cmd = [
+            'lighthouse',
+            url,
+            '--output=json',
+            f'--output-path={output_path}',
+            '--only-categories=performance,accessibility,seo,best-practices',
+            '--chrome-flags=--headless --no-sandbox --disable-gpu',
+            '--quiet'
+        ]
+        if not self.keep_full_report:
+            cmd += ['--disable-full-page-screenshot', f"--skip-audits={','.join(TRIMMED_AUDITS)}"]
+        if self.taskset and cpus:
+            # Chrome is started by Lighthouse and inherits the affinity
+            cmd = [self.taskset, '-c', ','.join(map(str, cpus))] + cmd
+        return cmd
+    
+    def _plan(self, submission_id: str) -> List[List[Tuple[Path, Optional[List[int]]]]]:
+        """Waves of (output_path, cpus); runs in a wave execute together."""
+        if self.runs == 1:
+            return [[(self.artifacts_dir / f"{submission_id}_lighthouse.json", None)]]
+        groups = cpu_groups(self.runs, self.cores_per_run)
+        paths = [self.artifacts_dir / f"{submission_id}_lighthouse_{run}.json" for run in range(self.runs)]
+        return [
+            [(path, groups[i % len(groups)]) for i, path in enumerate(paths[start:start + len(groups)])]
+            for start in range(0, len(paths), len(groups))
+        ]
+    
+    def _run_once(self, url: str, output_path: Path, cpus: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+        """One Lighthouse run; its summary, or None if it failed."""
         try:
-            # Run Lighthouse via CLI
-            cmd = [
-                'lighthouse',
-                url,
-                '--output=json',
-                f'--output-path={output_path}',
-                '--only-categories=performance,accessibility,seo,best-practices',
-                '--chrome-flags=--headless --no-sandbox --disable-gpu',
-                '--quiet'
-            ]
-            
-            logger.info(f"Running Lighthouse for {url}")
             result = subprocess.run(
-                cmd,
+                self._build_command(url, output_path, cpus),
                 capture_output=True,
                 text=True,
-                timeout=120
+                timeout=self.TIMEOUT_SECONDS
             )
-            
             if result.returncode != 0:
                 logger.warning(f"Lighthouse returned non-zero exit code: {result.stderr}")
-                # Return default scores if Lighthouse fails
-                return self._default_metrics()
-            
-            # Parse results
-            with open(output_path, 'r', encoding='utf-8') as f:
-                report = json.load(f)
-            
-            categories = report.get('categories', {})
-            
-            metrics = {
-                'lighthousePerformance': int(categories.get('performance', {}).get('score', 0) * 100),
-                'lighthouseAccessibility': int(categories.get('accessibility', {}).get('score', 0) * 100),
-                'lighthouseSEO': int(categories.get('seo', {}).get('score', 0) * 100),
-                'lighthouseBestPractices': int(categories.get('best-practices', {}).get('score', 0) * 100),
-                'lighthouseReportPath': str(output_path)
-            }
-            
-            logger.info(f"Lighthouse completed: {metrics}")
-            return metrics
-        
+                return None
+            return read_summary(output_path)
         except subprocess.TimeoutExpired:
             logger.error("Lighthouse audit timed out")
-            return self._default_metrics()
         except FileNotFoundError:
             logger.warning("Lighthouse CLI not found. Install with: npm install -g lighthouse")
+        except Exception as e:
+            logger.error(f"Error running Lighthouse: {e}")
+        return None
+    
+    async def _run_once_async(self, url: str, output_path: Path, cpus: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+        """Async counterpart of _run_once."""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._build_command(url, output_path, cpus),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=self.TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.error("Lighthouse audit timed out")
+                return None
+            
+            if process.returncode != 0:
+                logger.warning(
+                    f"Lighthouse returned non-zero exit code: {stderr.decode('utf-8', 'replace')}"
+                )
+                return None
+            return await asyncio.to_thread(read_summary, output_path)
+        except FileNotFoundError:
+            logger.warning("Lighthouse CLI not found. Install with: npm install -g lighthouse")
+        except Exception as e:
+            logger.error(f"Error running Lighthouse: {e}")
+        return None
+    
+    def _finish(self, submission_id: str, results: List[Tuple[Path, Optional[Dict[str, Any]]]]) -> Dict[str, Any]:
+        """
+        Combine run summaries into metrics: the median of each metric, and
+        the spread of category scores when several runs succeeded. Writes
+        the summary artifact and keeps the full report of the run closest
+        to the median performance score, if full reports are kept.
+        """
+        done = [(path, summary) for path, summary in results if summary is not None]
+        if not done:
+            for path, _ in results:
+                path.unlink(missing_ok=True)
             return self._default_metrics()
+        
+        per_run = [summary_metrics(summary) for _, summary in done]
+        metrics: Dict[str, Any] = {}
+        for key in list(CATEGORY_METRICS.values()) + list(KEY_AUDITS.values()):
+            values = [run[key] for run in per_run if key in run]
+            if values:
+                middle = statistics.median(values)
+                metrics[key] = round(middle, 3) if key == 'lighthouseCls' else int(round(middle))
+        
+        performance = metrics['lighthousePerformance']
+        chosen = min(range(len(done)), key=lambda i: abs(per_run[i]['lighthousePerformance'] - performance))
+        summary = dict(done[chosen][1])
+        if len(done) > 1:
+            metrics['lighthouseRuns'] = len(done)
+            metrics['lighthouseRunStdev'] = {
+                key: round(statistics.stdev(run[key] for run in per_run), 2)
+                for key in CATEGORY_METRICS.values()
+            }
+            summary['runs'] = [category_scores(run_summary) for _, run_summary in done]
+        
+        summary_path = self.artifacts_dir / f"{submission_id}_lighthouse_summary.json"
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        metrics['lighthouseSummaryPath'] = str(summary_path)
+        
+        report_path = self.artifacts_dir / f"{submission_id}_lighthouse.json"
+        for i, (path, _) in enumerate(done):
+            if self.keep_full_report and i == chosen:
+                if path != report_path:
+                    path.replace(report_path)
+            else:
+                path.unlink(missing_ok=True)
+        for path, summary in results:
+            if summary is None:
+                path.unlink(missing_ok=True)
+        metrics['lighthouseReportPath'] = str(report_path) if self.keep_full_report else None
+        return metrics
+    
+    def run_audit(self, url: str, submission_id: str) -> Dict[str, Any]:
+        """
+        Run Lighthouse audit and return metrics.
+        Returns dict with performance, accessibility, SEO, best practices scores.
+        """
+        logger.info(f"Running Lighthouse for {url}" + (f" ({self.runs} runs)" if self.runs > 1 else ""))
+        results = []
+        for wave in self._plan(submission_id):
+            if len(wave) == 1:
+                path, cpus = wave[0]
+                results.append((path, self._run_once(url, path, cpus)))
+                continue
+            with ThreadPoolExecutor(max_workers=len(wave)) as pool:
+                summaries = pool.map(lambda run: self._run_once(url, *run), wave)
+                results += [(path, summary) for (path, _), summary in zip(wave, summaries)]
+        
+        try:
+            metrics = self._finish(submission_id, results)
+        except Exception as e:
+            logger.error(f"Error running Lighthouse: {e}")
+            return self._default_metrics()
+        logger.info(f"Lighthouse completed: {metrics}")
+        return metrics
+    
+    async def run_audit_async(self, url: str, submission_id: str) -> Dict[str, Any]:
+        """
+        Run Lighthouse as asyncio subprocesses.
+        Same result and failure handling as run_audit.
+        """
+        logger.info(f"Running Lighthouse for {url}" + (f" ({self.runs} runs)" if self.runs > 1 else ""))
+        results = []
+        for wave in self._plan(submission_id):
+            summaries = await asyncio.gather(*(self._run_once_async(url, path, cpus) for path, cpus in wave))
+            results += [(path, summary) for (path, _), summary in zip(wave, summaries)]
+        
+        try:
+            metrics = await asyncio.to_thread(self._finish, submission_id, results)
         except Exception as e:
             logger.error(f"Error running Lighthouse: {e}")
             return self._default_metrics()
+        logger.info(f"Lighthouse completed: {metrics}")
+        return metrics
     
-    def _default_metrics(self) -> Dict[str, int]:
+    def _default_metrics(self) -> Dict[str, Any]:
         """Return default metrics when Lighthouse fails."""
         return {
             'lighthousePerformance': 0,
             'lighthouseAccessibility': 0,
             'lighthouseSEO': 0,
             'lighthouseBestPractices': 0,
-            'lighthouseReportPath': None
+            'lighthouseReportPath': None,
+            'lighthouseSummaryPath': None
         }
 
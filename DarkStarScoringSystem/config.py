@@ -17,28 +17,152 @@ class Config:
     # Ollama
     OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
     OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1:8b')
+    # Comma-separated list of hosts to balance across; defaults to OLLAMA_HOST
+    OLLAMA_HOSTS = [h.strip() for h in os.getenv('OLLAMA_HOSTS', OLLAMA_HOST).split(',') if h.strip()]
+    OLLAMA_REQUEST_TIMEOUT_SECONDS = int(os.getenv('OLLAMA_REQUEST_TIMEOUT_SECONDS', '120'))
+    OLLAMA_HEALTH_TIMEOUT_SECONDS = int(os.getenv('OLLAMA_HEALTH_TIMEOUT_SECONDS', '3'))
+    OLLAMA_CIRCUIT_FAILURES = int(os.getenv('OLLAMA_CIRCUIT_FAILURES', '3'))
+    OLLAMA_CIRCUIT_RESET_SECONDS = int(os.getenv('OLLAMA_CIRCUIT_RESET_SECONDS', '60'))
+    # Ensemble judging: comma-separated model[@seed] list, empty to disable
+    OLLAMA_ENSEMBLE = os.getenv('OLLAMA_ENSEMBLE', '')
+    OLLAMA_ENSEMBLE_AGGREGATION = os.getenv('OLLAMA_ENSEMBLE_AGGREGATION', 'median')  # median|trimmed_mean
+    OLLAMA_ENSEMBLE_QUORUM = int(os.getenv('OLLAMA_ENSEMBLE_QUORUM', '0'))  # 0 = majority
+    OLLAMA_ENSEMBLE_TOLERANCE = int(os.getenv('OLLAMA_ENSEMBLE_TOLERANCE', '2'))
+    # Longest wait for ensemble members; default covers one JSON-fix retry
+    OLLAMA_ENSEMBLE_TIMEOUT_SECONDS = int(os.getenv('OLLAMA_ENSEMBLE_TIMEOUT_SECONDS', str(2 * OLLAMA_REQUEST_TIMEOUT_SECONDS)))
+    # Estimated prompt tokens (calibrated per model from Ollama's
+    # prompt_eval_count); page details are trimmed by priority to fit
+    PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '1700'))
     
     # Worker
     POLL_INTERVAL_SECONDS = int(os.getenv('POLL_INTERVAL_SECONDS', '600'))
     JUDGE_VERSION = os.getenv('JUDGE_VERSION', 'v1.0')
     MAX_JOB_MINUTES = int(os.getenv('MAX_JOB_MINUTES', '7'))
     MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', '1'))
+    WORKER_MODE = os.getenv('WORKER_MODE', 'sync')  # sync|async
+    WORKER_ID = os.getenv('WORKER_ID', '')  # defaults to <hostname>, <hostname>-<pid> in cluster mode
+    
+    # Multi-node operation
+    CLUSTER_ENABLED = os.getenv('CLUSTER_ENABLED', 'false').lower() == 'true'
+    HEARTBEAT_INTERVAL_SECONDS = int(os.getenv('HEARTBEAT_INTERVAL_SECONDS', '30'))
+    HEARTBEAT_TTL_SECONDS = int(os.getenv('HEARTBEAT_TTL_SECONDS', '90'))
+    SHARD_STEAL_AFTER_SECONDS = int(os.getenv('SHARD_STEAL_AFTER_SECONDS', '900'))
+    # Pending entries fetched per free slot before filtering to this node's shard
+    SHARD_FETCH_FACTOR = int(os.getenv('SHARD_FETCH_FACTOR', '5'))
+    
+    # Queue scheduling: priority classes and fair sharing
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_CLASS_WEIGHTS = os.getenv('SCHEDULER_CLASS_WEIGHTS', 'new:3,resubmission:2,rejudge:2')
+    SCHEDULER_MAX_WAIT_SECONDS = int(os.getenv('SCHEDULER_MAX_WAIT_SECONDS', '1800'))
+    SCHEDULER_HALF_LIFE_SECONDS = int(os.getenv('SCHEDULER_HALF_LIFE_SECONDS', '3600'))
+    # Pending entries read from each end of the queue per poll
+    SCHEDULER_WINDOW = int(os.getenv('SCHEDULER_WINDOW', '50'))
+    QUEUE_REPORT_INTERVAL_SECONDS = int(os.getenv('QUEUE_REPORT_INTERVAL_SECONDS', '900'))
+    
+    # Async mode: jobs in flight and per-resource limits
+    ASYNC_MAX_JOBS = int(os.getenv('ASYNC_MAX_JOBS', '4'))
+    BROWSER_CONCURRENCY = int(os.getenv('BROWSER_CONCURRENCY', '2'))
+    LIGHTHOUSE_CONCURRENCY = int(os.getenv('LIGHTHOUSE_CONCURRENCY', '1'))
+    LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '2'))
+    UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '4'))
+    PREFLIGHT_CONCURRENCY = int(os.getenv('PREFLIGHT_CONCURRENCY', '8'))
+    
+    # Resource governor: adapt the limits above to memory, load and heat
+    GOVERNOR_ENABLED = os.getenv('GOVERNOR_ENABLED', 'true').lower() == 'true'
+    GOVERNOR_INTERVAL_SECONDS = int(os.getenv('GOVERNOR_INTERVAL_SECONDS', '5'))
+    GOVERNOR_MEM_LOW_MB = int(os.getenv('GOVERNOR_MEM_LOW_MB', '800'))
+    GOVERNOR_MEM_CRITICAL_MB = int(os.getenv('GOVERNOR_MEM_CRITICAL_MB', '400'))
+    GOVERNOR_TEMP_HIGH_C = float(os.getenv('GOVERNOR_TEMP_HIGH_C', '75'))
+    GOVERNOR_TEMP_CRITICAL_C = float(os.getenv('GOVERNOR_TEMP_CRITICAL_C', '85'))
+    GOVERNOR_LOAD_HIGH = float(os.getenv('GOVERNOR_LOAD_HIGH', '1.5'))  # 1-min load per CPU
+    GOVERNOR_RECOVER_SECONDS = int(os.getenv('GOVERNOR_RECOVER_SECONDS', '60'))
+    GOVERNOR_LLM_RESIDENT_MB = int(os.getenv('GOVERNOR_LLM_RESIDENT_MB', '500'))
+    GOVERNOR_MAX_DEFER_SECONDS = int(os.getenv('GOVERNOR_MAX_DEFER_SECONDS', '300'))
     
     # Timeouts
     NAVIGATION_TIMEOUT_MS = int(os.getenv('NAVIGATION_TIMEOUT_MS', '60000'))
     TOTAL_JOB_TIMEOUT_SECONDS = int(os.getenv('TOTAL_JOB_TIMEOUT_SECONDS', '420'))
     
+    # Lighthouse: keep and upload the full JSON report next to its summary.
+    # Off, screenshots are skipped in the report and it is deleted once summarized.
+    LIGHTHOUSE_FULL_REPORT = os.getenv('LIGHTHOUSE_FULL_REPORT', 'false').lower() == 'true'
+    # Runs per URL (median reported); parallel runs are pinned to their own CPUs
+    LIGHTHOUSE_RUNS = int(os.getenv('LIGHTHOUSE_RUNS', '1'))
+    LIGHTHOUSE_CORES_PER_RUN = int(os.getenv('LIGHTHOUSE_CORES_PER_RUN', '2'))
+    LIGHTHOUSE_PIN_CPUS = os.getenv('LIGHTHOUSE_PIN_CPUS', 'true').lower() == 'true'
+    
+    # Pre-flight URL checks
+    PREFLIGHT_ENABLED = os.getenv('PREFLIGHT_ENABLED', 'true').lower() == 'true'
+    PREFLIGHT_TIMEOUT_SECONDS = int(os.getenv('PREFLIGHT_TIMEOUT_SECONDS', '5'))
+    PREFLIGHT_MAX_REDIRECTS = int(os.getenv('PREFLIGHT_MAX_REDIRECTS', '5'))
+    PREFLIGHT_DNS_CACHE_SECONDS = int(os.getenv('PREFLIGHT_DNS_CACHE_SECONDS', '300'))
+    
+    # Duplicate entries: reuse capture/audits for the same canonical URL
+    DEDUPE_ENABLED = os.getenv('DEDUPE_ENABLED', 'true').lower() == 'true'
+    DEDUPE_WINDOW_SECONDS = int(os.getenv('DEDUPE_WINDOW_SECONDS', '3600'))
+    
     # Paths
     BASE_DIR = Path(__file__).parent
     ARTIFACTS_DIR = BASE_DIR / 'artifacts'
-    ARTIFACTS_DIR.mkdir(exist_ok=True)
     
+    # Near-duplicate / template detection
+    SIMILARITY_ENABLED = os.getenv('SIMILARITY_ENABLED', 'true').lower() == 'true'
+    SIMILARITY_INDEX_PATH = Path(os.getenv('SIMILARITY_INDEX_PATH', str(ARTIFACTS_DIR / 'similarity_index.jsonl')))
+    SIMILARITY_MAX_PHASH_DISTANCE = int(os.getenv('SIMILARITY_MAX_PHASH_DISTANCE', '8'))
+    SIMILARITY_MIN_TEXT = float(os.getenv('SIMILARITY_MIN_TEXT', '0.7'))
+    SIMILARITY_TEMPLATE_THRESHOLD = float(os.getenv('SIMILARITY_TEMPLATE_THRESHOLD', '0.9'))
+    # Reuse the judgment of an identical entry in the same category instead of calling Ollama
+    SIMILARITY_REUSE_EXACT = os.getenv('SIMILARITY_REUSE_EXACT', 'false').lower() == 'true'
+    
+    # Checkpoints: finished stages are kept so a failed job resumes where it stopped
+    CHECKPOINT_ENABLED = os.getenv('CHECKPOINT_ENABLED', 'true').lower() == 'true'
+    CHECKPOINT_DIR = Path(os.getenv('CHECKPOINT_DIR', str(ARTIFACTS_DIR / 'checkpoints')))
+    CHECKPOINT_TTL_HOURS = int(os.getenv('CHECKPOINT_TTL_HOURS', '72'))
+    # Per stage <stage>:<max attempts>:<base backoff seconds>; the backoff doubles per attempt
+    RETRY_POLICY = os.getenv('RETRY_POLICY', 'preflight:3:60,capture:3:60,lighthouse:3:60,axe:2:30,judge:4:30,upload:5:15,write:5:15')
+    RETRY_MAX_BACKOFF_SECONDS = int(os.getenv('RETRY_MAX_BACKOFF_SECONDS', '1800'))
+    
+    # Re-audit of scored entries: conditional GET + DOM fingerprint, and a
+    # rejudge only when the page changed materially
+    REAUDIT_INTERVAL_HOURS = float(os.getenv('REAUDIT_INTERVAL_HOURS', '24'))
+    # Checks are spread over this much of each interval by entry id
+    REAUDIT_SPREAD_HOURS = float(os.getenv('REAUDIT_SPREAD_HOURS', '24'))
+    REAUDIT_POLL_SECONDS = int(os.getenv('REAUDIT_POLL_SECONDS', '300'))
+    REAUDIT_CONCURRENCY = int(os.getenv('REAUDIT_CONCURRENCY', '8'))
+    REAUDIT_BATCH_SIZE = int(os.getenv('REAUDIT_BATCH_SIZE', '200'))
+    REAUDIT_TIMEOUT_SECONDS = int(os.getenv('REAUDIT_TIMEOUT_SECONDS', '10'))
+    REAUDIT_MAX_BYTES = int(os.getenv('REAUDIT_MAX_BYTES', str(2 * 1024 * 1024)))
+    # Below either similarity (0..1) the change counts as material
+    REAUDIT_MIN_TEXT_SIMILARITY = float(os.getenv('REAUDIT_MIN_TEXT_SIMILARITY', '0.85'))
+    REAUDIT_MIN_STRUCTURE_SIMILARITY = float(os.getenv('REAUDIT_MIN_STRUCTURE_SIMILARITY', '0.8'))
+
+    # Per-job profiling. A job is profiled when PROFILE_ENABLED is set, when
+    # it wins the PROFILE_SAMPLE_RATE draw (0..1), after the worker receives
+    # SIGUSR1, or when its entry has `profile: true` (or a mode name)
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+    # sample (collapsed stacks, all job threads) or cprofile (pstats, job thread only)
+    PROFILE_MODE = os.getenv('PROFILE_MODE', 'sample')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+    # Also trace allocations with tracemalloc (slows the job noticeably)
+    PROFILE_MEMORY = os.getenv('PROFILE_MEMORY', 'false').lower() == 'true'
+    PROFILE_MEMORY_FRAMES = int(os.getenv('PROFILE_MEMORY_FRAMES', '5'))
+
     # Firestore Collections
     SUBMISSIONS_COLLECTION = 'entries'
+    WORKERS_COLLECTION = os.getenv('WORKERS_COLLECTION', 'workers')
+    
+    @classmethod
+    def ensure_dirs(cls):
+        """Create working directories. Called by commands that write artifacts."""
+        cls.ARTIFACTS_DIR.mkdir(exist_ok=True)
     
     @classmethod
     def validate(cls):
         """Validate required configuration."""
         if not Path(cls.FIREBASE_CREDENTIALS_JSON).exists():
             raise FileNotFoundError(f"Firebase credentials not found: {cls.FIREBASE_CREDENTIALS_JSON}")
+        from judge_worker.profiling import PROFILE_MODES
+        if cls.PROFILE_MODE not in PROFILE_MODES:
+            raise ValueError(f"PROFILE_MODE must be one of {', '.join(PROFILE_MODES)}, not '{cls.PROFILE_MODE}'")
 
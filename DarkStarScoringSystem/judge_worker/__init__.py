@@ -1,2 +1,9 @@
 """Judge worker package."""
+import sys
+from pathlib import Path
 
+# Make the top-level `config` and `audits` modules importable however the
+# worker is launched. Done once here instead of in every module.
+_ROOT = str(Path(__file__).parent.parent)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
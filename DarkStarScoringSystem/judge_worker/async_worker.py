@@ -0,0 +1,327 @@
+"""Asyncio execution mode for the judge worker."""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from config import Config
+from judge_worker.checkpoint import JobCheckpoint
+from judge_worker.dedupe import canonicalize_url, url_error
+from judge_worker.main import JudgeWorker
+from judge_worker.scheduler import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncJudgeWorker(JudgeWorker):
+    """
+    Worker that keeps several submissions in flight on one event loop.
+
+    Capture (playwright.async_api on one shared browser), the Lighthouse
+    subprocess, streamed Ollama calls and uploads are coroutines. Each
+    resource has its own semaphore so, for example, many jobs can wait on
+    the LLM while only BROWSER_CONCURRENCY pages are open. Blocking
+    Firestore and Storage calls run in worker threads.
+    """
+
+    def __init__(self):
+        """Initialize worker; semaphores are created inside the event loop."""
+        super().__init__()
+        self.capture = None
+        self.lighthouse = None
+        self.limits = {}
+
+    def _create_limits(self):
+        if self.governor:
+            # Jobs and the memory-heavy stages follow the governor's limits
+            self.limits = {
+                stage: self.governor.limiter(stage)
+                for stage in ('jobs', 'browser', 'lighthouse', 'llm')
+            }
+            self.limits['upload'] = asyncio.Semaphore(Config.UPLOAD_CONCURRENCY)
+            self.limits['http'] = asyncio.Semaphore(Config.PREFLIGHT_CONCURRENCY)
+            return
+        self.limits = {
+            'jobs': asyncio.Semaphore(Config.ASYNC_MAX_JOBS),
+            'browser': asyncio.Semaphore(Config.BROWSER_CONCURRENCY),
+            'lighthouse': asyncio.Semaphore(Config.LIGHTHOUSE_CONCURRENCY),
+            'llm': asyncio.Semaphore(Config.LLM_CONCURRENCY),
+            'upload': asyncio.Semaphore(Config.UPLOAD_CONCURRENCY),
+            'http': asyncio.Semaphore(Config.PREFLIGHT_CONCURRENCY)
+        }
+
+    async def process_submission_async(self, submission: dict) -> bool:
+        """
+        Process a single submission through the full pipeline and settle
+        its scheduler charge however it ends.
+        Returns True if successful, False otherwise.
+        """
+        timer = StageTimer()
+        success = False
+        try:
+            success = await self._run_pipeline_async(submission, timer)
+            return success
+        finally:
+            self.scheduler.finished(submission, timer.ms, completed=success)
+
+    async def _run_pipeline_async(self, submission: dict, timer: StageTimer) -> bool:
+        """Async counterpart of _run_pipeline."""
+        from judge_worker.ollama_pool import NoHealthyBackendError
+        from judge_worker.preflight import PreflightError
+
+        submission_id = submission['id']
+        url = submission.get('url')
+        category = submission.get('category', 'Unknown')
+
+        if not url:
+            logger.error(f"Submission {submission_id} has no URL")
+            await asyncio.to_thread(self._write_error, submission_id, "No URL provided", "validation")
+            return False
+        if url_error(url):
+            await asyncio.to_thread(self._write_invalid_url, submission_id, url)
+            return False
+
+        logger.info(f"Processing submission {submission_id}: {url}")
+        checkpoint = await asyncio.to_thread(self._checkpoint, submission)
+
+        try:
+            # Step 0: Cheap reachability check before any browser is started
+            preflight = None
+            if Config.PREFLIGHT_ENABLED:
+                with checkpoint.running('preflight'):
+                    async with self.limits['http']:
+                        with timer.stage('preflight'):
+                            preflight = await asyncio.to_thread(self.preflight.check, url)
+                    if preflight['retryable']:
+                        raise PreflightError(preflight['error'], preflight['reason'], retryable=True)
+                if not preflight['ok']:
+                    await asyncio.to_thread(self._write_preflight_error, submission_id, preflight)
+                    await asyncio.to_thread(checkpoint.clear)
+                    return False
+                url = preflight['finalUrl']
+
+            # Steps 1-3: Capture and objective audits, shared between entries
+            canonical_url = canonicalize_url(submission.get('url'))
+            with timer.stage('audits'):
+                if Config.DEDUPE_ENABLED:
+                    site, shared = await self.shared_audits.get_or_compute_async(
+                        canonical_url,
+                        lambda: self._run_site_audits_async(url, submission, checkpoint),
+                        cacheable=self._site_audits_ok
+                    )
+                else:
+                    site, shared = await self._run_site_audits_async(url, submission, checkpoint), False
+            if shared:
+                logger.info(
+                    f"Reusing capture and audits from {site['submissionId']} "
+                    f"for {submission_id} ({canonical_url})"
+                )
+
+            # Step 4: Get subjective scores from Ollama, unless the entry is
+            # an exact copy of one already judged in the same category
+            similar = await asyncio.to_thread(self._find_similar, site, submission)
+            ollama_result = checkpoint.get('judge') or similar['judgment']
+            if not ollama_result:
+                with checkpoint.running('judge'):
+                    async with self.limits['llm']:
+                        with timer.stage('judge'):
+                            ollama_result = await self.ollama.judge_async(**self._judge_inputs(site, url, category))
+                    if not ollama_result:
+                        raise Exception("Ollama judgment failed")
+            if not checkpoint.get('judge'):
+                await asyncio.to_thread(checkpoint.save, 'judge', ollama_result)
+
+            # Step 5: Upload artifacts (once per site)
+            artifacts = checkpoint.get('upload')
+            if artifacts is None:
+                with checkpoint.running('upload'):
+                    async with self.limits['upload']:
+                        with timer.stage('upload'):
+                            artifacts = await asyncio.to_thread(self._upload_artifacts, site)
+                if site['artifacts'] is not None:
+                    await asyncio.to_thread(checkpoint.save, 'upload', artifacts)
+
+            # Steps 6-8: Combine scores and write results
+            with checkpoint.running('write'):
+                await asyncio.to_thread(
+                    self._write_success,
+                    submission, site, shared, canonical_url, preflight, ollama_result, artifacts, timer.ms, similar
+                )
+            await asyncio.to_thread(checkpoint.clear)
+            return True
+
+        except NoHealthyBackendError as e:
+            await asyncio.to_thread(self._requeue, submission_id, e)
+            return False
+
+        except PreflightError as e:
+            # Timeouts, resolver hiccups and 429/5xx: try again later
+            logger.warning(f"Preflight for {submission_id} failed, retrying later: {e}")
+            await asyncio.to_thread(self._retry_or_fail, submission_id, checkpoint, e, {'reason': e.reason})
+            return False
+
+        except Exception as e:
+            logger.error(f"Error processing submission {submission_id}: {e}", exc_info=True)
+            await asyncio.to_thread(self._retry_or_fail, submission_id, checkpoint, e)
+            return False
+
+    async def _run_site_audits_async(self, url: str, submission: dict, checkpoint: JobCheckpoint) -> dict:
+        """Async counterpart of _run_site_audits; capture and Lighthouse overlap."""
+        submission_id = submission['id']
+
+        async def capture():
+            evidence = self._resumed_capture(checkpoint)
+            if evidence is not None:
+                return evidence
+            with checkpoint.running('capture'):
+                async with self.limits['browser']:
+                    evidence = await self.capture.capture(url, submission_id)
+                evidence['visual_features'] = await asyncio.to_thread(self._analyze_visuals, evidence)
+            await asyncio.to_thread(checkpoint.save, 'capture', evidence)
+            return evidence
+
+        async def lighthouse():
+            metrics = self._resumed_lighthouse(checkpoint)
+            if metrics is not None:
+                return metrics
+            with checkpoint.running('lighthouse'):
+                async with self.limits['lighthouse']:
+                    metrics = await self.lighthouse.run_audit_async(url, submission_id)
+            await asyncio.to_thread(self._save_lighthouse, checkpoint, metrics)
+            return metrics
+
+        # Steps 1-2: Capture evidence and run Lighthouse concurrently
+        evidence, lighthouse_metrics = await asyncio.gather(capture(), lighthouse())
+
+        # Step 3: Run axe-core audit
+        axe_summary = checkpoint.get('axe')
+        if axe_summary is None:
+            with checkpoint.running('axe'):
+                axe_summary = self._run_axe(evidence)
+            await asyncio.to_thread(checkpoint.save, 'axe', axe_summary)
+
+        bundle_path = await asyncio.to_thread(
+            self._write_bundle, submission, evidence, lighthouse_metrics, axe_summary
+        )
+
+        return {
+            'submissionId': submission_id,
+            'url': url,
+            'evidence': evidence,
+            'lighthouse_metrics': lighthouse_metrics,
+            'axe_summary': axe_summary,
+            'bundle_path': bundle_path,
+            'artifacts': None
+        }
+
+    async def _run_job(self, submission: dict):
+        """Run one claimed submission and release its job slot."""
+        try:
+            start_time = time.time()
+            success = await self.process_submission_async(submission)
+            elapsed = time.time() - start_time
+            logger.info(f"Submission {submission['id']} processed in {elapsed:.1f}s (success: {success})")
+        finally:
+            self.limits['jobs'].release()
+
+    async def run_loop_async(self):
+        """Poll for pending submissions and keep up to ASYNC_MAX_JOBS in flight."""
+        from judge_worker.playwright_capture import AsyncPlaywrightCapture
+        from audits.lighthouse_runner import LighthouseRunner
+
+        logger.info("Starting async worker loop...")
+        self._create_limits()
+        self.lighthouse = LighthouseRunner(
+            Config.ARTIFACTS_DIR,
+            keep_full_report=Config.LIGHTHOUSE_FULL_REPORT,
+            runs=Config.LIGHTHOUSE_RUNS,
+            cores_per_run=Config.LIGHTHOUSE_CORES_PER_RUN,
+            pin_cpus=Config.LIGHTHOUSE_PIN_CPUS
+        )
+        tasks = set()
+        if self.cluster:
+            await asyncio.to_thread(self.cluster.start)
+        governor_task = asyncio.create_task(self.governor.run_async()) if self.governor else None
+
+        async with AsyncPlaywrightCapture(Config.ARTIFACTS_DIR) as capture:
+            self.capture = capture
+            try:
+                while True:
+                    try:
+                        # Wait for at least one free job slot
+                        await self.limits['jobs'].acquire()
+                        free = 1
+                        while free < Config.ASYNC_MAX_JOBS and not self.limits['jobs'].locked():
+                            await self.limits['jobs'].acquire()
+                            free += 1
+
+                        # Each started job releases its own slot
+                        started = 0
+                        try:
+                            claimed = await self._claim_batch(free)
+                            for submission in claimed:
+                                task = asyncio.create_task(self._run_job(submission))
+                                tasks.add(task)
+                                task.add_done_callback(tasks.discard)
+                                started += 1
+                        finally:
+                            # Give back slots we couldn't fill, also when claiming failed
+                            for _ in range(free - started):
+                                self.limits['jobs'].release()
+
+                        if not claimed:
+                            await self._idle(tasks)
+
+                    except Exception as e:
+                        logger.error(f"Error in async worker loop: {e}", exc_info=True)
+                        await asyncio.sleep(60)
+            finally:
+                if governor_task:
+                    governor_task.cancel()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await self.ollama_pool.aclose()
+                if self.cluster:
+                    await asyncio.to_thread(self.cluster.stop)
+
+    async def _claim_batch(self, limit: int) -> list:
+        """Fetch and claim up to limit pending submissions."""
+        if not await asyncio.to_thread(self.ollama_pool.has_healthy_backend):
+            logger.warning(f"No healthy Ollama backend {self.ollama_pool.status()}")
+            return []
+
+        pending = await asyncio.to_thread(self._fetch_pending, limit)
+        claimed = []
+        for submission in pending:
+            try:
+                ok = await asyncio.to_thread(self.firebase.claim_submission, submission['id'], self.worker_id)
+            except Exception as e:
+                # Entries claimed so far still get run
+                logger.error(f"Error claiming submission {submission['id']}: {e}")
+                break
+            if ok:
+                self._job_started(submission)
+                claimed.append(submission)
+            else:
+                logger.info(f"Could not claim submission {submission['id']} (already claimed)")
+        return claimed
+
+    async def _idle(self, tasks: set, timeout: Optional[int] = None):
+        """Sleep until the poll interval passes or a running job finishes."""
+        timeout = timeout or Config.POLL_INTERVAL_SECONDS
+        if tasks:
+            logger.info(f"No new submissions, {len(tasks)} in flight")
+            await asyncio.wait(set(tasks), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            logger.info(f"No pending submissions. Sleeping for {timeout}s...")
+            await asyncio.sleep(timeout)
+
+
+def run():
+    """Start the async worker."""
+    worker = AsyncJudgeWorker()
+    try:
+        asyncio.run(worker.run_loop_async())
+    except KeyboardInterrupt:
+        logger.info("Worker stopped by user")
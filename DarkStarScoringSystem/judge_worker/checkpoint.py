@@ -0,0 +1,240 @@
+"""Per-stage checkpoints and retry policy for submissions."""
+import json
+import logging
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('preflight', 'capture', 'lighthouse', 'axe', 'judge', 'upload', 'write')
+
+# Stages small enough to copy into the entry document, so any worker can
+# resume them. Capture evidence (screenshots, page structure) stays local.
+INLINE_STAGES = ('lighthouse', 'axe', 'judge', 'upload')
+
+DEFAULT_RETRY = (3, 60)  # max attempts, base backoff seconds
+
+# (submission_id, judge_version, stage, entry, reset) -> None; see
+# FirebaseClient.save_checkpoint
+Publisher = Callable[[str, str, str, Dict[str, Any], bool], None]
+
+
+def parse_retry_policy(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse "capture:3:60,judge:4:30" into (max_attempts, base_backoff_seconds)
+    per stage. Stages left out get DEFAULT_RETRY.
+    """
+    policy = {stage: DEFAULT_RETRY for stage in STAGES}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        parts = [part.strip() for part in item.split(':')]
+        if len(parts) != 3 or parts[0] not in policy:
+            raise ValueError(f"Bad retry policy '{item}' (expected <stage>:<attempts>:<seconds>, stage one of {', '.join(STAGES)})")
+        attempts, backoff = int(parts[1]), int(parts[2])
+        if attempts < 1 or backoff < 0:
+            raise ValueError(f"Retry policy for '{parts[0]}' needs attempts >= 1 and seconds >= 0")
+        policy[parts[0]] = (attempts, backoff)
+    return policy
+
+
+def retry_delay(base_seconds: int, attempt: int, max_seconds: int) -> int:
+    """Exponential backoff before retry number attempt (1-based)."""
+    return min(max_seconds, base_seconds * 2 ** (attempt - 1))
+
+
+def retry_due(submission: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """False while a scheduled retry's backoff hasn't passed yet."""
+    retry_after = submission.get('retryAfter')
+    if not isinstance(retry_after, datetime):
+        return True
+    if retry_after.tzinfo is None:
+        retry_after = retry_after.replace(tzinfo=timezone.utc)
+    return retry_after <= (now or datetime.now(timezone.utc))
+
+
+def drop_missing_paths(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Clear *Path values that point at files no longer on this machine."""
+    return {
+        key: (None if key.endswith('Path') and value and not Path(value).exists() else value)
+        for key, value in data.items()
+    }
+
+
+class CheckpointStore:
+    """
+    Stage outputs on local disk, one JSON file per stage under
+    <root>/<submission_id>/<judge_version>/. Files are replaced atomically,
+    so a crash mid-write leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, root: Path):
+        """Initialize store under root."""
+        self.root = Path(root)
+
+    def _dir(self, submission_id: str, judge_version: str) -> Path:
+        return self.root / submission_id / judge_version.replace('/', '_')
+
+    def load(self, submission_id: str, judge_version: str) -> Dict[str, Any]:
+        """Saved outputs by stage; unreadable files are skipped."""
+        outputs = {}
+        directory = self._dir(submission_id, judge_version)
+        for stage in STAGES:
+            path = directory / f"{stage}.json"
+            if not path.exists():
+                continue
+            try:
+                outputs[stage] = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return outputs
+
+    def save(self, submission_id: str, judge_version: str, stage: str, data: Any):
+        """Persist one stage's output."""
+        directory = self._dir(submission_id, judge_version)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{stage}.json"
+        tmp_path = path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, default=str), encoding='utf-8')
+        tmp_path.replace(path)
+
+    def clear(self, submission_id: str):
+        """Remove every checkpoint of a submission."""
+        shutil.rmtree(self.root / submission_id, ignore_errors=True)
+
+    def prune(self, max_age_seconds: int) -> int:
+        """Remove checkpoints untouched for max_age_seconds. Returns the count."""
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for directory in self.root.iterdir():
+            try:
+                newest = max((p.stat().st_mtime for p in directory.rglob('*')), default=directory.stat().st_mtime)
+            except OSError:
+                continue
+            if newest < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+class JobCheckpoint:
+    """
+    Checkpoint state of one job.
+
+    Outputs come from the local store first, then from the `checkpoint`
+    map on the entry document (inline stages only), and only when both were
+    written for the current judge version. Stages run inside running(), so
+    a failure can be charged to the stage it came from.
+    """
+
+    def __init__(
+        self,
+        submission: Dict[str, Any],
+        judge_version: str,
+        store: Optional[CheckpointStore] = None,
+        publish: Optional[Publisher] = None,
+        worker_id: str = ''
+    ):
+        """Initialize from the entry document and local store."""
+        self.submission_id = submission['id']
+        self.judge_version = judge_version
+        self.store = store
+        self.publish = publish
+        self.worker_id = worker_id
+        self.current: Optional[str] = None
+        self.failed_stage: Optional[str] = None
+
+        remote = submission.get('checkpoint') or {}
+        same_version = remote.get('judgeVersion') == judge_version
+        # A checkpoint from another judge version is replaced, not merged into
+        self._reset_remote = bool(remote) and not same_version
+        self.attempts: Dict[str, int] = dict(remote.get('attempts') or {}) if same_version else {}
+        self.outputs: Dict[str, Any] = {}
+        if same_version:
+            for stage, entry in (remote.get('stages') or {}).items():
+                if stage in INLINE_STAGES and entry.get('data') is not None:
+                    self.outputs[stage] = entry['data']
+        if store:
+            self.outputs.update(store.load(self.submission_id, judge_version))
+
+    @property
+    def resumed(self) -> Tuple[str, ...]:
+        """Stages with a saved output, in pipeline order."""
+        return tuple(stage for stage in STAGES if stage in self.outputs)
+
+    def get(self, stage: str) -> Any:
+        """Saved output of stage, or None."""
+        return self.outputs.get(stage)
+
+    @contextmanager
+    def running(self, stage: str):
+        """
+        Mark stage as current for the block. The first exception leaving a
+        block is charged to its stage, even if an overlapping stage (capture
+        and Lighthouse run concurrently in async mode) started meanwhile.
+        The previous stage is current again once the block exits.
+        """
+        previous, self.current = self.current, stage
+        try:
+            yield
+        except Exception:
+            self.failed_stage = self.failed_stage or stage
+            raise
+        finally:
+            self.current = previous
+
+    def save(self, stage: str, data: Any):
+        """
+        Record a finished stage locally and on the entry document.
+        Checkpoint failures are logged and never fail the job.
+        """
+        self.outputs[stage] = data
+        if self.store:
+            try:
+                self.store.save(self.submission_id, self.judge_version, stage, data)
+            except Exception as e:
+                logger.warning(f"Error saving {stage} checkpoint for {self.submission_id}: {e}")
+        if self.publish:
+            entry: Dict[str, Any] = {'worker': self.worker_id}
+            if stage in INLINE_STAGES:
+                # Local paths are meaningless to other workers
+                entry['data'] = (
+                    {k: v for k, v in data.items() if not k.endswith('Path')}
+                    if isinstance(data, dict) else data
+                )
+            try:
+                self.publish(self.submission_id, self.judge_version, stage, entry, self._reset_remote)
+                self._reset_remote = False
+            except Exception as e:
+                logger.warning(f"Error publishing {stage} checkpoint for {self.submission_id}: {e}")
+
+    def failed(self, policy: Dict[str, Tuple[int, int]], max_backoff_seconds: int) -> Tuple[str, int, Optional[datetime]]:
+        """
+        Charge a failure to the current stage.
+        Returns (stage, attempts, retry_at); retry_at is None once the
+        stage has used up its attempts.
+        """
+        stage = self.failed_stage or self.current or 'capture'
+        attempts = self.attempts.get(stage, 0) + 1
+        self.attempts[stage] = attempts
+        max_attempts, base_seconds = policy.get(stage, DEFAULT_RETRY)
+        if attempts >= max_attempts:
+            return stage, attempts, None
+        delay = retry_delay(base_seconds, attempts, max_backoff_seconds)
+        return stage, attempts, datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    @property
+    def reset_remote(self) -> bool:
+        """True until the entry's stale checkpoint map has been replaced."""
+        return self._reset_remote
+
+    def clear(self):
+        """Drop local checkpoints once the entry is finished."""
+        if self.store:
+            self.store.clear(self.submission_id)
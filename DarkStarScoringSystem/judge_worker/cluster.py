@@ -0,0 +1,185 @@
+"""Worker membership and shard-aware claiming across nodes."""
+import hashlib
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    """Hostname plus pid, so several workers on one box stay distinct."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _weight(worker_id: str, key: str) -> int:
+    digest = hashlib.blake2b(f"{worker_id}|{key}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _aware(value: Any) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def pending_since(submission: Dict[str, Any]) -> Optional[datetime]:
+    """When the entry last became claimable: created, requeued, retry due or sent back for rejudging."""
+    times = [
+        _aware(submission.get(field))
+        for field in ('createdAt', 'requeuedAt', 'retryAfter', 'rejudgeRequestedAt')
+    ]
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+
+def rendezvous_owner(key: str, worker_ids: List[str]) -> Optional[str]:
+    """
+    Highest-random-weight owner of key among worker_ids.
+    When a worker joins or leaves only the keys it wins or held move, so
+    the rest of the queue keeps its owner.
+    """
+    if not worker_ids:
+        return None
+    return max(worker_ids, key=lambda worker_id: _weight(worker_id, key))
+
+
+class ClusterMembership:
+    """
+    Heartbeat registration and queue partitioning for one worker.
+
+    Each worker keeps a document in the workers collection fresh from a
+    background thread. Live members are those whose heartbeat is younger
+    than `ttl_seconds`; each pending entry belongs to its rendezvous owner
+    among them, so workers claim disjoint entries instead of racing on the
+    head of the queue. A worker with free slots left after its own share
+    may also take another shard's entry when it has been pending for
+    `steal_after_seconds` and its owner has not claimed anything for as
+    long (alive but stuck). Owners working through a backlog keep their
+    shard, so a long queue doesn't bring claim contention back.
+    """
+
+    def __init__(
+        self,
+        firebase,
+        worker_id: str,
+        heartbeat_interval: int = 30,
+        ttl_seconds: int = 90,
+        steal_after_seconds: int = 900,
+        info: Optional[Dict[str, Any]] = None
+    ):
+        """Initialize membership; call start() to begin heartbeating."""
+        self.firebase = firebase
+        self.worker_id = worker_id
+        self.heartbeat_interval = heartbeat_interval
+        self.ttl_seconds = ttl_seconds
+        self.steal_after_seconds = steal_after_seconds
+        self.info = info or {}
+        # A new worker gets one steal period to make its first claim
+        self.info.setdefault('lastClaimAt', datetime.now(timezone.utc))
+        self.members: List[str] = [worker_id]
+        self.last_claims: Dict[str, Optional[datetime]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Register and start the heartbeat thread."""
+        self._beat()
+        self.refresh()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name='heartbeat', daemon=True)
+        self._thread.start()
+        logger.info(f"Joined cluster as {self.worker_id} ({len(self.members)} member(s))")
+
+    def stop(self):
+        """Stop heartbeating and deregister so peers rebalance immediately."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            self.firebase.remove_worker(self.worker_id)
+        except Exception as e:
+            logger.warning(f"Error deregistering worker {self.worker_id}: {e}")
+
+    def _beat(self):
+        self.firebase.heartbeat(self.worker_id, self.info)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self._beat()
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for {self.worker_id}: {e}")
+
+    def refresh(self) -> List[str]:
+        """Reload live members, log joins/leaves and recover work from dead members."""
+        workers = self.firebase.get_live_workers(self.ttl_seconds)
+        live = set(workers)
+        live.add(self.worker_id)
+        members = sorted(live)
+
+        with self._lock:
+            previous = set(self.members)
+            self.members = members
+            self.last_claims = {
+                worker_id: _aware((data or {}).get('lastClaimAt'))
+                for worker_id, data in workers.items()
+            }
+
+        joined = live - previous
+        left = previous - live
+        if joined or left:
+            logger.info(
+                f"Cluster membership changed (+{sorted(joined)} -{sorted(left)}), "
+                f"rebalancing across {len(members)} worker(s)"
+            )
+        for dead in left:
+            # Exactly one survivor releases the dead worker's in-progress claims
+            if rendezvous_owner(dead, members) == self.worker_id:
+                try:
+                    released = self.firebase.release_claims(dead)
+                    if released:
+                        logger.info(f"Requeued {released} submission(s) claimed by {dead}")
+                except Exception as e:
+                    logger.warning(f"Error releasing claims of {dead}: {e}")
+        return members
+
+    def owns(self, submission: Dict[str, Any]) -> bool:
+        """True if submission is in this worker's shard."""
+        with self._lock:
+            members = list(self.members)
+        return rendezvous_owner(submission['id'], members) == self.worker_id
+
+    def note_claim(self):
+        """Record a claim; published with the next heartbeat so peers see this worker progressing."""
+        self.info['lastClaimAt'] = datetime.now(timezone.utc)
+
+    def _stealable(self, submission: Dict[str, Any]) -> bool:
+        """Pending for the steal period in the shard of an owner that has stopped claiming."""
+        now = datetime.now(timezone.utc)
+        since = pending_since(submission)
+        if since is None or (now - since).total_seconds() <= self.steal_after_seconds:
+            return False
+        with self._lock:
+            owner = rendezvous_owner(submission['id'], self.members)
+            last_claim = self.last_claims.get(owner)
+        if owner == self.worker_id:
+            return False
+        return last_claim is None or (now - last_claim).total_seconds() > self.steal_after_seconds
+
+    def select(self, submissions: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Pick up to limit submissions to claim, preserving queue order.
+        Own-shard entries come first; spare slots go to overdue entries of stalled shards.
+        """
+        owned = [s for s in submissions if self.owns(s)]
+        if len(owned) >= limit:
+            return owned[:limit]
+        stolen = [s for s in submissions if not self.owns(s) and self._stealable(s)]
+        if stolen:
+            logger.info(f"Taking {min(len(stolen), limit - len(owned))} overdue submission(s) from stalled shards")
+        return owned + stolen[:limit - len(owned)]
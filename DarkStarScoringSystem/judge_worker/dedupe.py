@@ -0,0 +1,189 @@
+"""Canonical URLs and sharing of site audits between duplicate entries."""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only identify where a visitor came from
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'igshid', 'ref', 'ref_src'
+}
+TRACKING_PREFIXES = ('utm_',)
+
+
+def url_error(url: str) -> Optional[str]:
+    """Why url can't be parsed (bad port, unbalanced IPv6 brackets), or None."""
+    raw = url.strip()
+    if '://' not in raw:
+        raw = f"https://{raw}"
+    try:
+        urlsplit(raw).port
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to the form used to detect duplicate entries.
+
+    http and https are treated as the same site, host case, a leading
+    "www.", default ports, trailing slashes, fragments and tracking
+    parameters are dropped, and the remaining query is sorted. A URL that
+    can't be parsed is returned stripped but otherwise unchanged.
+    """
+    raw = url.strip()
+    if '://' not in raw:
+        raw = f"https://{raw}"
+    try:
+        parts = urlsplit(raw)
+        port = parts.port
+    except ValueError:
+        return url.strip()
+
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    netloc = host
+    if port and port not in (80, 443):
+        netloc = f"{host}:{port}"
+
+    path = parts.path or '/'
+    while '//' in path:
+        path = path.replace('//', '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+    for index_page in ('/index.html', '/index.htm', '/index.php'):
+        if path.lower().endswith(index_page):
+            path = path[:-len(index_page)] or '/'
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+
+    return urlunsplit(('https', netloc, path, urlencode(query), ''))
+
+
+class SharedAuditCache:
+    """
+    Time-bounded cache of site-level stage output keyed by canonical URL.
+
+    Concurrent callers for the same key are coalesced: the first computes
+    while the others wait on a per-key lock and then reuse its result.
+    Failures are not cached, so a waiting caller retries the computation;
+    neither are values the caller's `cacheable` check rejects.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600):
+        """Initialize empty cache."""
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        # key -> [lock, callers holding or waiting for it]
+        self._key_locks: Dict[str, list] = {}
+        self._async_key_locks: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        """Hold the per-key lock; it is dropped once no caller needs it."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    @asynccontextmanager
+    async def _async_key_lock(self, key: str):
+        """Async counterpart of _key_lock; only used from the event loop."""
+        entry = self._async_key_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._async_key_locks[key]
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for key, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            return value
+
+    def put(self, key: str, value: Any):
+        """Store value for key."""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._purge_expired()
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Return (value, shared) for key.
+        shared is True when the value came from an earlier or concurrent job.
+        A computed value is only stored when cacheable (if given) accepts it.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        with self._key_lock(key):
+            # Another job may have finished while we waited
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            return value, False
+
+    async def get_or_compute_async(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """Async counterpart of get_or_compute for coroutine stages."""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        async with self._async_key_lock(key):
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            value = await compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            return value, False
+
+    def _purge_expired(self):
+        """Drop expired entries. Caller holds self._lock."""
+        now = time.time()
+        expired = [k for k, (stored_at, _) in self._entries.items() if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
@@ -0,0 +1,219 @@
+"""Versioned evidence bundles for captured submissions."""
+import hashlib
+import json
+import logging
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when the bundle layout changes in a way readers must know about
+BUNDLE_FORMAT_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+SCREENSHOT_NAMES = ('desktop', 'mobile')
+
+
+class EvidenceBundleError(Exception):
+    """Raised when a bundle is missing, corrupt or has an unknown format."""
+
+
+class EvidenceBundle:
+    """
+    Single-file container for everything the judging stages need.
+
+    Layout (zip):
+        manifest.json           format version, submission info, file digests
+        structure.json          extracted page structure
+        console.json            console messages
+        network.json            failed requests, network errors and counts
+        lighthouse.json         Lighthouse summary metrics
+        axe.json                axe-core summary
+        visual.json             screenshot features (optional)
+        screenshots/<name>.png  desktop and mobile screenshots
+    """
+
+    def __init__(
+        self,
+        manifest: Dict[str, Any],
+        evidence: Dict[str, Any],
+        lighthouse_metrics: Dict[str, Any],
+        axe_summary: Dict[str, Any],
+        path: Optional[Path] = None
+    ):
+        """Initialize bundle from already-parsed parts."""
+        self.manifest = manifest
+        self.evidence = evidence
+        self.lighthouse_metrics = lighthouse_metrics
+        self.axe_summary = axe_summary
+        self.path = path
+
+    @property
+    def submission_id(self) -> str:
+        return self.manifest.get('submissionId', '')
+
+    @property
+    def url(self) -> str:
+        return self.manifest.get('url', '')
+
+    @property
+    def category(self) -> str:
+        return self.manifest.get('category', 'Unknown')
+
+    @classmethod
+    def write(
+        cls,
+        path: Path,
+        submission: Dict[str, Any],
+        evidence: Dict[str, Any],
+        lighthouse_metrics: Dict[str, Any],
+        axe_summary: Dict[str, Any],
+        judge_version: str = ''
+    ) -> 'EvidenceBundle':
+        """Write evidence for a submission to a bundle at path."""
+        path = Path(path)
+        network = {
+            'failedRequests': evidence.get('failed_requests', []),
+            'networkErrors': evidence.get('network_errors', []),
+            'consoleErrorCount': evidence.get('console_error_count', 0),
+            'failedRequestCount': evidence.get('failed_request_count', 0)
+        }
+        # Local paths are meaningless once the bundle leaves this machine
+        lighthouse_summary = {
+            k: v for k, v in lighthouse_metrics.items() if not k.endswith('Path')
+        }
+        axe = {k: v for k, v in axe_summary.items() if not k.endswith('Path')}
+
+        json_parts = {
+            'structure.json': evidence.get('extracted', {}),
+            'console.json': evidence.get('console', []),
+            'network.json': network,
+            'lighthouse.json': lighthouse_summary,
+            'axe.json': axe
+        }
+        if evidence.get('visual_features'):
+            json_parts['visual.json'] = evidence['visual_features']
+
+        files = {}
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, data in json_parts.items():
+                payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                zf.writestr(name, payload)
+                files[name] = cls._file_entry(payload)
+
+            for shot in SCREENSHOT_NAMES:
+                shot_path = evidence.get('screenshots', {}).get(shot)
+                if not shot_path or not Path(shot_path).exists():
+                    continue
+                payload = Path(shot_path).read_bytes()
+                name = f"screenshots/{shot}.png"
+                # PNG is already compressed, deflating again only costs CPU
+                zf.writestr(name, payload, compress_type=zipfile.ZIP_STORED)
+                files[name] = cls._file_entry(payload)
+
+            manifest = {
+                'formatVersion': BUNDLE_FORMAT_VERSION,
+                'submissionId': evidence.get('submission_id') or submission.get('id', ''),
+                'url': evidence.get('url') or submission.get('url', ''),
+                'category': submission.get('category', 'Unknown'),
+                'judgeVersion': judge_version,
+                'createdAt': datetime.now(timezone.utc).isoformat(),
+                'files': files
+            }
+            zf.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False))
+
+        tmp_path.replace(path)
+        logger.info(f"Evidence bundle written: {path} ({path.stat().st_size} bytes)")
+        return cls(manifest, cls._evidence_from_parts(manifest, json_parts), lighthouse_summary, axe, path)
+
+    @classmethod
+    def load(cls, path: Path, verify: bool = True) -> 'EvidenceBundle':
+        """Load a bundle from disk, optionally verifying file digests."""
+        path = Path(path)
+        if not path.exists():
+            raise EvidenceBundleError(f"Evidence bundle not found: {path}")
+
+        try:
+            with zipfile.ZipFile(path, 'r') as zf:
+                manifest = json.loads(zf.read(MANIFEST_NAME))
+                version = manifest.get('formatVersion')
+                if version != BUNDLE_FORMAT_VERSION:
+                    raise EvidenceBundleError(
+                        f"Unsupported bundle format {version} in {path} "
+                        f"(expected {BUNDLE_FORMAT_VERSION})"
+                    )
+
+                json_parts = {}
+                for name in manifest.get('files', {}):
+                    if not name.endswith('.json'):
+                        continue
+                    payload = zf.read(name)
+                    if verify:
+                        cls._verify(manifest, name, payload)
+                    json_parts[name] = json.loads(payload)
+        except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as e:
+            raise EvidenceBundleError(f"Corrupt evidence bundle {path}: {e}")
+
+        return cls(
+            manifest,
+            cls._evidence_from_parts(manifest, json_parts),
+            json_parts.get('lighthouse.json', {}),
+            json_parts.get('axe.json', {}),
+            path
+        )
+
+    def read_screenshot(self, name: str) -> Optional[bytes]:
+        """Return raw PNG bytes for a screenshot, or None if not bundled."""
+        member = f"screenshots/{name}.png"
+        if member not in self.manifest.get('files', {}) or not self.path:
+            return None
+        with zipfile.ZipFile(self.path, 'r') as zf:
+            return zf.read(member)
+
+    def extract_screenshots(self, dest_dir: Path) -> Dict[str, str]:
+        """
+        Extract bundled screenshots into dest_dir.
+        Updates evidence['screenshots'] and returns the name -> path mapping.
+        """
+        dest_dir = Path(dest_dir)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        screenshots = {}
+        for shot in SCREENSHOT_NAMES:
+            payload = self.read_screenshot(shot)
+            if payload is None:
+                continue
+            shot_path = dest_dir / f"{self.submission_id}_{shot}.png"
+            shot_path.write_bytes(payload)
+            screenshots[shot] = str(shot_path)
+        self.evidence['screenshots'] = screenshots
+        return screenshots
+
+    @staticmethod
+    def _file_entry(payload: bytes) -> Dict[str, Any]:
+        return {'size': len(payload), 'sha256': hashlib.sha256(payload).hexdigest()}
+
+    @staticmethod
+    def _verify(manifest: Dict[str, Any], name: str, payload: bytes):
+        expected = manifest['files'][name].get('sha256')
+        if expected and hashlib.sha256(payload).hexdigest() != expected:
+            raise EvidenceBundleError(f"Digest mismatch for {name}")
+
+    @staticmethod
+    def _evidence_from_parts(manifest: Dict[str, Any], json_parts: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild the evidence dict shape returned by PlaywrightCapture.capture."""
+        network = json_parts.get('network.json', {})
+        return {
+            'url': manifest.get('url', ''),
+            'submission_id': manifest.get('submissionId', ''),
+            'screenshots': {},
+            'extracted': json_parts.get('structure.json', {}),
+            'console': json_parts.get('console.json', []),
+            'network_errors': network.get('networkErrors', []),
+            'failed_requests': network.get('failedRequests', []),
+            'console_error_count': network.get('consoleErrorCount', 0),
+            'failed_request_count': network.get('failedRequestCount', 0),
+            'visual_features': json_parts.get('visual.json')
+        }
@@ -0,0 +1,373 @@
+"""Columnar export of judging results for analytics."""
+import argparse
+import csv
+import gzip
+import json
+import logging
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+import sys
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('parquet', 'arrow', 'csv')
+SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv.gz'}
+STATE_FILE = '_export_state.json'
+ROW_GROUP_SIZE = 10000
+
+# Columns every row has, in this order; the rest follow as first seen
+BASE_COLUMNS = {
+    'id': 'string',
+    'url': 'string',
+    'category': 'string',
+    'status': 'string',
+    'judgeVersion': 'string',
+    'createdAt': 'timestamp',
+    'scoredAt': 'timestamp',
+    'errorStage': 'string',
+    'errorMessage': 'string'
+}
+
+
+def _flatten(prefix: str, value: Any, row: Dict[str, Any]):
+    """Nested maps become dotted columns; lists are kept as JSON text."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}", item, row)
+    elif isinstance(value, (list, tuple)):
+        row[prefix] = json.dumps(value, default=str, separators=(',', ':'))
+    else:
+        row[prefix] = value
+
+
+def flatten_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One row per entry: identity and status, result.scores as score.*,
+    result.metrics (flags and stageMs included) as metrics.*.
+    """
+    result = entry.get('result') or {}
+    error = entry.get('error') or {}
+    row = {
+        'id': entry['id'],
+        'url': entry.get('url'),
+        'category': entry.get('category'),
+        'status': entry.get('status'),
+        'judgeVersion': result.get('judgeVersion'),
+        'createdAt': entry.get('createdAt'),
+        'scoredAt': result.get('scoredAt'),
+        'errorStage': error.get('stage'),
+        'errorMessage': error.get('message')
+    }
+    for key, value in (result.get('scores') or {}).items():
+        _flatten(f"score.{key}", value, row)
+    for key, value in (result.get('metrics') or {}).items():
+        _flatten(f"metrics.{key}", value, row)
+    return row
+
+
+def column_type(value: Any) -> Optional[str]:
+    """Export type of a value; None for a missing one."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'bool'
+    # Numbers are all float64 so appended parts never disagree on a type
+    if isinstance(value, (int, float)):
+        return 'float'
+    if isinstance(value, datetime):
+        return 'timestamp'
+    return 'string'
+
+
+def coerce(value: Any, kind: str) -> Any:
+    """Value converted to a column's type, None if it doesn't fit."""
+    if value is None:
+        return None
+    try:
+        if kind == 'bool':
+            return bool(value) if isinstance(value, (bool, int, float)) else None
+        if kind == 'float':
+            return float(value) if not isinstance(value, (str, datetime)) else None
+        if kind == 'timestamp':
+            if not isinstance(value, datetime):
+                return None
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class PartWriter:
+    """
+    Writes rows to numbered part files of one export directory.
+
+    A part's schema is fixed when it is opened; rows bringing a new column
+    close it and continue in the next part. Parquet and Arrow parts are
+    written a row group at a time, CSV parts as gzip streams.
+    """
+
+    def __init__(self, directory: Path, fmt: str, columns: Dict[str, str], next_part: int):
+        """Initialize writer; columns (name -> type) carry over from earlier exports."""
+        self.directory = directory
+        self.fmt = fmt
+        self.columns = dict(columns)
+        self.next_part = next_part
+        self.files: List[Path] = []
+        self._open_columns: Optional[List[str]] = None
+        self._writer = None
+        self._handle = None
+
+    def _arrow_schema(self, names: List[str]):
+        import pyarrow as pa
+        types = {
+            'bool': pa.bool_(),
+            'float': pa.float64(),
+            'timestamp': pa.timestamp('us', tz='UTC'),
+            'string': pa.string()
+        }
+        return pa.schema([(name, types[self.columns[name]]) for name in names])
+
+    def _open(self):
+        names = list(self.columns)
+        path = self.directory / f"part-{self.next_part:05d}{SUFFIXES[self.fmt]}"
+        self.next_part += 1
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(str(path), self._arrow_schema(names), compression='zstd')
+        elif self.fmt == 'arrow':
+            import pyarrow as pa
+            self._handle = pa.OSFile(str(path), 'wb')
+            self._writer = pa.ipc.new_file(self._handle, self._arrow_schema(names))
+        else:
+            self._handle = gzip.open(path, 'wt', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._handle)
+            self._writer.writerow(names)
+        self._open_columns = names
+        self.files.append(path)
+
+    def close(self):
+        """Finish the open part."""
+        if self._writer is not None and self.fmt != 'csv':
+            self._writer.close()
+        if self._handle is not None:
+            self._handle.close()
+        self._writer = self._handle = self._open_columns = None
+
+    def write(self, rows: List[Dict[str, Any]]):
+        """Append one batch of flattened rows."""
+        if not rows:
+            return
+        for row in rows:
+            for name, value in row.items():
+                if name not in self.columns and column_type(value):
+                    self.columns[name] = column_type(value)
+        if self._open_columns is not None and len(self._open_columns) != len(self.columns):
+            self.close()
+        if self._open_columns is None:
+            self._open()
+
+        names = self._open_columns
+        if self.fmt == 'csv':
+            for row in rows:
+                values = [coerce(row.get(name), self.columns[name]) for name in names]
+                self._writer.writerow(['' if v is None else v.isoformat() if isinstance(v, datetime) else v for v in values])
+            return
+        import pyarrow as pa
+        arrays = {name: [coerce(row.get(name), self.columns[name]) for row in rows] for name in names}
+        table = pa.Table.from_pydict(arrays, schema=self._arrow_schema(names))
+        if self.fmt == 'parquet':
+            self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        else:
+            self._writer.write_table(table)
+
+
+class ResultsExporter:
+    """
+    Export entries with a result into a directory of columnar part files.
+
+    Entries are read in (result.scoredAt, id) order with cursor
+    pagination. A full export is written to a staging directory that
+    replaces the export directory once complete. An incremental export
+    resumes after the last (scoredAt, id) recorded in the state file and
+    appends new parts, so a rescored entry appears again with its newer
+    result. A failed export leaves the previous one as it was.
+    """
+
+    def __init__(self, firebase, directory: Path, fmt: str = 'parquet', page_size: int = 500):
+        """Initialize exporter; falls back to CSV without pyarrow."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+        if fmt != 'csv' and not _pyarrow_available():
+            logger.warning(f"pyarrow is not installed, exporting compressed CSV instead of {fmt}")
+            fmt = 'csv'
+        self.firebase = firebase
+        self.directory = Path(directory)
+        self.fmt = fmt
+        self.page_size = page_size
+
+    def _load_state(self) -> Dict[str, Any]:
+        path = self.directory / STATE_FILE
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def _save_state(self, directory: Path, state: Dict[str, Any]):
+        path = directory / STATE_FILE
+        tmp_path = path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(state, indent=2), encoding='utf-8')
+        tmp_path.replace(path)
+
+    def _sibling(self, label: str) -> Path:
+        """Hidden directory next to the export directory."""
+        return self.directory.with_name(f".{self.directory.name}.{label}")
+
+    def _swap_in(self, staging: Path):
+        """Replace the export directory with a finished full export."""
+        old = self._sibling('old')
+        shutil.rmtree(old, ignore_errors=True)
+        if self.directory.exists():
+            self.directory.rename(old)
+        staging.rename(self.directory)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def export(self, incremental: bool = False) -> Dict[str, Any]:
+        """Write the export; returns rows, files and elapsed seconds."""
+        start_time = time.time()
+        state = self._load_state() if incremental else {}
+        if state and state.get('format') != self.fmt:
+            raise ValueError(f"{self.directory} holds a {state.get('format')} export; use that format or a full export")
+        if incremental:
+            target = self.directory
+        else:
+            target = self._sibling('tmp')
+            shutil.rmtree(target, ignore_errors=True)
+        target.mkdir(parents=True, exist_ok=True)
+
+        start_after = None
+        if state.get('lastScoredAt'):
+            start_after = datetime.fromisoformat(state['lastScoredAt'])
+        writer = PartWriter(target, self.fmt, state.get('columns') or BASE_COLUMNS, state.get('parts', 0))
+        rows, batch = 0, []
+        last_scored, last_id = start_after, state.get('lastId')
+        try:
+            for entry in self.firebase.iter_entries(
+                page_size=self.page_size, order_field='result.scoredAt',
+                start_after=start_after, start_after_id=last_id
+            ):
+                row = flatten_entry(entry)
+                batch.append(row)
+                if isinstance(row['scoredAt'], datetime):
+                    last_scored, last_id = row['scoredAt'], row['id']
+                if len(batch) >= ROW_GROUP_SIZE:
+                    writer.write(batch)
+                    rows += len(batch)
+                    batch = []
+            writer.write(batch)
+            rows += len(batch)
+        except Exception:
+            writer.close()
+            # Parts beyond the saved state would be overwritten or duplicated later
+            if incremental:
+                for path in writer.files:
+                    path.unlink(missing_ok=True)
+            else:
+                shutil.rmtree(target, ignore_errors=True)
+            raise
+        finally:
+            writer.close()
+
+        self._save_state(target, {
+            'format': self.fmt,
+            'lastScoredAt': last_scored.isoformat() if last_scored else None,
+            'lastId': last_id,
+            'columns': writer.columns,
+            'parts': writer.next_part,
+            'rows': state.get('rows', 0) + rows,
+            'exportedAt': datetime.now(timezone.utc).isoformat()
+        })
+        if not incremental:
+            self._swap_in(target)
+        files = [self.directory / path.name for path in writer.files]
+        elapsed = round(time.time() - start_time, 2)
+        logger.info(
+            f"Exported {rows} results to {len(files)} {self.fmt} part(s) in {self.directory} ({elapsed}s)"
+        )
+        return {'rows': rows, 'files': [str(path) for path in files], 'elapsedSeconds': elapsed}
+
+
+def read_export(directory: str):
+    """
+    Load a Parquet or Arrow export as one pyarrow Table. Parts written
+    before a column existed get nulls for it.
+    """
+    import pyarrow as pa
+
+    directory = Path(directory)
+    state = json.loads((directory / STATE_FILE).read_text(encoding='utf-8'))
+    paths = sorted(directory.glob(f"part-*{SUFFIXES[state['format']]}"))
+    if state['format'] == 'parquet':
+        import pyarrow.parquet as pq
+        tables = [pq.read_table(path) for path in paths]
+    elif state['format'] == 'arrow':
+        tables = [pa.ipc.open_file(pa.memory_map(str(path))).read_all() for path in paths]
+    else:
+        raise ValueError("CSV exports are read with pandas.read_csv or pyarrow.csv, one part at a time")
+    if not tables:
+        return pa.table({})
+    schema = pa.unify_schemas([table.schema for table in tables])
+    return pa.concat_tables([_conform(table, schema) for table in tables])
+
+
+def _conform(table, schema):
+    """Add missing columns as nulls and order columns like schema."""
+    import pyarrow as pa
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(len(table), field.type))
+    return table.select(schema.names)
+
+
+def main():
+    """Entry point for `python -m judge_worker.export`."""
+    parser = argparse.ArgumentParser(description='Export judging results to columnar files for analysis.')
+    parser.add_argument('directory', help='Export directory (part files plus export state)')
+    parser.add_argument('--format', choices=FORMATS, default='parquet', help='Part file format (CSV without pyarrow)')
+    parser.add_argument('--incremental', action='store_true', help='Append only results scored since the last export')
+    parser.add_argument('--page-size', type=int, default=500, help='Entries read per Firestore query')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from judge_worker.firebase_client import FirebaseClient
+
+    Config.validate()
+    firebase = FirebaseClient(
+        Config.FIREBASE_PROJECT_ID,
+        Config.FIREBASE_CREDENTIALS_JSON,
+        Config.STORAGE_BUCKET
+    )
+    exporter = ResultsExporter(firebase, Path(args.directory), fmt=args.format, page_size=args.page_size)
+    exporter.export(incremental=args.incremental)
+
+
+if __name__ == '__main__':
+    main()
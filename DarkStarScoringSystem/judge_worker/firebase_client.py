@@ -1,10 +1,11 @@
 """Firebase client for Firestore and Storage operations."""
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Callable, Dict, Any, Iterator
 from firebase_admin import initialize_app, credentials, firestore, storage
 from firebase_admin.exceptions import FirebaseError
+from config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,7 @@ class FirebaseClient:
         self.db = firestore.client()
         self.bucket = storage.bucket()
         self.project_id = project_id
+        self._judge_version = Config.JUDGE_VERSION
     
     def claim_submission(self, submission_id: str, worker_id: str) -> bool:
         """
@@ -49,7 +51,9 @@ class FirebaseClient:
                     if claimed_at:
                         claimed_time = claimed_at
                         if isinstance(claimed_time, datetime):
-                            if datetime.now() - claimed_time < timedelta(minutes=30):
+                            if claimed_time.tzinfo is None:
+                                claimed_time = claimed_time.replace(tzinfo=timezone.utc)
+                            if datetime.now(timezone.utc) - claimed_time < timedelta(minutes=30):
                                 return False  # Still valid claim
                         # Stale claim, allow re-claim
                 
@@ -71,20 +75,119 @@ class FirebaseClient:
             logger.error(f"Error claiming submission {submission_id}: {e}")
             return False
     
-    def get_pending_submissions(self, limit: int = 5) -> list:
-        """Get pending submissions ordered by submittedAt."""
+    def get_pending_submissions(
+        self,
+        limit: int = 5,
+        newest_first: bool = False,
+        keep: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> list:
+        """
+        Get pending submissions ordered by submittedAt (oldest first unless
+        newest_first). Entries keep rejects are skipped and further pages
+        are read until limit entries are found or the queue runs out.
+        """
+        direction = firestore.Query.DESCENDING if newest_first else firestore.Query.ASCENDING
+        found = []
         try:
             query = (
                 self.db.collection('entries')
                 .where('status', '==', 'pending')
-                .order_by('createdAt', direction=firestore.Query.ASCENDING)
-                .limit(limit)
+                .order_by('createdAt', direction=direction)
             )
-            docs = query.stream()
-            return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+            last = None
+            while len(found) < limit:
+                page = query.start_after(last) if last is not None else query
+                docs = list(page.limit(limit).stream())
+                for doc in docs:
+                    submission = {'id': doc.id, **doc.to_dict()}
+                    if keep is None or keep(submission):
+                        found.append(submission)
+                        if len(found) == limit:
+                            break
+                if len(docs) < limit:
+                    break
+                last = docs[-1]
         except Exception as e:
             logger.error(f"Error fetching pending submissions: {e}")
-            return []
+        return found
+    
+    def iter_entries(
+        self,
+        status: Optional[str] = None,
+        page_size: int = 500,
+        order_field: str = 'createdAt',
+        start_after: Optional[Any] = None,
+        start_after_id: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream entries (optionally with one status) ordered by order_field
+        and then document id, one page per query with a cursor on the last
+        document, so large collections are read without holding them in
+        memory. start_after is a value of order_field to resume after;
+        with start_after_id, entries with that same value and a later id
+        are still returned.
+        """
+        collection = self.db.collection('entries')
+        query = collection
+        if status:
+            query = query.where('status', '==', status)
+        query = query.order_by(order_field).order_by('__name__')
+        if start_after is not None:
+            # Cursor values in order_by order; the id may be left out
+            cursor = [start_after]
+            if start_after_id:
+                cursor.append(collection.document(start_after_id))
+            query = query.start_after(cursor)
+        last = None
+        while True:
+            page = query.start_after(last) if last is not None else query
+            docs = list(page.limit(page_size).stream())
+            for doc in docs:
+                yield {'id': doc.id, **doc.to_dict()}
+            if len(docs) < page_size:
+                return
+            last = docs[-1]
+    
+    def get_reaudit_due(self, now: datetime, limit: int = 200) -> list:
+        """Scored entries whose re-audit check is due, earliest first."""
+        query = (
+            self.db.collection('entries')
+            .where('status', '==', 'scored')
+            .where('reaudit.nextCheckAt', '<=', now)
+            .order_by('reaudit.nextCheckAt')
+            .limit(limit)
+        )
+        return [{'id': doc.id, **doc.to_dict()} for doc in query.stream()]
+    
+    def save_reaudit(self, submission_id: str, state: Dict[str, Any]):
+        """Replace the entry's `reaudit` map."""
+        self.db.collection('entries').document(submission_id).update({'reaudit': state})
+    
+    def save_profile(self, submission_id: str, profile: Dict[str, Any]):
+        """Replace the entry's `profileArtifacts` map."""
+        self.db.collection('entries').document(submission_id).update({'profileArtifacts': profile})
+    
+    def request_rejudge(self, submission_id: str, reason: str, reaudit: Dict[str, Any]) -> bool:
+        """
+        Send a scored entry back to pending as a rejudge, storing its new
+        re-audit state. Returns False if the entry is no longer scored.
+        """
+        submission_ref = self.db.collection('entries').document(submission_id)
+        
+        @firestore.transactional
+        def rejudge_transaction(transaction):
+            doc = submission_ref.get(transaction=transaction)
+            if not doc.exists or doc.to_dict().get('status') != 'scored':
+                return False
+            transaction.update(submission_ref, {
+                'status': 'pending',
+                'rejudgeRequestedAt': firestore.SERVER_TIMESTAMP,
+                'rejudgeReason': reason,
+                'reaudit': reaudit
+            })
+            return True
+        
+        return rejudge_transaction(self.db.transaction())
     
     def write_results(
         self,
@@ -93,7 +196,7 @@ class FirebaseClient:
         notes: Dict[str, str],
         artifacts: Dict[str, str],
         metrics: Dict[str, Any],
-        error: Optional[Dict[str, str]] = None
+        error: Optional[Dict[str, Any]] = None
     ):
         """Write scoring results back to Firestore."""
         submission_ref = self.db.collection('entries').document(submission_id)
@@ -109,11 +212,17 @@ class FirebaseClient:
         
         update_data = {
             'status': 'error' if error else 'scored',
-            'result': result_data
+            'result': result_data,
+            # The job is finished; a later rejudge starts from scratch
+            'checkpoint': firestore.DELETE_FIELD,
+            'retryAfter': firestore.DELETE_FIELD
         }
         
         if error:
             update_data['error'] = error
+        else:
+            # Fingerprint the page as judged at the next re-audit pass
+            update_data['reaudit.nextCheckAt'] = firestore.SERVER_TIMESTAMP
         
         try:
             submission_ref.update(update_data)
@@ -122,6 +231,122 @@ class FirebaseClient:
             logger.error(f"Error writing results for {submission_id}: {e}")
             raise
     
+    def requeue_submission(self, submission_id: str, reason: str):
+        """Release a claimed submission back to pending without recording an error."""
+        submission_ref = self.db.collection('entries').document(submission_id)
+        try:
+            submission_ref.update({
+                'status': 'pending',
+                'claimedBy': firestore.DELETE_FIELD,
+                'claimedAt': firestore.DELETE_FIELD,
+                'requeuedAt': firestore.SERVER_TIMESTAMP,
+                'requeueReason': reason
+            })
+            logger.info(f"Requeued submission {submission_id}: {reason}")
+        except Exception as e:
+            logger.error(f"Error requeueing submission {submission_id}: {e}")
+            raise
+    
+    def save_checkpoint(
+        self,
+        submission_id: str,
+        judge_version: str,
+        stage: str,
+        entry: Dict[str, Any],
+        reset: bool = False
+    ):
+        """
+        Record a completed stage under the entry's `checkpoint` map.
+        With reset, a map left by another judge version is replaced.
+        """
+        submission_ref = self.db.collection('entries').document(submission_id)
+        entry = {**entry, 'completedAt': firestore.SERVER_TIMESTAMP}
+        if reset:
+            submission_ref.update({
+                'checkpoint': {'judgeVersion': judge_version, 'stages': {stage: entry}, 'attempts': {}}
+            })
+        else:
+            submission_ref.update({
+                'checkpoint.judgeVersion': judge_version,
+                f'checkpoint.stages.{stage}': entry
+            })
+    
+    def schedule_retry(
+        self,
+        submission_id: str,
+        judge_version: str,
+        stage: str,
+        attempts: int,
+        retry_at: datetime,
+        message: str,
+        reset: bool = False
+    ):
+        """
+        Release a failed job back to pending, to be picked up again after
+        retry_at, counting the attempt against its stage.
+        """
+        submission_ref = self.db.collection('entries').document(submission_id)
+        last_error = {'stage': stage, 'message': message, 'at': firestore.SERVER_TIMESTAMP}
+        update = {
+            'status': 'pending',
+            'claimedBy': firestore.DELETE_FIELD,
+            'claimedAt': firestore.DELETE_FIELD,
+            'retryAfter': retry_at
+        }
+        if reset:
+            update['checkpoint'] = {
+                'judgeVersion': judge_version,
+                'stages': {},
+                'attempts': {stage: attempts},
+                'lastError': last_error
+            }
+        else:
+            update['checkpoint.judgeVersion'] = judge_version
+            update[f'checkpoint.attempts.{stage}'] = attempts
+            update['checkpoint.lastError'] = last_error
+        try:
+            submission_ref.update(update)
+            logger.info(f"Submission {submission_id} will retry {stage} (attempt {attempts + 1}) after {retry_at.isoformat()}")
+        except Exception as e:
+            logger.error(f"Error scheduling retry for {submission_id}: {e}")
+            raise
+    
+    def heartbeat(self, worker_id: str, info: Dict[str, Any]):
+        """Create or refresh this worker's membership document."""
+        worker_ref = self.db.collection(Config.WORKERS_COLLECTION).document(worker_id)
+        worker_ref.set({
+            **info,
+            'workerId': worker_id,
+            'heartbeatAt': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+    
+    def get_live_workers(self, ttl_seconds: int) -> Dict[str, Dict[str, Any]]:
+        """Return the documents of workers whose heartbeat is younger than ttl_seconds, by id."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl_seconds)
+        try:
+            query = self.db.collection(Config.WORKERS_COLLECTION).where('heartbeatAt', '>=', cutoff)
+            return {doc.id: doc.to_dict() for doc in query.stream()}
+        except Exception as e:
+            logger.error(f"Error fetching live workers: {e}")
+            raise
+    
+    def remove_worker(self, worker_id: str):
+        """Delete a worker's membership document."""
+        self.db.collection(Config.WORKERS_COLLECTION).document(worker_id).delete()
+    
+    def release_claims(self, worker_id: str) -> int:
+        """Return submissions a dead worker was scoring to pending. Returns the count."""
+        query = (
+            self.db.collection('entries')
+            .where('status', '==', 'scoring')
+            .where('claimedBy', '==', worker_id)
+        )
+        released = 0
+        for doc in query.stream():
+            self.requeue_submission(doc.id, f"Worker {worker_id} stopped heartbeating")
+            released += 1
+        return released
+    
     def upload_artifact(self, local_path: str, remote_path: str) -> str:
         """Upload artifact to Firebase Storage and return public URL."""
         try:
@@ -133,26 +358,6 @@ class FirebaseClient:
             logger.error(f"Error uploading artifact {local_path}: {e}")
             raise
     
-    def __init__(self, project_id: str, credentials_path: str, storage_bucket: str):
-        """Initialize Firebase client."""
-        if not FirebaseClient._initialized:
-            cred = credentials.Certificate(credentials_path)
-            initialize_app(cred, {
-                'storageBucket': storage_bucket
-            })
-            FirebaseClient._initialized = True
-        
-        self.db = firestore.client()
-        self.bucket = storage.bucket()
-        self.project_id = project_id
-        
-        # Get judge version
-        import sys
-        from pathlib import Path
-        sys.path.insert(0, str(Path(__file__).parent.parent))
-        from config import Config
-        self._judge_version = Config.JUDGE_VERSION
-    
     @property
     def judge_version(self) -> str:
         """Get judge version from config."""
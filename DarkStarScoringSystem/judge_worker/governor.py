@@ -0,0 +1,393 @@
+"""Host-pressure driven admission control for pipeline stages."""
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+PROC = Path('/proc')
+THERMAL = Path('/sys/class/thermal')
+
+
+def is_local_host(url: str) -> bool:
+    """True if an Ollama host URL points at this machine."""
+    host = urlsplit(url if '://' in url else f"http://{url}").hostname or ''
+    return host in ('localhost', '::1') or host.startswith('127.')
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text()
+    except OSError:
+        return None
+
+
+def read_meminfo() -> Dict[str, int]:
+    """MemTotal/MemAvailable/SwapFree etc. from /proc/meminfo, in MB."""
+    text = _read(PROC / 'meminfo') or ''
+    info = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        fields = value.split()
+        if fields and fields[0].isdigit():
+            info[key] = int(fields[0]) // 1024
+    return info
+
+
+def read_loadavg() -> Optional[float]:
+    """One-minute load average per CPU."""
+    text = _read(PROC / 'loadavg')
+    if not text:
+        return None
+    return float(text.split()[0]) / (os.cpu_count() or 1)
+
+
+def read_temperatures() -> Dict[str, float]:
+    """Celsius per thermal zone, keyed by zone type (e.g. CPU-therm, GPU-therm)."""
+    temps = {}
+    for zone in sorted(THERMAL.glob('thermal_zone*')):
+        raw = _read(zone / 'temp')
+        if not raw or not raw.strip().lstrip('-').isdigit():
+            continue
+        name = (_read(zone / 'type') or zone.name).strip()
+        temps[name] = int(raw) / 1000
+    return temps
+
+
+def _rss_mb(pid: int) -> float:
+    """VmRSS of one process in MB; 0 for kernel threads and exited processes."""
+    for line in (_read(PROC / str(pid) / 'status') or '').splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _children(pid: int) -> List[int]:
+    """Direct children of pid, from each of its threads' children file."""
+    try:
+        tasks = list((PROC / str(pid) / 'task').iterdir())
+    except OSError:
+        return []
+    children = []
+    for task in tasks:
+        children.extend(int(child) for child in (_read(task / 'children') or '').split())
+    return children
+
+
+def read_tree_rss(root_pid: int) -> int:
+    """RSS in MB of root_pid plus all its descendants (Chromium, Lighthouse)."""
+    total = 0.0
+    stack = [root_pid]
+    seen = set()
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += _rss_mb(pid)
+        stack.extend(_children(pid))
+    return int(total)
+
+
+# Local Ollama server pids; /proc is only listed again once they have all
+# exited, at most every OLLAMA_RESCAN_SECONDS
+OLLAMA_RESCAN_SECONDS = 300
+_ollama_pids: List[int] = []
+_ollama_scanned_at = 0.0
+
+
+def find_ollama_pids() -> List[int]:
+    """Top-level ollama processes on this host (their runners are children)."""
+    global _ollama_pids, _ollama_scanned_at
+    alive = [pid for pid in _ollama_pids if (PROC / str(pid)).exists()]
+    if alive or time.time() - _ollama_scanned_at < OLLAMA_RESCAN_SECONDS:
+        _ollama_pids = alive
+        return alive
+    _ollama_scanned_at = time.time()
+    found = set()
+    parents: Dict[int, int] = {}
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        stat = _read(entry / 'stat')
+        if not stat:
+            continue
+        # comm may contain spaces; it's wrapped in the last parentheses
+        comm = stat[stat.find('(') + 1:stat.rfind(')')]
+        if comm.startswith('ollama'):
+            pid = int(entry.name)
+            found.add(pid)
+            parents[pid] = int(stat[stat.rfind(')') + 2:].split()[1])
+    _ollama_pids = sorted(pid for pid in found if parents[pid] not in found)
+    return _ollama_pids
+
+
+def read_process_rss(root_pid: int, ollama: bool = True) -> Tuple[int, Optional[int]]:
+    """
+    RSS in MB of root_pid's process tree, and of local Ollama processes
+    (None when not asked for). Walks /proc/<pid>/task/*/children from the
+    roots rather than listing every process on the host.
+    """
+    ollama_mb = sum(read_tree_rss(pid) for pid in find_ollama_pids()) if ollama else None
+    return read_tree_rss(root_pid), ollama_mb
+
+
+def sample_host(root_pid: Optional[int] = None, ollama: bool = True) -> Dict[str, Any]:
+    """
+    One snapshot of memory, load and temperature. Missing sources are None.
+    Ollama RSS is only read when ollama is True (it runs on this host).
+    """
+    meminfo = read_meminfo()
+    temps = read_temperatures()
+    worker_rss, ollama_rss = (None, None)
+    if PROC.exists():
+        worker_rss, ollama_rss = read_process_rss(root_pid or os.getpid(), ollama)
+    return {
+        'memTotalMb': meminfo.get('MemTotal'),
+        'memAvailableMb': meminfo.get('MemAvailable'),
+        'load': read_loadavg(),
+        'temperatures': temps,
+        'maxTemperature': max(temps.values()) if temps else None,
+        'workerRssMb': worker_rss,
+        'ollamaRssMb': ollama_rss
+    }
+
+
+class ResourceGovernor:
+    """
+    Adjusts per-stage concurrency from host pressure.
+
+    Every `interval` seconds the host is sampled and classified as ok,
+    elevated (low available memory, hot, or loaded) or critical (very low
+    memory or near thermal shutdown). Elevated lowers every stage limit by
+    one, critical drops them to one, and after `recover_seconds` of ok
+    samples limits grow back by one step toward their configured base.
+    Lighthouse starts its own Chrome, so it is held back while the local
+    LLM is generating, or while it is loaded and memory is tight, for at
+    most `max_defer_seconds`.
+    """
+
+    def __init__(
+        self,
+        base_limits: Dict[str, int],
+        mem_low_mb: int = 800,
+        mem_critical_mb: int = 400,
+        temp_high_c: float = 75.0,
+        temp_critical_c: float = 85.0,
+        load_high: float = 1.5,
+        recover_seconds: int = 60,
+        llm_local: bool = True,
+        llm_resident_mb: int = 500,
+        max_defer_seconds: int = 300,
+        interval: int = 5
+    ):
+        """Initialize governor with limits at their base values."""
+        self.base_limits = dict(base_limits)
+        self.limits = dict(base_limits)
+        self.mem_low_mb = mem_low_mb
+        self.mem_critical_mb = mem_critical_mb
+        self.temp_high_c = temp_high_c
+        self.temp_critical_c = temp_critical_c
+        self.load_high = load_high
+        self.recover_seconds = recover_seconds
+        self.llm_local = llm_local
+        self.llm_resident_mb = llm_resident_mb
+        self.max_defer_seconds = max_defer_seconds
+        self.interval = interval
+        self.level = 'ok'
+        self.sample: Dict[str, Any] = {}
+        self.active: Dict[str, int] = {stage: 0 for stage in base_limits}
+        self._ok_since = time.time()
+        self._sampled_at = 0.0
+        self._deferring = False
+        self._lock = threading.Lock()
+        self._limiters: List['AdaptiveLimit'] = []
+
+    def pressure(self, sample: Dict[str, Any]) -> Tuple[str, List[str]]:
+        """Classify a sample, returning (level, reasons)."""
+        critical, elevated = [], []
+        available = sample.get('memAvailableMb')
+        if available is not None:
+            if available < self.mem_critical_mb:
+                critical.append(f"MemAvailable {available} MB < {self.mem_critical_mb} MB")
+            elif available < self.mem_low_mb:
+                elevated.append(f"MemAvailable {available} MB < {self.mem_low_mb} MB")
+        for zone, celsius in (sample.get('temperatures') or {}).items():
+            if celsius >= self.temp_critical_c:
+                critical.append(f"{zone} {celsius:.1f}C")
+            elif celsius >= self.temp_high_c:
+                elevated.append(f"{zone} {celsius:.1f}C")
+        load = sample.get('load')
+        if load is not None and load >= self.load_high:
+            elevated.append(f"load {load:.2f}/cpu")
+        if critical:
+            return 'critical', critical + elevated
+        if elevated:
+            return 'elevated', elevated
+        return 'ok', []
+
+    def update(self, sample: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """Sample the host (unless given a sample) and adjust the limits."""
+        sample = sample if sample is not None else sample_host(ollama=self.llm_local)
+        level, reasons = self.pressure(sample)
+        now = time.time()
+        with self._lock:
+            self.sample = sample
+            self._sampled_at = now
+            previous = dict(self.limits)
+            if level == 'critical':
+                self.limits = {stage: 1 for stage in self.limits}
+            elif level == 'elevated':
+                self.limits = {stage: max(1, limit - 1) for stage, limit in self.limits.items()}
+            if level != 'ok':
+                self._ok_since = now
+            elif now - self._ok_since >= self.recover_seconds:
+                self.limits = {
+                    stage: min(self.base_limits[stage], limit + 1)
+                    for stage, limit in self.limits.items()
+                }
+                self._ok_since = now
+            changed = {stage: (previous[stage], limit) for stage, limit in self.limits.items() if previous[stage] != limit}
+            level_changed = level != self.level
+            self.level = level
+
+        if changed or level_changed:
+            moves = ', '.join(f"{stage} {old}->{new}" for stage, (old, new) in changed.items())
+            logger.info(
+                f"Governor {level}: {moves or 'limits unchanged'}"
+                f"{' (' + '; '.join(reasons) + ')' if reasons else ''} "
+                f"[worker RSS {sample.get('workerRssMb')} MB, ollama RSS {sample.get('ollamaRssMb')} MB]"
+            )
+        return dict(self.limits)
+
+    def _maybe_update(self):
+        if time.time() - self._sampled_at >= self.interval:
+            self.update()
+
+    def llm_resident(self) -> bool:
+        """True while a local model is generating, or loaded and memory is tight."""
+        if not self.llm_local:
+            return False
+        if self.active.get('llm', 0) > 0:
+            return True
+        ollama_rss = self.sample.get('ollamaRssMb') or 0
+        return ollama_rss >= self.llm_resident_mb and self.level != 'ok'
+
+    def allows(self, stage: str, deferred_since: Optional[float] = None) -> bool:
+        """True if one more `stage` may start now."""
+        if self.active.get(stage, 0) >= self.limits.get(stage, 1):
+            return False
+        if stage == 'lighthouse' and self.llm_resident():
+            waited = time.time() - (deferred_since or time.time())
+            if waited < self.max_defer_seconds:
+                if not self._deferring:
+                    self._deferring = True
+                    logger.info(
+                        f"Governor deferring Lighthouse while LLM is resident "
+                        f"(ollama RSS {self.sample.get('ollamaRssMb')} MB, level {self.level})"
+                    )
+                return False
+            logger.info(f"Governor releasing Lighthouse after {waited:.0f}s deferral")
+        if stage == 'lighthouse':
+            self._deferring = False
+        return True
+
+    def wait_for(self, stage: str):
+        """
+        Blocking admission for the sync worker, which runs one stage at a
+        time: waits out critical pressure and Lighthouse deferral.
+        """
+        started = time.time()
+        while True:
+            self._maybe_update()
+            if time.time() - started >= self.max_defer_seconds:
+                logger.warning(f"Governor admitting {stage} after {self.max_defer_seconds}s under {self.level} pressure")
+                return
+            if self.level != 'critical' and self.allows(stage, deferred_since=started):
+                return
+            time.sleep(self.interval)
+
+    @contextmanager
+    def hold(self, stage: str):
+        """
+        Sync counterpart of limiter(): wait for admission with wait_for()
+        and count the stage as active for the block, so its limit and the
+        Lighthouse deferral see it.
+        """
+        self.wait_for(stage)
+        with self._lock:
+            self.active[stage] = self.active.get(stage, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active[stage] -= 1
+
+    def limiter(self, stage: str) -> 'AdaptiveLimit':
+        """Asyncio limiter for stage that follows this governor's limits."""
+        limit = AdaptiveLimit(self, stage)
+        self._limiters.append(limit)
+        return limit
+
+    async def run_async(self):
+        """Sample periodically and wake waiting limiters. Runs until cancelled."""
+        while True:
+            await asyncio.to_thread(self.update)
+            for limit in self._limiters:
+                await limit.notify()
+            await asyncio.sleep(self.interval)
+
+
+class AdaptiveLimit:
+    """
+    Semaphore-like asyncio limiter whose capacity is the governor's
+    current limit for a stage. Supports `async with`, acquire/release
+    and locked() like asyncio.Semaphore.
+    """
+
+    def __init__(self, governor: ResourceGovernor, stage: str):
+        """Initialize limiter; the condition is created on first use in the loop."""
+        self.governor = governor
+        self.stage = stage
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _cond(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def locked(self) -> bool:
+        """True if acquire() would wait."""
+        return not self.governor.allows(self.stage)
+
+    async def acquire(self):
+        """Wait until the governor admits one more of this stage."""
+        deferred_since = time.time()
+        async with self._cond():
+            await self._cond().wait_for(lambda: self.governor.allows(self.stage, deferred_since))
+            self.governor.active[self.stage] += 1
+
+    def release(self):
+        """Give back a slot and wake waiters of every stage (an LLM release can admit Lighthouse)."""
+        self.governor.active[self.stage] -= 1
+        loop = asyncio.get_running_loop()
+        for limit in self.governor._limiters:
+            loop.create_task(limit.notify())
+
+    async def notify(self):
+        """Re-check waiters after a release or a limit change."""
+        async with self._cond():
+            self._cond().notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
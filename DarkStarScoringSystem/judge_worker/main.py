@@ -1,24 +1,48 @@
 """Main worker loop for DSSS."""
+import argparse
+import importlib
 import logging
+import random
+import shutil
+import signal
 import time
 import socket
-from datetime import datetime
+from contextlib import nullcontext
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
 import sys
-from pathlib import Path
 
 # Add parent directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
-from judge_worker.firebase_client import FirebaseClient
-from judge_worker.playwright_capture import PlaywrightCapture
-from judge_worker.ollama_judge import OllamaJudge
-from judge_worker.scoring import ScoringEngine
-from audits.lighthouse_runner import LighthouseRunner
-from audits.axe_runner import AxeRunner
+from judge_worker.dedupe import canonicalize_url, url_error
+from judge_worker.cluster import ClusterMembership, default_worker_id
+from judge_worker.scheduler import QueueScheduler, StageTimer, parse_class_weights
+from judge_worker.governor import ResourceGovernor, is_local_host
+from judge_worker.checkpoint import CheckpointStore, JobCheckpoint, drop_missing_paths, parse_retry_policy, retry_due
+from judge_worker.profiling import JobProfiler, profile_mode
+
+# Heavy components (Firebase, Playwright, Ollama/jsonschema, Lighthouse) are
+# imported where they are first used so the worker reaches its first poll,
+# and `--check`, without loading SDKs the current command doesn't need.
+COMPONENT_MODULES = [
+    ('config', 'config'),
+    ('firebase', 'judge_worker.firebase_client'),
+    ('playwright', 'judge_worker.playwright_capture'),
+    ('ollama', 'judge_worker.ollama_judge'),
+    ('preflight', 'judge_worker.preflight'),
+    ('scoring', 'judge_worker.scoring'),
+    ('evidence', 'judge_worker.evidence_bundle'),
+    ('visual', 'judge_worker.visual_features'),
+    ('similarity', 'judge_worker.similarity'),
+    ('reaudit', 'judge_worker.reaudit'),
+    ('lighthouse', 'audits.lighthouse_runner'),
+    ('axe', 'audits.axe_runner')
+]
 
 # Configure logging
 logging.basicConfig(
@@ -36,24 +60,196 @@ class JudgeWorker:
     
     def __init__(self):
         """Initialize worker with all components."""
+        from judge_worker.firebase_client import FirebaseClient
+        from judge_worker.ollama_judge import OllamaJudge, parse_ensemble
+        from judge_worker.ollama_pool import OllamaPool
+        from judge_worker.scoring import ScoringEngine
+        from judge_worker.preflight import PreflightChecker
+        from judge_worker.dedupe import SharedAuditCache
+        
         Config.validate()
+        Config.ensure_dirs()
         
-        self.worker_id = socket.gethostname()
+        # Claims store the worker id; keep the plain hostname outside cluster mode
+        self.worker_id = Config.WORKER_ID or (
+            default_worker_id() if Config.CLUSTER_ENABLED else socket.gethostname()
+        )
         self.firebase = FirebaseClient(
             Config.FIREBASE_PROJECT_ID,
             Config.FIREBASE_CREDENTIALS_JSON,
             Config.STORAGE_BUCKET
         )
-        self.ollama = OllamaJudge(Config.OLLAMA_HOST, Config.OLLAMA_MODEL)
+        ensemble = parse_ensemble(Config.OLLAMA_ENSEMBLE)
+        self.ollama_pool = OllamaPool(
+            Config.OLLAMA_HOSTS,
+            model=Config.OLLAMA_MODEL,
+            models=[member['model'] for member in ensemble],
+            failure_threshold=Config.OLLAMA_CIRCUIT_FAILURES,
+            reset_seconds=Config.OLLAMA_CIRCUIT_RESET_SECONDS,
+            health_timeout=Config.OLLAMA_HEALTH_TIMEOUT_SECONDS
+        )
+        self.ollama = OllamaJudge(
+            Config.OLLAMA_HOST,
+            Config.OLLAMA_MODEL,
+            pool=self.ollama_pool,
+            ensemble=ensemble,
+            aggregation=Config.OLLAMA_ENSEMBLE_AGGREGATION,
+            quorum=Config.OLLAMA_ENSEMBLE_QUORUM,
+            agreement_tolerance=Config.OLLAMA_ENSEMBLE_TOLERANCE
+        )
         self.scoring = ScoringEngine()
+        self.preflight = PreflightChecker(
+            timeout=Config.PREFLIGHT_TIMEOUT_SECONDS,
+            max_redirects=Config.PREFLIGHT_MAX_REDIRECTS,
+            dns_cache_ttl=Config.PREFLIGHT_DNS_CACHE_SECONDS
+        )
+        self.shared_audits = SharedAuditCache(ttl_seconds=Config.DEDUPE_WINDOW_SECONDS)
+        self.scheduler = QueueScheduler(
+            parse_class_weights(Config.SCHEDULER_CLASS_WEIGHTS),
+            max_wait_seconds=Config.SCHEDULER_MAX_WAIT_SECONDS,
+            half_life_seconds=Config.SCHEDULER_HALF_LIFE_SECONDS,
+            audits_cached=self._audits_cached
+        )
+        self._last_queue_report = time.time()
+        self.retry_policy = parse_retry_policy(Config.RETRY_POLICY)
+        self.checkpoints = None
+        if Config.CHECKPOINT_ENABLED:
+            self.checkpoints = CheckpointStore(Config.CHECKPOINT_DIR)
+            pruned = self.checkpoints.prune(Config.CHECKPOINT_TTL_HOURS * 3600)
+            if pruned:
+                logger.info(f"Pruned {pruned} stale checkpoints")
+        # Set by SIGUSR1: profile the next job
+        self._profile_next = False
+        self.similarity = None
+        if Config.SIMILARITY_ENABLED:
+            from judge_worker.similarity import SimilarityIndex
+            self.similarity = SimilarityIndex(
+                Config.SIMILARITY_INDEX_PATH,
+                max_phash_distance=Config.SIMILARITY_MAX_PHASH_DISTANCE,
+                min_text_similarity=Config.SIMILARITY_MIN_TEXT
+            )
+        self.governor = None
+        if Config.GOVERNOR_ENABLED:
+            self.governor = ResourceGovernor(
+                {
+                    'jobs': Config.ASYNC_MAX_JOBS,
+                    'browser': Config.BROWSER_CONCURRENCY,
+                    'lighthouse': Config.LIGHTHOUSE_CONCURRENCY,
+                    'llm': Config.LLM_CONCURRENCY
+                },
+                mem_low_mb=Config.GOVERNOR_MEM_LOW_MB,
+                mem_critical_mb=Config.GOVERNOR_MEM_CRITICAL_MB,
+                temp_high_c=Config.GOVERNOR_TEMP_HIGH_C,
+                temp_critical_c=Config.GOVERNOR_TEMP_CRITICAL_C,
+                load_high=Config.GOVERNOR_LOAD_HIGH,
+                recover_seconds=Config.GOVERNOR_RECOVER_SECONDS,
+                llm_local=any(is_local_host(host) for host in Config.OLLAMA_HOSTS),
+                llm_resident_mb=Config.GOVERNOR_LLM_RESIDENT_MB,
+                max_defer_seconds=Config.GOVERNOR_MAX_DEFER_SECONDS,
+                interval=Config.GOVERNOR_INTERVAL_SECONDS
+            )
+        self.cluster = None
+        if Config.CLUSTER_ENABLED:
+            self.cluster = ClusterMembership(
+                self.firebase,
+                self.worker_id,
+                heartbeat_interval=Config.HEARTBEAT_INTERVAL_SECONDS,
+                ttl_seconds=Config.HEARTBEAT_TTL_SECONDS,
+                steal_after_seconds=Config.SHARD_STEAL_AFTER_SECONDS,
+                info={
+                    'host': socket.gethostname(),
+                    'mode': Config.WORKER_MODE,
+                    'judgeVersion': Config.JUDGE_VERSION,
+                    'startedAt': datetime.now(timezone.utc)
+                }
+            )
         
         logger.info(f"Worker initialized: {self.worker_id}")
     
     def process_submission(self, submission: dict) -> bool:
         """
-        Process a single submission through the full pipeline.
-        Returns True if successful, False otherwise.
+        Process a single submission through the full pipeline, profiled
+        when requested. Returns True if successful, False otherwise.
         """
+        profiler = self._start_profiler(submission)
+        if not profiler:
+            return self._process_submission(submission)
+        try:
+            return self._process_submission(submission)
+        finally:
+            profiler.stop()
+            self._upload_profile(profiler)
+    
+    def _start_profiler(self, submission: dict) -> Optional[JobProfiler]:
+        """Started profiler when this job is profiled; None otherwise or if it can't start."""
+        mode = self._profile_mode(submission)
+        if not mode:
+            return None
+        try:
+            profiler = JobProfiler(
+                submission['id'],
+                Config.ARTIFACTS_DIR,
+                mode=mode,
+                interval_ms=Config.PROFILE_INTERVAL_MS,
+                memory=Config.PROFILE_MEMORY,
+                memory_frames=Config.PROFILE_MEMORY_FRAMES
+            )
+            profiler.start()
+            return profiler
+        except Exception as e:
+            logger.warning(f"Could not start profiler for {submission['id']}, running unprofiled: {e}")
+            return None
+    
+    def _upload_profile(self, profiler: JobProfiler):
+        """Upload profile artifacts next to the job's evidence and link them from the entry."""
+        submission_id = profiler.submission_id
+        try:
+            urls = {
+                path.name: self.firebase.upload_artifact(str(path), f"submissions/{submission_id}/profile/{path.name}")
+                for path in profiler.paths
+            }
+            if urls:
+                self.firebase.save_profile(submission_id, {
+                    'mode': profiler.mode,
+                    'elapsedSeconds': round(profiler.elapsed, 1),
+                    'capturedAt': datetime.now(timezone.utc),
+                    'artifacts': urls
+                })
+        except Exception as e:
+            logger.warning(f"Error uploading profile for {submission_id}: {e}")
+    
+    def _profile_mode(self, submission: dict) -> Optional[str]:
+        """Profiler mode for this job, None when it isn't profiled."""
+        requested = profile_mode(submission.get('profile'), Config.PROFILE_MODE)
+        if requested:
+            return requested
+        if self._profile_next:
+            self._profile_next = False
+            return Config.PROFILE_MODE
+        if Config.PROFILE_ENABLED or random.random() < Config.PROFILE_SAMPLE_RATE:
+            return Config.PROFILE_MODE
+        return None
+    
+    def _request_profile(self, signum, frame):
+        """SIGUSR1 handler."""
+        self._profile_next = True
+        logger.info("Profiling requested for the next job")
+    
+    def _process_submission(self, submission: dict) -> bool:
+        """Run the pipeline for one submission and settle its scheduler charge however it ends."""
+        timer = StageTimer()
+        success = False
+        try:
+            success = self._run_pipeline(submission, timer)
+            return success
+        finally:
+            self.scheduler.finished(submission, timer.ms, completed=success)
+    
+    def _run_pipeline(self, submission: dict, timer: StageTimer) -> bool:
+        """Run the pipeline for one submission, timing its stages with timer."""
+        from judge_worker.ollama_pool import NoHealthyBackendError
+        from judge_worker.preflight import PreflightError
+        
         submission_id = submission['id']
         url = submission.get('url')
         category = submission.get('category', 'Unknown')
@@ -62,107 +258,537 @@ class JudgeWorker:
             logger.error(f"Submission {submission_id} has no URL")
             self._write_error(submission_id, "No URL provided", "validation")
             return False
+        if url_error(url):
+            self._write_invalid_url(submission_id, url)
+            return False
         
         logger.info(f"Processing submission {submission_id}: {url}")
+        checkpoint = self._checkpoint(submission)
         
         try:
-            # Step 1: Capture evidence with Playwright
-            with PlaywrightCapture(Config.ARTIFACTS_DIR) as capture:
-                evidence = capture.capture(url, submission_id)
-            
-            # Step 2: Run Lighthouse audit
-            lighthouse_runner = LighthouseRunner(Config.ARTIFACTS_DIR)
-            lighthouse_metrics = lighthouse_runner.run_audit(url, submission_id)
+            # Step 0: Cheap reachability check before any browser is started
+            preflight = None
+            if Config.PREFLIGHT_ENABLED:
+                with checkpoint.running('preflight'), timer.stage('preflight'):
+                    preflight = self.preflight.check(url)
+                    if preflight['retryable']:
+                        raise PreflightError(preflight['error'], preflight['reason'], retryable=True)
+                if not preflight['ok']:
+                    self._write_preflight_error(submission_id, preflight)
+                    checkpoint.clear()
+                    return False
+                url = preflight['finalUrl']
             
-            # Step 3: Run axe-core audit (need to reload page)
-            # For now, we'll use the evidence from capture
-            # In a full implementation, we'd reload the page for axe
-            axe_summary = {
-                'axeViolationsCount': 0,  # Placeholder - would need page reload
-                'topViolations': []
-            }
-            
-            # Step 4: Calculate objective scores
-            objective_scores = self.scoring.calculate_objective_scores(
-                lighthouse_metrics,
-                axe_summary
-            )
-            
-            # Step 5: Get subjective scores from Ollama
-            ollama_result = self.ollama.judge(
-                url=url,
-                category=category,
-                extracted_structure=evidence['extracted'],
-                lighthouse_metrics=lighthouse_metrics,
-                axe_summary=axe_summary,
-                console_error_count=evidence.get('console_error_count', 0),
-                failed_request_count=evidence.get('failed_request_count', 0)
-            )
+            # Steps 1-3: Capture and objective audits, shared between entries
+            # that point at the same site
+            canonical_url = canonicalize_url(submission.get('url'))
+            with timer.stage('audits'):
+                if Config.DEDUPE_ENABLED:
+                    site, shared = self.shared_audits.get_or_compute(
+                        canonical_url,
+                        lambda: self._run_site_audits(url, submission, checkpoint),
+                        cacheable=self._site_audits_ok
+                    )
+                else:
+                    site, shared = self._run_site_audits(url, submission, checkpoint), False
+            if shared:
+                logger.info(
+                    f"Reusing capture and audits from {site['submissionId']} "
+                    f"for {submission_id} ({canonical_url})"
+                )
             
+            # Step 4: Get subjective scores from Ollama, unless the entry is
+            # an exact copy of one already judged in the same category
+            similar = self._find_similar(site, submission)
+            ollama_result = checkpoint.get('judge')
             if not ollama_result:
-                raise Exception("Ollama judgment failed")
+                with checkpoint.running('judge'), timer.stage('judge'):
+                    ollama_result = similar['judgment']
+                    if not ollama_result:
+                        with self._admit('llm'):
+                            ollama_result = self.ollama.judge(**self._judge_inputs(site, url, category))
+                    if not ollama_result:
+                        raise Exception("Ollama judgment failed")
+                checkpoint.save('judge', ollama_result)
             
-            # Step 6: Combine scores
-            all_scores = self.scoring.calculate_total_score(
-                objective_scores,
-                ollama_result['scores']
-            )
+            # Step 5: Upload artifacts (once per site)
+            artifacts = checkpoint.get('upload')
+            if artifacts is None:
+                with checkpoint.running('upload'), timer.stage('upload'):
+                    artifacts = self._upload_artifacts(site)
+                if site['artifacts'] is not None:
+                    checkpoint.save('upload', artifacts)
             
-            # Step 7: Upload artifacts
-            artifacts = {}
+            # Steps 6-8: Combine scores and write results
+            with checkpoint.running('write'):
+                self._write_success(
+                    submission, site, shared, canonical_url, preflight, ollama_result, artifacts, timer.ms, similar
+                )
+            checkpoint.clear()
+            return True
+        
+        except NoHealthyBackendError as e:
+            self._requeue(submission_id, e)
+            return False
+        
+        except PreflightError as e:
+            # Timeouts, resolver hiccups and 429/5xx: try again later
+            logger.warning(f"Preflight for {submission_id} failed, retrying later: {e}")
+            self._retry_or_fail(submission_id, checkpoint, e, details={'reason': e.reason})
+            return False
+        
+        except Exception as e:
+            logger.error(f"Error processing submission {submission_id}: {e}", exc_info=True)
+            self._retry_or_fail(submission_id, checkpoint, e)
+            return False
+    
+    def _checkpoint(self, submission: dict) -> JobCheckpoint:
+        """Checkpoint state for a claimed submission, logging what it resumes."""
+        if not self.checkpoints:
+            # Still counts attempts for the retry policy
+            return JobCheckpoint(submission, Config.JUDGE_VERSION)
+        checkpoint = JobCheckpoint(
+            submission,
+            Config.JUDGE_VERSION,
+            store=self.checkpoints,
+            publish=self.firebase.save_checkpoint,
+            worker_id=self.worker_id
+        )
+        if checkpoint.resumed:
+            logger.info(f"Resuming {submission['id']} after {', '.join(checkpoint.resumed)}")
+        return checkpoint
+    
+    def _retry_or_fail(
+        self,
+        submission_id: str,
+        checkpoint: JobCheckpoint,
+        error: Exception,
+        details: Optional[dict] = None
+    ):
+        """
+        Charge a failure to the stage it happened in. The job goes back to
+        the queue with backoff until that stage runs out of attempts, then
+        the error is written (with details, if given).
+        """
+        stage, attempts, retry_at = checkpoint.failed(self.retry_policy, Config.RETRY_MAX_BACKOFF_SECONDS)
+        if retry_at is not None:
             try:
-                # Upload screenshots
-                if 'desktop' in evidence['screenshots']:
-                    desktop_url = self.firebase.upload_artifact(
-                        evidence['screenshots']['desktop'],
-                        f"submissions/{submission_id}/desktop.png"
-                    )
-                    artifacts['screenshotDesktopUrl'] = desktop_url
-                
-                if 'mobile' in evidence['screenshots']:
-                    mobile_url = self.firebase.upload_artifact(
-                        evidence['screenshots']['mobile'],
-                        f"submissions/{submission_id}/mobile.png"
-                    )
-                    artifacts['screenshotMobileUrl'] = mobile_url
-                
-                # Upload Lighthouse report if available
-                if lighthouse_metrics.get('lighthouseReportPath'):
-                    report_url = self.firebase.upload_artifact(
-                        lighthouse_metrics['lighthouseReportPath'],
-                        f"submissions/{submission_id}/lighthouse.json"
-                    )
-                    artifacts['lighthouseReportUrl'] = report_url
-                
+                self.firebase.schedule_retry(
+                    submission_id, Config.JUDGE_VERSION, stage, attempts, retry_at, str(error),
+                    reset=checkpoint.reset_remote
+                )
+                return
             except Exception as e:
-                logger.warning(f"Error uploading artifacts: {e}")
-            
-            # Step 8: Prepare metrics
-            metrics = self.scoring.prepare_metrics(
+                logger.error(f"Error scheduling retry of {submission_id}, writing the error instead: {e}", exc_info=True)
+        self._write_error(submission_id, str(error), stage, details={**(details or {}), 'attempts': attempts})
+        checkpoint.clear()
+    
+    def _judge_inputs(self, site: dict, url: str, category: str) -> dict:
+        """Keyword arguments for OllamaJudge.judge from a site's audits."""
+        evidence = site['evidence']
+        return {
+            'url': url,
+            'category': category,
+            'extracted_structure': evidence['extracted'],
+            'lighthouse_metrics': site['lighthouse_metrics'],
+            'axe_summary': site['axe_summary'],
+            'console_error_count': evidence.get('console_error_count', 0),
+            'failed_request_count': evidence.get('failed_request_count', 0),
+            'visual_features': evidence.get('visual_features')
+        }
+    
+    def _write_success(
+        self,
+        submission: dict,
+        site: dict,
+        shared: bool,
+        canonical_url: str,
+        preflight: Optional[dict],
+        ollama_result: dict,
+        artifacts: dict,
+        stage_ms: dict,
+        similar: dict
+    ):
+        """Combine objective and subjective scores and write the result."""
+        submission_id = submission['id']
+        evidence = site['evidence']
+        lighthouse_metrics = site['lighthouse_metrics']
+        axe_summary = site['axe_summary']
+        
+        # Step 6: Calculate objective scores and combine
+        objective_scores = self.scoring.calculate_objective_scores(
+            lighthouse_metrics,
+            axe_summary
+        )
+        all_scores = self.scoring.calculate_total_score(
+            objective_scores,
+            ollama_result['scores']
+        )
+        
+        # Step 7: Prepare metrics
+        metrics = self.scoring.prepare_metrics(
+            lighthouse_metrics,
+            axe_summary,
+            evidence.get('console_error_count', 0),
+            evidence.get('failed_request_count', 0),
+            judge_ensemble=ollama_result.get('ensemble'),
+            page_structure=evidence.get('extracted'),
+            visual_features=evidence.get('visual_features')
+        )
+        metrics['canonicalUrl'] = canonical_url
+        metrics['stageMs'] = stage_ms
+        if ollama_result.get('prompt'):
+            metrics['promptTokens'] = ollama_result['prompt']['tokens']
+            metrics['promptBuildMs'] = ollama_result['prompt']['buildMs']
+        metrics['possibleTemplate'] = bool(ollama_result.get('flags', {}).get('possibleTemplate')) or any(
+            match['similarity'] >= Config.SIMILARITY_TEMPLATE_THRESHOLD and match['url'] != canonical_url
+            for match in similar['matches']
+        )
+        if similar['matches']:
+            metrics['similarEntries'] = similar['matches']
+        if similar['reusedFrom']:
+            metrics['judgmentReusedFrom'] = similar['reusedFrom']
+        if shared:
+            metrics['sharedAuditsFrom'] = site['submissionId']
+        if preflight:
+            metrics['preflightMs'] = preflight['elapsedMs']
+            metrics['redirectCount'] = len(preflight['redirectChain'])
+            if preflight['finalUrl'] != submission.get('url'):
+                metrics['finalUrl'] = preflight['finalUrl']
+        
+        # Step 8: Write results to Firestore
+        self.firebase.write_results(
+            submission_id=submission_id,
+            scores=all_scores,
+            notes=ollama_result['notes'],
+            artifacts=artifacts,
+            metrics=metrics
+        )
+        
+        self._index_similarity(submission, canonical_url, similar, ollama_result)
+        logger.info(f"Successfully processed submission {submission_id}")
+    
+    def _find_similar(self, site: dict, submission: dict) -> dict:
+        """
+        Look the site up in the similarity index.
+        Returns the fingerprint, nearest prior entries and, when reuse is
+        enabled, the judgment of an identical entry in the same category.
+        """
+        similar = {'fingerprint': None, 'matches': [], 'judgment': None, 'reusedFrom': None}
+        if not self.similarity:
+            return similar
+        try:
+            similar['fingerprint'] = self.similarity.fingerprint(site['evidence'])
+            similar['matches'] = self.similarity.query(similar['fingerprint'], exclude=(submission['id'],))
+        except Exception as e:
+            logger.warning(f"Similarity lookup failed for {submission['id']}: {e}")
+            return similar
+        
+        if Config.SIMILARITY_REUSE_EXACT:
+            for match in similar['matches']:
+                record = self.similarity.get(match['submissionId']) or {}
+                if (
+                    self.similarity.is_exact(match)
+                    and record.get('judgment')
+                    and record.get('category') == submission.get('category', 'Unknown')
+                    and record.get('judgeVersion') == Config.JUDGE_VERSION
+                ):
+                    logger.info(f"Reusing judgment of identical entry {match['submissionId']} for {submission['id']}")
+                    similar['judgment'] = record['judgment']
+                    similar['reusedFrom'] = match['submissionId']
+                    break
+        return similar
+    
+    def _index_similarity(self, submission: dict, canonical_url: str, similar: dict, ollama_result: dict):
+        """Add a judged entry to the similarity index."""
+        if not (self.similarity and similar['fingerprint']):
+            return
+        try:
+            self.similarity.add(
+                submission['id'],
+                canonical_url,
+                similar['fingerprint'],
+                extra={
+                    'category': submission.get('category', 'Unknown'),
+                    'judgeVersion': Config.JUDGE_VERSION,
+                    'judgment': {
+                        'scores': ollama_result['scores'],
+                        'notes': ollama_result['notes'],
+                        'flags': ollama_result.get('flags', {})
+                    }
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Error adding {submission['id']} to similarity index: {e}")
+    
+    def _requeue(self, submission_id: str, error: Exception):
+        """Put a job back in the queue after a failure that isn't the site's fault."""
+        logger.warning(f"No Ollama backend for {submission_id}, requeueing: {error}")
+        try:
+            self.firebase.requeue_submission(submission_id, str(error))
+        except Exception:
+            self._write_error(submission_id, str(error), "judging")
+    
+    def _run_site_audits(self, url: str, submission: dict, checkpoint: Optional[JobCheckpoint] = None) -> dict:
+        """
+        Run the site-level stages: capture, Lighthouse and axe.
+        Nothing here depends on the entry's category, so the result can be
+        shared by every entry for the same canonical URL. Stages saved in
+        checkpoint are not run again.
+        """
+        from judge_worker.playwright_capture import PlaywrightCapture
+        from audits.lighthouse_runner import LighthouseRunner
+        
+        submission_id = submission['id']
+        checkpoint = checkpoint or JobCheckpoint(submission, Config.JUDGE_VERSION)
+        
+        # Step 1: Capture evidence with Playwright
+        evidence = self._resumed_capture(checkpoint)
+        if evidence is None:
+            with checkpoint.running('capture'):
+                with PlaywrightCapture(Config.ARTIFACTS_DIR) as capture:
+                    evidence = capture.capture(url, submission_id)
+                evidence['visual_features'] = self._analyze_visuals(evidence)
+            checkpoint.save('capture', evidence)
+        
+        # Step 2: Run Lighthouse audit (its Chrome waits out memory pressure)
+        lighthouse_metrics = self._resumed_lighthouse(checkpoint)
+        if lighthouse_metrics is None:
+            with checkpoint.running('lighthouse'):
+                lighthouse_runner = LighthouseRunner(
+                    Config.ARTIFACTS_DIR,
+                    keep_full_report=Config.LIGHTHOUSE_FULL_REPORT,
+                    runs=Config.LIGHTHOUSE_RUNS,
+                    cores_per_run=Config.LIGHTHOUSE_CORES_PER_RUN,
+                    pin_cpus=Config.LIGHTHOUSE_PIN_CPUS
+                )
+                with self._admit('lighthouse'):
+                    lighthouse_metrics = lighthouse_runner.run_audit(url, submission_id)
+            self._save_lighthouse(checkpoint, lighthouse_metrics)
+        
+        # Step 3: Run axe-core audit
+        axe_summary = checkpoint.get('axe')
+        if axe_summary is None:
+            with checkpoint.running('axe'):
+                axe_summary = self._run_axe(evidence)
+            checkpoint.save('axe', axe_summary)
+        
+        # Bundle the evidence so the job can be replayed offline later
+        bundle_path = self._write_bundle(submission, evidence, lighthouse_metrics, axe_summary)
+        
+        return {
+            'submissionId': submission_id,
+            'url': url,
+            'evidence': evidence,
+            'lighthouse_metrics': lighthouse_metrics,
+            'axe_summary': axe_summary,
+            'bundle_path': bundle_path,
+            'artifacts': None
+        }
+    
+    @staticmethod
+    def _site_audits_ok(site: dict) -> bool:
+        """
+        False when Lighthouse or axe failed. Such results aren't shared, so
+        a duplicate entry runs the audits again instead of scoring zeros.
+        """
+        if not site['lighthouse_metrics'].get('lighthouseSummaryPath'):
+            return False
+        axe_summary = site['axe_summary']
+        return not ('axeReportPath' in axe_summary and not axe_summary['axeReportPath'])
+    
+    def _admit(self, stage: str):
+        """Governor admission for a stage, counted as active while the block runs."""
+        return self.governor.hold(stage) if self.governor else nullcontext()
+    
+    def _resumed_capture(self, checkpoint: JobCheckpoint) -> Optional[dict]:
+        """Checkpointed capture evidence, if its screenshots are still on disk."""
+        evidence = checkpoint.get('capture')
+        if evidence is None:
+            return None
+        screenshots = evidence.get('screenshots') or {}
+        if not screenshots or not all(Path(path).exists() for path in screenshots.values()):
+            return None
+        return evidence
+    
+    def _resumed_lighthouse(self, checkpoint: JobCheckpoint) -> Optional[dict]:
+        """Checkpointed Lighthouse metrics, without paths to files that are gone."""
+        metrics = checkpoint.get('lighthouse')
+        return drop_missing_paths(metrics) if metrics is not None else None
+    
+    def _save_lighthouse(self, checkpoint: JobCheckpoint, lighthouse_metrics: dict):
+        """Checkpoint a Lighthouse result unless the run failed, so a retry runs it again."""
+        if lighthouse_metrics.get('lighthouseSummaryPath'):
+            checkpoint.save('lighthouse', lighthouse_metrics)
+    
+    def _analyze_visuals(self, evidence: dict) -> dict:
+        """Numeric design features from the captured screenshots."""
+        from judge_worker.viewports import VIEWPORTS
+        from judge_worker.visual_features import analyze_screenshots
+        
+        return analyze_screenshots(evidence['screenshots'], VIEWPORTS)
+    
+    def _run_axe(self, evidence: dict) -> dict:
+        """Return the axe-core summary for captured evidence."""
+        # Axe needs a live page; for now we use the evidence from capture.
+        # In a full implementation, we'd reload the page for axe
+        return {
+            'axeViolationsCount': 0,  # Placeholder - would need page reload
+            'topViolations': []
+        }
+    
+    def _write_bundle(
+        self,
+        submission: dict,
+        evidence: dict,
+        lighthouse_metrics: dict,
+        axe_summary: dict
+    ) -> Optional[Path]:
+        """Write the evidence bundle, returning its path or None on failure."""
+        from judge_worker.evidence_bundle import EvidenceBundle
+        
+        bundle_path = Config.ARTIFACTS_DIR / f"{submission['id']}_evidence.zip"
+        try:
+            EvidenceBundle.write(
+                bundle_path,
+                submission,
+                evidence,
                 lighthouse_metrics,
                 axe_summary,
-                evidence.get('console_error_count', 0),
-                evidence.get('failed_request_count', 0)
+                judge_version=Config.JUDGE_VERSION
             )
+            return bundle_path
+        except Exception as e:
+            logger.warning(f"Error writing evidence bundle: {e}")
+            return None
+    
+    def _upload_artifacts(self, site: dict) -> dict:
+        """
+        Upload screenshots, reports and the evidence bundle for a site.
+        Uploads happen once; later entries sharing the site reuse the URLs.
+        """
+        if site['artifacts'] is not None:
+            return dict(site['artifacts'])
+        
+        submission_id = site['submissionId']
+        evidence = site['evidence']
+        lighthouse_metrics = site['lighthouse_metrics']
+        artifacts = {}
+        try:
+            # Upload screenshots
+            if 'desktop' in evidence['screenshots']:
+                desktop_url = self.firebase.upload_artifact(
+                    evidence['screenshots']['desktop'],
+                    f"submissions/{submission_id}/desktop.png"
+                )
+                artifacts['screenshotDesktopUrl'] = desktop_url
             
-            # Step 9: Write results to Firestore
-            self.firebase.write_results(
-                submission_id=submission_id,
-                scores=all_scores,
-                notes=ollama_result['notes'],
-                artifacts=artifacts,
-                metrics=metrics
-            )
+            if 'mobile' in evidence['screenshots']:
+                mobile_url = self.firebase.upload_artifact(
+                    evidence['screenshots']['mobile'],
+                    f"submissions/{submission_id}/mobile.png"
+                )
+                artifacts['screenshotMobileUrl'] = mobile_url
             
-            logger.info(f"Successfully processed submission {submission_id}")
-            return True
+            # Upload the Lighthouse summary, and the full report when it was kept
+            if lighthouse_metrics.get('lighthouseSummaryPath'):
+                summary_url = self.firebase.upload_artifact(
+                    lighthouse_metrics['lighthouseSummaryPath'],
+                    f"submissions/{submission_id}/lighthouse-summary.json"
+                )
+                artifacts['lighthouseSummaryUrl'] = summary_url
+            
+            if lighthouse_metrics.get('lighthouseReportPath'):
+                report_url = self.firebase.upload_artifact(
+                    lighthouse_metrics['lighthouseReportPath'],
+                    f"submissions/{submission_id}/lighthouse.json"
+                )
+                artifacts['lighthouseReportUrl'] = report_url
+            
+            if site['bundle_path']:
+                bundle_url = self.firebase.upload_artifact(
+                    str(site['bundle_path']),
+                    f"submissions/{submission_id}/evidence.zip"
+                )
+                artifacts['evidenceBundleUrl'] = bundle_url
+            
+            site['artifacts'] = artifacts
         
         except Exception as e:
-            logger.error(f"Error processing submission {submission_id}: {e}", exc_info=True)
-            self._write_error(submission_id, str(e), "processing")
+            # Leave site['artifacts'] unset so a later duplicate retries
+            logger.warning(f"Error uploading artifacts: {e}")
+        
+        return dict(artifacts)
+    
+    def _fetch_pending(self, limit: int) -> list:
+        """
+        Fetch up to limit pending submissions for this worker to claim.
+        In a cluster a wider window is read and narrowed to this node's shard;
+        with the scheduler on, both ends of the queue are read so entries
+        behind a bulk import are visible, and the window is put in fair order.
+        """
+        window_size = limit
+        if self.cluster:
+            window_size = limit * Config.SHARD_FETCH_FACTOR
+        if Config.SCHEDULER_ENABLED:
+            window_size = max(window_size, Config.SCHEDULER_WINDOW)
+        
+        # Failed jobs wait out their retry backoff; they are paged past, so
+        # a run of them at the head of the queue doesn't hide due entries
+        window = self.firebase.get_pending_submissions(limit=window_size, keep=retry_due)
+        if Config.SCHEDULER_ENABLED and len(window) == window_size:
+            seen = {submission['id'] for submission in window}
+            newest = self.firebase.get_pending_submissions(limit=window_size, newest_first=True, keep=retry_due)
+            window += [submission for submission in newest if submission['id'] not in seen]
+        
+        if self.cluster:
+            window = self.cluster.select(window, len(window))
+        if not Config.SCHEDULER_ENABLED:
+            return window[:limit]
+        return self.scheduler.order(window, limit)
+    
+    def _audits_cached(self, submission: dict) -> bool:
+        """True if capture and audits for the entry's site can be reused."""
+        url = submission.get('url')
+        if not (Config.DEDUPE_ENABLED and url) or url_error(url):
             return False
+        return self.shared_audits.get(canonicalize_url(url)) is not None
+    
+    def _job_started(self, submission: dict):
+        """Account a claimed submission to its priority class and flows."""
+        priority_class = self.scheduler.started(submission)
+        logger.info(f"Claimed submission {submission['id']} ({priority_class})")
+        if self.cluster:
+            self.cluster.note_claim()
+        if time.time() - self._last_queue_report >= Config.QUEUE_REPORT_INTERVAL_SECONDS:
+            self._last_queue_report = time.time()
+            report = self.scheduler.log_wait_report()
+            if self.cluster:
+                # Published with the next heartbeat
+                self.cluster.info['queueWait'] = report
+    
+    def _write_preflight_error(self, submission_id: str, preflight: dict):
+        """Record a failed pre-flight check on the entry."""
+        self._write_error(submission_id, preflight['error'], "preflight", details={
+            'reason': preflight['reason'],
+            'redirectChain': preflight['redirectChain'],
+            'status': preflight['status'],
+            'elapsedMs': preflight['elapsedMs']
+        })
     
-    def _write_error(self, submission_id: str, message: str, stage: str):
+    def _write_invalid_url(self, submission_id: str, url: str):
+        """Record an entry whose URL can't be parsed as a failed pre-flight check."""
+        error = url_error(url)
+        logger.error(f"Submission {submission_id} has an invalid URL {url!r}: {error}")
+        self._write_error(submission_id, f"Invalid URL {url}: {error}", "preflight", details={'reason': 'invalid_url'})
+    
+    def _write_error(
+        self,
+        submission_id: str,
+        message: str,
+        stage: str,
+        details: Optional[dict] = None
+    ):
         """Write error to Firestore."""
         try:
             self.firebase.write_results(
@@ -174,7 +800,7 @@ class JudgeWorker:
                 error={
                     'message': message,
                     'stage': stage,
-                    'details': {}
+                    'details': details or {}
                 }
             )
         except Exception as e:
@@ -184,10 +810,31 @@ class JudgeWorker:
         """Main worker loop - polls for pending submissions."""
         logger.info("Starting worker loop...")
         
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._request_profile)
+        if self.cluster:
+            self.cluster.start()
+        try:
+            self._poll_loop()
+        finally:
+            if self.cluster:
+                self.cluster.stop()
+    
+    def _poll_loop(self):
+        """Claim and process pending submissions until interrupted."""
         while True:
             try:
+                # Don't claim work that can't be judged
+                if not self.ollama_pool.has_healthy_backend():
+                    logger.warning(
+                        f"No healthy Ollama backend {self.ollama_pool.status()}. "
+                        f"Sleeping for {Config.OLLAMA_CIRCUIT_RESET_SECONDS}s..."
+                    )
+                    time.sleep(Config.OLLAMA_CIRCUIT_RESET_SECONDS)
+                    continue
+                
                 # Get pending submissions
-                pending = self.firebase.get_pending_submissions(limit=Config.MAX_CONCURRENT_JOBS)
+                pending = self._fetch_pending(Config.MAX_CONCURRENT_JOBS)
                 
                 if not pending:
                     logger.info(f"No pending submissions. Sleeping for {Config.POLL_INTERVAL_SECONDS}s...")
@@ -198,17 +845,19 @@ class JudgeWorker:
                 for submission in pending:
                     submission_id = submission['id']
                     
-                    # Try to claim
-                    if not self.firebase.claim_submission(submission_id, self.worker_id):
-                        logger.info(f"Could not claim submission {submission_id} (already claimed)")
-                        continue
-                    
-                    logger.info(f"Claimed submission {submission_id}")
-                    
-                    # Process with timeout
-                    start_time = time.time()
-                    success = self.process_submission(submission)
-                    elapsed = time.time() - start_time
+                    # Don't start a job while the host is under critical pressure
+                    with self._admit('jobs'):
+                        # Try to claim
+                        if not self.firebase.claim_submission(submission_id, self.worker_id):
+                            logger.info(f"Could not claim submission {submission_id} (already claimed)")
+                            continue
+                        
+                        self._job_started(submission)
+                        
+                        # Process with timeout
+                        start_time = time.time()
+                        success = self.process_submission(submission)
+                        elapsed = time.time() - start_time
                     
                     logger.info(f"Submission {submission_id} processed in {elapsed:.1f}s (success: {success})")
                     
@@ -222,11 +871,64 @@ class JudgeWorker:
                 logger.error(f"Error in worker loop: {e}", exc_info=True)
                 time.sleep(60)  # Wait before retrying
 
+def check_components() -> bool:
+    """
+    Import every component and report the time each adds, then check
+    external requirements. Returns True if everything is usable.
+    Modules share dependencies, so a time is what that import added on top
+    of the ones listed before it.
+    """
+    ok = True
+    total = 0.0
+    print("Component import times:")
+    for name, module in COMPONENT_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+            status = 'ok'
+        except Exception as e:
+            status = f"FAILED ({e.__class__.__name__}: {e})"
+            ok = False
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"  {name:<12} {elapsed * 1000:8.1f} ms  {status}")
+    print(f"  {'total':<12} {total * 1000:8.1f} ms")
+    
+    print("Environment:")
+    try:
+        Config.validate()
+        print(f"  credentials  ok ({Config.FIREBASE_CREDENTIALS_JSON})")
+    except FileNotFoundError as e:
+        print(f"  credentials  FAILED ({e})")
+        ok = False
+    lighthouse = shutil.which('lighthouse')
+    print(f"  lighthouse   {'ok (' + lighthouse + ')' if lighthouse else 'not found (scores will default to 0)'}")
+    print(f"  ollama hosts {', '.join(Config.OLLAMA_HOSTS)}")
+    return ok
+
 def main():
     """Entry point."""
+    parser = argparse.ArgumentParser(description='Dark Star Scoring System worker.')
+    parser.add_argument('--check', action='store_true', help='Report component import times and configuration, then exit')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Run the asyncio worker (same as WORKER_MODE=async)')
+    parser.add_argument('--reaudit', action='store_true', help='Re-check scored entries for content changes instead of judging')
+    args = parser.parse_args()
+    
+    if args.check:
+        sys.exit(0 if check_components() else 1)
+    
+    if args.reaudit:
+        from judge_worker.reaudit import run
+        run()
+        return
+    
+    if args.use_async or Config.WORKER_MODE == 'async':
+        from judge_worker.async_worker import run
+        run()
+        return
+    
     worker = JudgeWorker()
     worker.run_loop()
 
 if __name__ == '__main__':
     main()
-
@@ -1,13 +1,17 @@
 """Ollama integration for subjective scoring."""
+import asyncio
 import json
 import logging
-import requests
-from typing import Dict, Any, Optional
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from typing import Dict, Any, List, Optional, Tuple
 from jsonschema import validate, ValidationError
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import Config
+from judge_worker.ollama_pool import OllamaPool, NoHealthyBackendError, GenerationCancelled
+from judge_worker.page_structure import structure_section
+from judge_worker.prompt_budget import PromptBudget, PromptSection, TokenEstimator
 
 logger = logging.getLogger(__name__)
 
@@ -50,55 +54,21 @@ OLLAMA_OUTPUT_SCHEMA = {
     }
 }
 
-class OllamaJudge:
-    """Judge websites using Ollama for subjective scoring."""
-    
-    def __init__(self, host: str, model: str):
-        """Initialize Ollama judge."""
-        self.host = host.rstrip('/')
-        self.model = model
-        self.api_url = f"{self.host}/api/generate"
-    
-    def build_prompt(
-        self,
-        url: str,
-        category: str,
-        extracted_structure: Dict[str, Any],
-        lighthouse_metrics: Dict[str, int],
-        axe_summary: Dict[str, Any],
-        console_error_count: int,
-        failed_request_count: int
-    ) -> str:
-        """Build the scoring prompt for Ollama."""
-        
-        # Format extracted structure
-        structure_text = f"""
-Page Title: {extracted_structure.get('title', 'N/A')}
-Meta Description: {extracted_structure.get('metaDescription', 'N/A')}
-H1 Headings: {', '.join(extracted_structure.get('headings', {}).get('h1', []))}
-H2 Headings: {', '.join(extracted_structure.get('headings', {}).get('h2', [])[:5])}
-Navigation Links: {len(extracted_structure.get('navLinks', []))} links found
-Visible Text Sample: {extracted_structure.get('visibleText', '')[:500]}...
-"""
-        
-        # Format metrics
-        metrics_text = f"""
-Lighthouse Performance: {lighthouse_metrics.get('lighthousePerformance', 0)}/100
-Lighthouse Accessibility: {lighthouse_metrics.get('lighthouseAccessibility', 0)}/100
-Lighthouse SEO: {lighthouse_metrics.get('lighthouseSEO', 0)}/100
-Lighthouse Best Practices: {lighthouse_metrics.get('lighthouseBestPractices', 0)}/100
-Axe Violations: {axe_summary.get('axeViolationsCount', 0)}
-Console Errors: {console_error_count}
-Failed Requests: {failed_request_count}
-"""
-        
-        prompt = f"""You are an expert web design judge for the Dark Star Awards competition. Evaluate the website at {url} entered in the "{category}" category.
+SCORE_KEYS = ('design', 'ux', 'creativity', 'content', 'bonus')
+FLAG_KEYS = ('possibleTemplate', 'majorBrokenUX', 'accessibilityConcerns')
+
+# {structure}, {visual} and {metrics} are filled by PromptBudget within
+# PROMPT_TOKEN_BUDGET; everything else is always sent
+PROMPT_TEMPLATE = """You are an expert web design judge for the Dark Star Awards competition. Evaluate the website at {url} entered in the "{category}" category.
 
 ## Website Structure:
-{structure_text}
+{structure}
+
+## Visual Analysis (measured from screenshots):
+{visual}
 
 ## Technical Metrics:
-{metrics_text}
+{metrics}
 
 ## Scoring Rubric:
 
@@ -156,9 +126,210 @@ Output this exact structure:
 }}
 
 Evaluate the website and output the JSON now:"""
-        
+
+
+def parse_ensemble(spec: str) -> List[Dict[str, Any]]:
+    """
+    Parse an ensemble spec such as "llama3.1:8b@1,llama3.1:8b@2,mistral:7b".
+    Each member is a model name with an optional @seed.
+    """
+    members = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, seed = item.partition('@')
+        members.append({'model': model, 'seed': int(seed) if seed else None})
+    return members
+
+
+def _score_max(key: str) -> int:
+    return OLLAMA_OUTPUT_SCHEMA['properties']['scores']['properties'][key]['maximum']
+
+
+def aggregate_scores(results: List[Dict[str, Any]], method: str = 'median') -> Dict[str, int]:
+    """Combine per-member scores by median or 20% trimmed mean."""
+    scores = {}
+    for key in SCORE_KEYS:
+        values = sorted(r['scores'].get(key, 0) for r in results)
+        if method == 'trimmed_mean':
+            trim = int(len(values) * 0.2) if len(values) >= 5 else (1 if len(values) >= 3 else 0)
+            kept = values[trim:len(values) - trim]
+            value = statistics.mean(kept)
+        else:
+            value = statistics.median(values)
+        scores[key] = max(0, min(_score_max(key), int(round(value))))
+    return scores
+
+
+def score_disagreement(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Return the spread (max - min) of each score across members."""
+    spread = {}
+    for key in SCORE_KEYS:
+        values = [r['scores'].get(key, 0) for r in results]
+        spread[key] = max(values) - min(values)
+    return spread
+
+
+def ensemble_confidence(results: List[Dict[str, Any]]) -> float:
+    """
+    Agreement between members as 0..1.
+    1.0 means identical scores; each category's spread counts relative to its maximum.
+    """
+    if len(results) < 2:
+        return 1.0
+    spread = score_disagreement(results)
+    relative = [spread[key] / _score_max(key) for key in SCORE_KEYS]
+    return round(1.0 - statistics.mean(relative), 3)
+
+
+def visual_section(features: Optional[Dict[str, Any]]) -> PromptSection:
+    """Screenshot features as prompt lines."""
+    section = PromptSection('visual')
+    if not features:
+        return section
+    for name in ('desktop', 'mobile'):
+        f = features.get(name)
+        if not f:
+            continue
+        palette = ', '.join(f"{p['color']} {p['share']:.0%}" for p in f['palette'])
+        section.line(
+            f"{name.title()}: ",
+            f"palette {palette}; whitespace {f['whitespaceRatio']:.0%}; "
+            f"edge density {f['edgeDensity']:.0%}; RMS contrast {f['rmsContrast']:.2f}; "
+            f"low-contrast edges {f['lowContrastEdges']:.0%}",
+            priority=2
+        )
+    mobile = features.get('mobile')
+    if mobile:
+        section.line(
+            'Mobile horizontal overflow: ',
+            f"{mobile['overflowPx']}px; content touching right edge in {mobile['rightEdgeTouch']:.0%} of rows",
+            priority=1
+        )
+    return section
+
+
+def metrics_section(
+    lighthouse_metrics: Dict[str, Any],
+    axe_summary: Dict[str, Any],
+    console_error_count: int,
+    failed_request_count: int
+) -> PromptSection:
+    """Lighthouse scores, lab metrics (when measured) and error counts as prompt lines."""
+    section = PromptSection('metrics')
+    for label, key in (
+        ('Performance', 'lighthousePerformance'),
+        ('Accessibility', 'lighthouseAccessibility'),
+        ('SEO', 'lighthouseSEO'),
+        ('Best Practices', 'lighthouseBestPractices')
+    ):
+        section.line(f"Lighthouse {label}: ", f"{lighthouse_metrics.get(key, 0)}/100")
+    for label, key, unit in (
+        ('Largest Contentful Paint', 'lighthouseLcpMs', 'ms'),
+        ('Cumulative Layout Shift', 'lighthouseCls', ''),
+        ('Total Blocking Time', 'lighthouseTbtMs', 'ms'),
+        ('Time to Interactive', 'lighthouseTtiMs', 'ms'),
+        ('Total Byte Weight', 'lighthouseTotalBytes', ' bytes')
+    ):
+        if lighthouse_metrics.get(key) is not None:
+            section.line(f"{label}: ", f"{lighthouse_metrics[key]}{unit}", priority=1)
+    section.line('Axe Violations: ', axe_summary.get('axeViolationsCount', 0))
+    section.line('Console Errors: ', console_error_count)
+    section.line('Failed Requests: ', failed_request_count)
+    return section
+
+
+class OllamaJudge:
+    """Judge websites using Ollama for subjective scoring."""
+    
+    def __init__(
+        self,
+        host: str,
+        model: str,
+        pool: Optional[OllamaPool] = None,
+        ensemble: Optional[List[Dict[str, Any]]] = None,
+        aggregation: str = 'median',
+        quorum: int = 0,
+        agreement_tolerance: int = 2,
+        prompt_budget_tokens: Optional[int] = None,
+        ensemble_timeout: Optional[int] = None
+    ):
+        """
+        Initialize Ollama judge.
+        Requests go through pool when given, otherwise to host alone.
+        With two or more ensemble members, each judgment is run on all of them
+        concurrently and aggregated; quorum (0 = majority) members agreeing
+        within agreement_tolerance points per category ends the wait early,
+        and members still running after ensemble_timeout seconds (default
+        Config.OLLAMA_ENSEMBLE_TIMEOUT_SECONDS) are left out. Prompts are
+        fitted to prompt_budget_tokens (default Config.PROMPT_TOKEN_BUDGET).
+        """
+        self.host = host.rstrip('/')
+        self.ensemble = ensemble or []
+        # A one-member ensemble is just that model (with its seed)
+        self.seed = None
+        if len(self.ensemble) == 1:
+            model, self.seed = self.ensemble[0]['model'], self.ensemble[0]['seed']
+        self.model = model
+        self.api_url = f"{self.host}/api/generate"
+        self.pool = pool or OllamaPool([self.host], model=model, models=[m['model'] for m in self.ensemble])
+        self.aggregation = aggregation
+        self.quorum = quorum or (len(self.ensemble) // 2 + 1)
+        self.agreement_tolerance = agreement_tolerance
+        self.ensemble_timeout = ensemble_timeout or Config.OLLAMA_ENSEMBLE_TIMEOUT_SECONDS
+        self.tokens = TokenEstimator()
+        self.prompt_budget = PromptBudget(prompt_budget_tokens or Config.PROMPT_TOKEN_BUDGET, self.tokens)
+    
+    def build_prompt(
+        self,
+        url: str,
+        category: str,
+        extracted_structure: Dict[str, Any],
+        lighthouse_metrics: Dict[str, int],
+        axe_summary: Dict[str, Any],
+        console_error_count: int,
+        failed_request_count: int,
+        visual_features: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build the scoring prompt for Ollama."""
+        prompt, _ = self._build_prompt(
+            url, category, extracted_structure,
+            lighthouse_metrics, axe_summary,
+            console_error_count, failed_request_count,
+            visual_features
+        )
         return prompt
     
+    def _build_prompt(
+        self,
+        url: str,
+        category: str,
+        extracted_structure: Dict[str, Any],
+        lighthouse_metrics: Dict[str, int],
+        axe_summary: Dict[str, Any],
+        console_error_count: int,
+        failed_request_count: int,
+        visual_features: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Build the prompt within the token budget; returns (prompt, stats)."""
+        prompt, stats = self.prompt_budget.build(
+            PROMPT_TEMPLATE,
+            [
+                structure_section(extracted_structure),
+                visual_section(visual_features),
+                metrics_section(lighthouse_metrics, axe_summary, console_error_count, failed_request_count)
+            ],
+            model=self.model,
+            url=url,
+            category=category
+        )
+        logger.info(
+            f"Prompt for {url}: ~{stats['tokens']} tokens (budget {stats['budgetTokens']}), "
+            f"built in {stats['buildMs']} ms, {stats['dropped']} dropped and {stats['duplicates']} duplicate values"
+        )
+        return prompt, stats
+    
     def judge(
         self,
         url: str,
@@ -167,62 +338,330 @@ Evaluate the website and output the JSON now:"""
         lighthouse_metrics: Dict[str, int],
         axe_summary: Dict[str, Any],
         console_error_count: int,
-        failed_request_count: int
+        failed_request_count: int,
+        visual_features: Optional[Dict[str, Any]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Judge website using Ollama.
         Returns parsed JSON response or None if failed.
         """
-        prompt = self.build_prompt(
+        prompt, stats = self._build_prompt(
             url, category, extracted_structure,
             lighthouse_metrics, axe_summary,
-            console_error_count, failed_request_count
+            console_error_count, failed_request_count,
+            visual_features
         )
         
+        if len(self.ensemble) > 1:
+            result = self._judge_ensemble(prompt)
+        else:
+            result = self._judge_single(prompt, self.model, self.seed)
+        if result:
+            result['prompt'] = stats
+        return result
+    
+    async def judge_async(
+        self,
+        url: str,
+        category: str,
+        extracted_structure: Dict[str, Any],
+        lighthouse_metrics: Dict[str, int],
+        axe_summary: Dict[str, Any],
+        console_error_count: int,
+        failed_request_count: int,
+        visual_features: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Async counterpart of judge.
+        Responses are streamed and generation stops once the JSON object is
+        complete; ensemble members that are no longer needed are cancelled.
+        The prompt is built in a worker thread to keep the event loop free.
+        """
+        prompt, stats = await asyncio.to_thread(
+            self._build_prompt,
+            url, category, extracted_structure,
+            lighthouse_metrics, axe_summary,
+            console_error_count, failed_request_count,
+            visual_features
+        )
+        
+        if len(self.ensemble) > 1:
+            result = await self._judge_ensemble_async(prompt)
+        else:
+            result = await self._judge_single_async(prompt, self.model, self.seed)
+        if result:
+            result['prompt'] = stats
+        return result
+    
+    def _payload(self, prompt: str, model: str, seed: Optional[int]) -> Dict[str, Any]:
+        """Generate request body for one judgment."""
+        options = {
+            'temperature': 0.3,  # Lower temperature for more consistent scoring
+            'top_p': 0.9
+        }
+        if seed is not None:
+            options['seed'] = seed
+        return {
+            'model': model,
+            'prompt': prompt,
+            'stream': False,
+            'options': options
+        }
+    
+    def _fix_payload(self, original_prompt: str, model: Optional[str], seed: Optional[int]) -> Dict[str, Any]:
+        """Generate request body asking the model to repair its JSON."""
+        fix_prompt = f"""{original_prompt}
+
+The previous response was not valid JSON. Please output ONLY the JSON object, no other text:"""
+        
+        payload = {
+            'model': model or self.model,
+            'prompt': fix_prompt,
+            'stream': False
+        }
+        if seed is not None:
+            payload['options'] = {'seed': seed}
+        return payload
+    
+    def _parse(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract, parse and validate the JSON in a generate response.
+        Raises ValueError (or its JSONDecodeError subclass) or ValidationError.
+        """
+        response_text = result.get('response', '').strip()
+        
+        # Try to extract JSON from response
+        json_text = self._extract_json(response_text)
+        if not json_text:
+            raise ValueError("No JSON found in Ollama response")
+        
+        # Parse and validate
+        parsed = json.loads(json_text)
+        validate(instance=parsed, schema=OLLAMA_OUTPUT_SCHEMA)
+        return parsed
+    
+    def _judge_single(
+        self,
+        prompt: str,
+        model: str,
+        seed: Optional[int] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Run one model on the prompt and return the validated JSON or None.
+        Setting cancel drops the request and returns None.
+        """
         try:
-            logger.info(f"Calling Ollama model {self.model}")
-            response = requests.post(
-                self.api_url,
-                json={
-                    'model': self.model,
-                    'prompt': prompt,
-                    'stream': False,
-                    'options': {
-                        'temperature': 0.3,  # Lower temperature for more consistent scoring
-                        'top_p': 0.9
-                    }
-                },
-                timeout=120
+            logger.info(f"Calling Ollama model {model}" + (f" (seed {seed})" if seed is not None else ""))
+            result = self.pool.generate(
+                self._payload(prompt, model, seed),
+                timeout=Config.OLLAMA_REQUEST_TIMEOUT_SECONDS,
+                cancel=cancel
             )
-            response.raise_for_status()
-            
-            result = response.json()
-            response_text = result.get('response', '').strip()
-            
-            # Try to extract JSON from response
-            json_text = self._extract_json(response_text)
-            
-            if not json_text:
-                logger.warning("No JSON found in Ollama response, attempting retry")
-                return self._retry_with_fix_prompt(prompt)
-            
-            # Parse and validate
-            parsed = json.loads(json_text)
-            validate(instance=parsed, schema=OLLAMA_OUTPUT_SCHEMA)
+            self.tokens.observe(model, prompt, result.get('prompt_eval_count'))
+            parsed = self._parse(result)
             
             logger.info(f"Ollama judgment completed: {parsed.get('scores')}")
             return parsed
         
+        except NoHealthyBackendError:
+            raise
+        except GenerationCancelled:
+            logger.info(f"Ollama model {model} no longer needed, request dropped")
+            return None
         except ValidationError as e:
             logger.error(f"JSON validation error: {e}")
-            return self._retry_with_fix_prompt(prompt)
+            return self._retry_with_fix_prompt(prompt, model, seed, cancel)
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {e}")
-            return self._retry_with_fix_prompt(prompt)
+            return self._retry_with_fix_prompt(prompt, model, seed, cancel)
+        except ValueError as e:
+            logger.warning(f"{e}, attempting retry")
+            return self._retry_with_fix_prompt(prompt, model, seed, cancel)
+        except Exception as e:
+            logger.error(f"Error calling Ollama: {e}")
+            return None
+    
+    async def _judge_single_async(
+        self,
+        prompt: str,
+        model: str,
+        seed: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Async counterpart of _judge_single."""
+        try:
+            logger.info(f"Calling Ollama model {model}" + (f" (seed {seed})" if seed is not None else ""))
+            result = await self.pool.generate_async(
+                self._payload(prompt, model, seed),
+                timeout=Config.OLLAMA_REQUEST_TIMEOUT_SECONDS
+            )
+            self.tokens.observe(model, prompt, result.get('prompt_eval_count'))
+            parsed = self._parse(result)
+            
+            logger.info(f"Ollama judgment completed: {parsed.get('scores')}")
+            return parsed
+        
+        except NoHealthyBackendError:
+            raise
+        except (ValidationError, ValueError) as e:
+            logger.error(f"Invalid Ollama response ({e}), attempting retry")
+            try:
+                result = await self.pool.generate_async(
+                    self._fix_payload(prompt, model, seed),
+                    timeout=Config.OLLAMA_REQUEST_TIMEOUT_SECONDS
+                )
+                return self._parse(result)
+            except NoHealthyBackendError:
+                raise
+            except Exception as retry_error:
+                logger.error(f"Retry failed: {retry_error}")
+                return None
         except Exception as e:
             logger.error(f"Error calling Ollama: {e}")
             return None
     
+    def _quorum_reached(self, results: List[Dict[str, Any]]) -> bool:
+        """True once enough members agree that waiting for the rest is pointless."""
+        if len(results) < self.quorum or len(results) >= len(self.ensemble):
+            return False
+        spread = score_disagreement(results)
+        return max(spread.values()) <= self.agreement_tolerance
+    
+    def _judge_ensemble(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Judge with every ensemble member concurrently and aggregate.
+        Returns as soon as a quorum of members agree, without waiting for
+        stragglers, and at the latest after ensemble_timeout seconds.
+        """
+        responses = []
+        backend_errors = 0
+        early_exit = timed_out = False
+        
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(self.ensemble), thread_name_prefix='ensemble')
+        try:
+            futures = {
+                executor.submit(self._judge_single, prompt, member['model'], member['seed'], cancel): member
+                for member in self.ensemble
+            }
+            try:
+                for future in as_completed(futures, timeout=self.ensemble_timeout):
+                    member = futures[future]
+                    try:
+                        parsed = future.result()
+                    except NoHealthyBackendError:
+                        backend_errors += 1
+                        continue
+                    if not parsed:
+                        continue
+                    responses.append((member, parsed))
+                    
+                    if self._quorum_reached([r for _, r in responses]):
+                        early_exit = True
+                        break
+            except FuturesTimeoutError:
+                timed_out = True
+        finally:
+            # Members not started yet are cancelled; running ones drop their
+            # connection at the next streamed chunk, so they do not keep
+            # loading the pool after this job has released its LLM slot.
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return self._aggregate_ensemble(responses, backend_errors, early_exit, timed_out)
+    
+    async def _judge_ensemble_async(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Async counterpart of _judge_ensemble; stragglers are cancelled."""
+        responses = []
+        backend_errors = 0
+        early_exit = False
+        
+        tasks = {
+            asyncio.ensure_future(self._judge_single_async(prompt, member['model'], member['seed'])): member
+            for member in self.ensemble
+        }
+        pending = set(tasks)
+        deadline = time.monotonic() + self.ensemble_timeout
+        timed_out = False
+        try:
+            while pending and not early_exit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        parsed = task.result()
+                    except NoHealthyBackendError:
+                        backend_errors += 1
+                        continue
+                    if parsed:
+                        responses.append((tasks[task], parsed))
+                early_exit = self._quorum_reached([r for _, r in responses])
+        finally:
+            # Cancelling closes the stream, which stops generation on the host
+            for task in pending:
+                task.cancel()
+        
+        return self._aggregate_ensemble(responses, backend_errors, early_exit, timed_out)
+    
+    def _aggregate_ensemble(
+        self,
+        responses: List[Any],
+        backend_errors: int,
+        early_exit: bool,
+        timed_out: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Combine (member, parsed) pairs into one judgment."""
+        if timed_out:
+            logger.warning(
+                f"Ensemble timed out after {self.ensemble_timeout}s with "
+                f"{len(responses)}/{len(self.ensemble)} member(s) answered"
+            )
+        if not responses:
+            if backend_errors:
+                raise NoHealthyBackendError("No Ollama backend available for any ensemble member")
+            return None
+        
+        results = [r for _, r in responses]
+        scores = aggregate_scores(results, self.aggregation)
+        
+        # Notes come from the member whose scores sit closest to the aggregate
+        closest = min(
+            results,
+            key=lambda r: sum(abs(r['scores'].get(k, 0) - scores[k]) for k in SCORE_KEYS)
+        )
+        flags = {
+            key: sum(1 for r in results if r.get('flags', {}).get(key)) * 2 > len(results)
+            for key in FLAG_KEYS
+        }
+        
+        aggregated = {
+            'judgeVersion': closest.get('judgeVersion', Config.JUDGE_VERSION),
+            'scores': scores,
+            'notes': closest['notes'],
+            'flags': flags,
+            'ensemble': {
+                'members': [
+                    {'model': m['model'], 'seed': m['seed'], 'scores': r['scores']}
+                    for m, r in responses
+                ],
+                'requested': len(self.ensemble),
+                'responded': len(responses),
+                'aggregation': self.aggregation,
+                'disagreement': score_disagreement(results),
+                'confidence': ensemble_confidence(results),
+                'earlyExit': early_exit,
+                'timedOut': timed_out
+            }
+        }
+        logger.info(
+            f"Ensemble judgment completed from {len(responses)}/{len(self.ensemble)} members "
+            f"(confidence {aggregated['ensemble']['confidence']}, early exit {early_exit}): {scores}"
+        )
+        return aggregated
+    
     def _extract_json(self, text: str) -> Optional[str]:
         """Extract JSON from text response."""
         # Try to find JSON object
@@ -233,35 +672,27 @@ Evaluate the website and output the JSON now:"""
             return text[start:end]
         return None
     
-    def _retry_with_fix_prompt(self, original_prompt: str) -> Optional[Dict[str, Any]]:
+    def _retry_with_fix_prompt(
+        self,
+        original_prompt: str,
+        model: Optional[str] = None,
+        seed: Optional[int] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[Dict[str, Any]]:
         """Retry with a prompt asking to fix JSON."""
-        fix_prompt = f"""{original_prompt}
-
-The previous response was not valid JSON. Please output ONLY the JSON object, no other text:"""
-        
         try:
-            response = requests.post(
-                self.api_url,
-                json={
-                    'model': self.model,
-                    'prompt': fix_prompt,
-                    'stream': False
-                },
-                timeout=120
+            result = self.pool.generate(
+                self._fix_payload(original_prompt, model, seed),
+                timeout=Config.OLLAMA_REQUEST_TIMEOUT_SECONDS,
+                cancel=cancel
             )
-            response.raise_for_status()
-            
-            result = response.json()
-            response_text = result.get('response', '').strip()
-            json_text = self._extract_json(response_text)
-            
-            if json_text:
-                parsed = json.loads(json_text)
-                validate(instance=parsed, schema=OLLAMA_OUTPUT_SCHEMA)
-                return parsed
+            return self._parse(result)
         
+        except NoHealthyBackendError:
+            raise
+        except GenerationCancelled:
+            return None
         except Exception as e:
             logger.error(f"Retry failed: {e}")
         
         return None
-
@@ -0,0 +1,464 @@
+"""Pool of Ollama hosts with health checks and circuit breaking."""
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class NoHealthyBackendError(Exception):
+    """Raised when no Ollama host is available: all down or with an open circuit."""
+
+
+class GenerationCancelled(Exception):
+    """Raised when a generate call is abandoned through its cancel event."""
+
+
+def _host_unavailable(error: Exception) -> bool:
+    """
+    True for errors meaning the host is down or overloaded (connection
+    failures, 5xx) rather than the request being bad (4xx, invalid JSON).
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status >= 500
+    if isinstance(error, requests.ConnectionError):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, (httpx.NetworkError, httpx.ConnectTimeout))
+
+
+class _JsonObjectScanner:
+    """Detect the end of the first top-level JSON object in streamed text."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume text; return True once the first object has closed."""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.started:
+                self.in_string = True
+            elif ch == '{':
+                self.depth += 1
+                self.started = True
+            elif ch == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+class OllamaBackend:
+    """State for a single Ollama host."""
+
+    def __init__(self, host: str):
+        """Initialize backend for host."""
+        self.host = host.rstrip('/')
+        self.generate_url = f"{self.host}/api/generate"
+        self.tags_url = f"{self.host}/api/tags"
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.circuit_opened_at: Optional[float] = None
+        self.half_open_trial = False
+        # Health check of an open circuit in progress / passed and not yet tried
+        self.probing = False
+        self.probe_passed = False
+        self.tokens_per_sec: Optional[float] = None
+        self.last_checked_at = 0.0
+
+    @property
+    def circuit_open(self) -> bool:
+        return self.circuit_opened_at is not None
+
+    def describe(self) -> Dict[str, Any]:
+        """Return a loggable snapshot of this backend."""
+        return {
+            'host': self.host,
+            'inFlight': self.in_flight,
+            'failures': self.consecutive_failures,
+            'circuitOpen': self.circuit_open,
+            'tokensPerSec': round(self.tokens_per_sec, 1) if self.tokens_per_sec else None
+        }
+
+
+class OllamaPool:
+    """
+    Route generate calls across several Ollama hosts.
+
+    Each request goes to the available host with the lowest expected wait,
+    estimated as (in-flight + 1) / measured tokens per second. A host that
+    fails `failure_threshold` times in a row has its circuit opened and is
+    skipped until `reset_seconds` have passed and a `/api/tags` health check
+    succeeds; the next request then acts as a half-open trial. Health
+    checks run without holding the pool lock.
+    """
+
+    # Weight for new tokens/sec samples in the moving average
+    THROUGHPUT_ALPHA = 0.3
+
+    def __init__(
+        self,
+        hosts: List[str],
+        model: Optional[str] = None,
+        models: Optional[List[str]] = None,
+        failure_threshold: int = 3,
+        reset_seconds: int = 60,
+        health_timeout: int = 3
+    ):
+        """
+        Initialize pool for the given hosts. A host is only healthy with
+        model and every one of models (e.g. the ensemble's) pulled.
+        """
+        if not hosts:
+            raise ValueError("OllamaPool needs at least one host")
+        self.backends = [OllamaBackend(host) for host in hosts]
+        self.model = model
+        self.models = list(dict.fromkeys(m for m in [model, *(models or [])] if m))
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._async_client = None
+
+    def health_check(self, backend: OllamaBackend) -> bool:
+        """
+        Check a host via /api/tags.
+        The host must also have every model of the pool pulled.
+        """
+        backend.last_checked_at = time.time()
+        try:
+            response = requests.get(backend.tags_url, timeout=self.health_timeout)
+            response.raise_for_status()
+            if self.models:
+                names = {m.get('name') for m in response.json().get('models', [])}
+                missing = [m for m in self.models if m not in names and f"{m}:latest" not in names]
+                if missing:
+                    logger.warning(f"Ollama host {backend.host} does not have model(s) {', '.join(missing)}")
+                    return False
+            return True
+        except Exception as e:
+            logger.warning(f"Ollama health check failed for {backend.host}: {e}")
+            return False
+
+    def has_healthy_backend(self) -> bool:
+        """Return True if at least one host could take a request now."""
+        self._probe()
+        with self._lock:
+            return any(self._is_available(backend) for backend in self.backends)
+
+    def _probe_due(self, backend: OllamaBackend) -> bool:
+        """An open circuit whose reset period has passed and that has no check running."""
+        return (
+            backend.circuit_open
+            and not backend.half_open_trial
+            and not backend.probing
+            and not backend.probe_passed
+            and time.time() - backend.circuit_opened_at >= self.reset_seconds
+        )
+
+    def _probe(self, exclude: Optional[List[OllamaBackend]] = None):
+        """Health-check the hosts due for one, outside the lock."""
+        exclude = exclude or []
+        with self._lock:
+            due = [b for b in self.backends if b not in exclude and self._probe_due(b)]
+            for backend in due:
+                backend.probing = True
+        for backend in due:
+            passed = False
+            try:
+                passed = self.health_check(backend)
+            finally:
+                with self._lock:
+                    backend.probing = False
+                    backend.probe_passed = passed
+                    if not passed:
+                        # Still failing, wait another reset period before the next check
+                        backend.circuit_opened_at = time.time()
+
+    def _is_available(self, backend: OllamaBackend) -> bool:
+        """Closed circuits are available; open ones only after a passing health check."""
+        if not backend.circuit_open:
+            return True
+        return backend.probe_passed and not backend.half_open_trial
+
+    def _pick(self, exclude: List[OllamaBackend]) -> Optional[OllamaBackend]:
+        candidates = [
+            b for b in self.backends
+            if b not in exclude and self._is_available(b)
+        ]
+        if not candidates:
+            return None
+        known = [b.tokens_per_sec for b in candidates if b.tokens_per_sec]
+        # Unmeasured hosts are rated as the fastest known so they get probed
+        default_tps = max(known) if known else 1.0
+        return min(
+            candidates,
+            key=lambda b: (b.in_flight + 1) / (b.tokens_per_sec or default_tps)
+        )
+
+    def _reserve(self, exclude: List[OllamaBackend]) -> OllamaBackend:
+        """Pick a backend and count the request against it."""
+        self._probe(exclude)
+        with self._lock:
+            backend = self._pick(exclude)
+            if backend is None:
+                raise NoHealthyBackendError(
+                    f"No healthy Ollama backend among {[b.host for b in self.backends]}"
+                )
+            backend.in_flight += 1
+            if backend.circuit_open:
+                backend.half_open_trial = True
+                backend.probe_passed = False
+                logger.info(f"Ollama host {backend.host} passed health check, circuit half-open")
+            return backend
+
+    def _release(self, backend: OllamaBackend):
+        """Undo _reserve once the request has finished."""
+        with self._lock:
+            backend.in_flight -= 1
+            if backend.half_open_trial:
+                # Trial ended without a recorded outcome; treat as inconclusive
+                backend.half_open_trial = False
+                backend.circuit_opened_at = time.time()
+
+    @contextmanager
+    def acquire(self, exclude: Optional[List[OllamaBackend]] = None):
+        """Reserve the best available backend for one request."""
+        backend = self._reserve(exclude or [])
+        try:
+            yield backend
+        finally:
+            self._release(backend)
+
+    def record_success(self, backend: OllamaBackend, result: Dict[str, Any]):
+        """Close the circuit and fold the response timing into throughput."""
+        with self._lock:
+            if backend.circuit_open:
+                logger.info(f"Ollama host {backend.host} recovered, circuit closed")
+            backend.consecutive_failures = 0
+            backend.circuit_opened_at = None
+            backend.half_open_trial = False
+            backend.probe_passed = False
+
+            eval_count = result.get('eval_count') or 0
+            eval_duration = result.get('eval_duration') or 0  # nanoseconds
+            if eval_count and eval_duration:
+                sample = eval_count / (eval_duration / 1e9)
+                if backend.tokens_per_sec is None:
+                    backend.tokens_per_sec = sample
+                else:
+                    backend.tokens_per_sec += self.THROUGHPUT_ALPHA * (sample - backend.tokens_per_sec)
+
+    def record_failure(self, backend: OllamaBackend):
+        """Count a failure and open the circuit once the threshold is reached."""
+        with self._lock:
+            backend.consecutive_failures += 1
+            if backend.half_open_trial or backend.consecutive_failures >= self.failure_threshold:
+                if not backend.circuit_open or backend.half_open_trial:
+                    logger.warning(
+                        f"Opening circuit for Ollama host {backend.host} "
+                        f"after {backend.consecutive_failures} failure(s)"
+                    )
+                backend.circuit_opened_at = time.time()
+                backend.half_open_trial = False
+                backend.probe_passed = False
+
+    def _post_generate(
+        self,
+        backend: OllamaBackend,
+        payload: Dict[str, Any],
+        timeout: int,
+        cancel: Optional[threading.Event]
+    ) -> Dict[str, Any]:
+        """
+        POST one generate call. With a cancel event the response is
+        streamed and the connection dropped once the event is set, which
+        makes Ollama stop generating.
+        """
+        if cancel is None:
+            response = requests.post(backend.generate_url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+
+        pieces = []
+        final: Dict[str, Any] = {}
+        with requests.post(
+            backend.generate_url,
+            json={**payload, 'stream': True},
+            timeout=timeout,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if cancel.is_set():
+                    raise GenerationCancelled(f"Generate call to {backend.host} cancelled")
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                pieces.append(chunk.get('response', ''))
+                if chunk.get('done'):
+                    final = chunk
+                    break
+        result = dict(final)
+        result['response'] = ''.join(pieces)
+        return result
+
+    def generate(
+        self,
+        payload: Dict[str, Any],
+        timeout: int = 120,
+        cancel: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """
+        POST a generate request, failing over to other hosts on error.
+        Raises NoHealthyBackendError when no host was available or every
+        host tried was unreachable or returned 5xx, otherwise the last
+        host's error. Setting cancel abandons the call with
+        GenerationCancelled without counting it against the host.
+        """
+        tried: List[OllamaBackend] = []
+        last_error: Optional[Exception] = None
+        all_unavailable = True
+        while len(tried) < len(self.backends):
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled("Generate call cancelled")
+            try:
+                with self.acquire(exclude=tried) as backend:
+                    tried.append(backend)
+                    try:
+                        result = self._post_generate(backend, payload, timeout, cancel)
+                    except (requests.RequestException, ValueError) as e:
+                        self.record_failure(backend)
+                        last_error = e
+                        all_unavailable = all_unavailable and _host_unavailable(e)
+                        logger.warning(f"Ollama host {backend.host} failed: {e}")
+                        continue
+                    self.record_success(backend, result)
+                    return result
+            except NoHealthyBackendError:
+                if last_error is None:
+                    raise
+                break
+        self._raise_failure(tried, last_error, all_unavailable)
+    
+    @staticmethod
+    def _raise_failure(tried: List[OllamaBackend], last_error: Exception, all_unavailable: bool):
+        """Every host tried failed: no healthy backend if they were all down, else the last error."""
+        if all_unavailable:
+            raise NoHealthyBackendError(
+                f"All {len(tried)} Ollama host(s) tried failed: {last_error}"
+            ) from last_error
+        raise last_error
+
+    def _get_async_client(self):
+        """Shared httpx client for the running event loop."""
+        import httpx
+
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=8)
+            )
+        return self._async_client
+
+    async def aclose(self):
+        """Close the async HTTP client."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def _stream_generate(self, backend: OllamaBackend, payload: Dict[str, Any], timeout: int) -> Dict[str, Any]:
+        """
+        Stream a generate call and stop reading once the JSON object closes.
+        Closing the stream early makes Ollama stop generating, which saves
+        the tokens models tend to append after the object.
+        """
+        import httpx
+
+        client = self._get_async_client()
+        pieces = []
+        final: Dict[str, Any] = {}
+        scanner = _JsonObjectScanner()
+        start_time = time.perf_counter()
+
+        async with client.stream(
+            'POST',
+            backend.generate_url,
+            json={**payload, 'stream': True},
+            timeout=httpx.Timeout(timeout, connect=self.health_timeout)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                piece = chunk.get('response', '')
+                pieces.append(piece)
+                if chunk.get('done'):
+                    final = chunk
+                    break
+                if scanner.feed(piece):
+                    break
+
+        result = dict(final)
+        result['response'] = ''.join(pieces)
+        if not final:
+            # Stopped early: no server timings, so estimate throughput from
+            # chunks (about one token each) over wall time
+            result['eval_count'] = len(pieces)
+            result['eval_duration'] = int((time.perf_counter() - start_time) * 1e9)
+        return result
+
+    async def generate_async(self, payload: Dict[str, Any], timeout: int = 120) -> Dict[str, Any]:
+        """Async counterpart of generate, streaming the response."""
+        import httpx
+
+        tried: List[OllamaBackend] = []
+        last_error: Optional[Exception] = None
+        all_unavailable = True
+        while len(tried) < len(self.backends):
+            try:
+                # Picking may run a blocking health check
+                backend = await asyncio.to_thread(self._reserve, tried)
+            except NoHealthyBackendError:
+                if last_error is None:
+                    raise
+                break
+            tried.append(backend)
+            try:
+                result = await self._stream_generate(backend, payload, timeout)
+                self.record_success(backend, result)
+                return result
+            except (httpx.HTTPError, ValueError) as e:
+                self.record_failure(backend)
+                last_error = e
+                all_unavailable = all_unavailable and _host_unavailable(e)
+                logger.warning(f"Ollama host {backend.host} failed: {e}")
+            finally:
+                self._release(backend)
+        self._raise_failure(tried, last_error, all_unavailable)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Return a snapshot of every backend."""
+        with self._lock:
+            return [backend.describe() for backend in self.backends]
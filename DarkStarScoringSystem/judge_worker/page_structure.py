@@ -0,0 +1,350 @@
+"""Single-pass page structure extraction with bounded size."""
+import json
+import logging
+from typing import Dict, Any, List, TypedDict
+
+from judge_worker.prompt_budget import PromptSection
+
+logger = logging.getLogger(__name__)
+
+# Limits applied in the page and again in Python
+EXTRACT_BUDGET = {
+    'maxNodes': 20000,       # elements visited before the walk stops
+    'maxMs': 400,            # wall-clock budget for the walk
+    'maxText': 2000,         # characters of visible text kept
+    'maxTitle': 200,
+    'maxHeadingText': 120,
+    'maxHeadings': 10,       # per level
+    'maxNavLinks': 20,
+    'maxStyleSamples': 300,  # elements whose computed style is read
+    'maxStyles': 8           # fonts / colors reported
+}
+MAX_STRUCTURE_BYTES = 16 * 1024
+
+# Most tokens each part of the structure may take in the judging prompt;
+# visible text gets whatever is left of the budget up to its cap
+PROMPT_TOKEN_LIMITS = {
+    'h1': 150,
+    'h2': 120,
+    'h3': 80,
+    'nav': 80,
+    'visibleText': 700
+}
+
+# One TreeWalker-style DFS over the document. Text comes from text nodes
+# (no innerText, so no forced layout) and computed styles are only read
+# for a bounded sample of text-bearing elements.
+EXTRACT_SCRIPT = """
+    (budget) => {
+        const started = performance.now();
+        const SKIP = new Set(['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'canvas']);
+        const LANDMARKS = {
+            header: 'banner', nav: 'navigation', main: 'main', footer: 'contentinfo',
+            aside: 'complementary', search: 'search', form: 'form'
+        };
+        const STYLED = new Set(['p', 'h1', 'h2', 'h3', 'a', 'button', 'li', 'span', 'td', 'label']);
+        const clip = (s, n) => {
+            s = (s || '').replace(/\\s+/g, ' ').trim();
+            return s.length > n ? s.slice(0, n) : s;
+        };
+        const out = {
+            title: clip(document.title, budget.maxTitle),
+            metaDescription: '',
+            lang: document.documentElement.lang || '',
+            headings: {h1: [], h2: [], h3: []},
+            headingCounts: {h1: 0, h2: 0, h3: 0, h4: 0, h5: 0, h6: 0},
+            navLinks: [],
+            navLinkCount: 0,
+            landmarks: {},
+            links: {total: 0, internal: 0, external: 0},
+            images: {total: 0, withAlt: 0, emptyAlt: 0, missingAlt: 0},
+            forms: {forms: 0, inputs: 0, labelled: 0},
+            fonts: [],
+            colors: [],
+            dom: {elements: 0, maxDepth: 0, textChars: 0, truncated: false, extractMs: 0},
+            visibleText: ''
+        };
+        const text = [];
+        let textLen = 0;
+        const fonts = new Map();
+        const colors = new Map();
+        let styleSamples = 0;
+        const labelFor = new Set();
+        const unlabelledIds = [];
+        const bump = (map, key) => map.set(key, (map.get(key) || 0) + 1);
+
+        // Parallel stacks: node, depth, inside nav/header
+        const nodes = [document.documentElement];
+        const depths = [0];
+        const inNav = [false];
+        while (nodes.length) {
+            const node = nodes.pop();
+            const depth = depths.pop();
+            const nav = inNav.pop();
+
+            if (node.nodeType === 3) {
+                out.dom.textChars += node.data.length;
+                if (textLen < budget.maxText) {
+                    const t = node.data.replace(/\\s+/g, ' ').trim();
+                    if (t) {
+                        text.push(t);
+                        textLen += t.length + 1;
+                    }
+                }
+                continue;
+            }
+            if (node.nodeType !== 1) continue;
+
+            out.dom.elements++;
+            if (out.dom.elements > budget.maxNodes ||
+                (out.dom.elements % 256 === 0 && performance.now() - started > budget.maxMs)) {
+                out.dom.truncated = true;
+                break;
+            }
+            if (depth > out.dom.maxDepth) out.dom.maxDepth = depth;
+
+            const tag = node.localName;
+            if (SKIP.has(tag)) continue;
+            if (tag === 'meta') {
+                if (node.name === 'description') out.metaDescription = clip(node.content, budget.maxTitle * 2);
+                continue;
+            }
+            if (tag === 'head') {
+                // Only <meta> is of interest in <head>; <title> is read above
+                for (let c = node.lastChild; c; c = c.previousSibling) {
+                    if (c.nodeType === 1 && c.localName === 'meta') {
+                        nodes.push(c); depths.push(depth + 1); inNav.push(false);
+                    }
+                }
+                continue;
+            }
+            if (node.hidden || node.getAttribute('aria-hidden') === 'true') continue;
+
+            const role = node.getAttribute('role');
+            const landmark = role || LANDMARKS[tag];
+            if (landmark && (role || tag !== 'form')) {
+                out.landmarks[landmark] = (out.landmarks[landmark] || 0) + 1;
+            }
+
+            const childNav = nav || tag === 'nav' || tag === 'header' || role === 'navigation';
+            switch (tag) {
+                case 'h1': case 'h2': case 'h3': case 'h4': case 'h5': case 'h6':
+                    out.headingCounts[tag]++;
+                    if (out.headings[tag] && out.headings[tag].length < budget.maxHeadings) {
+                        out.headings[tag].push(clip(node.textContent, budget.maxHeadingText));
+                    }
+                    break;
+                case 'a':
+                    if (node.href) {
+                        out.links.total++;
+                        if (node.hostname === location.hostname) out.links.internal++;
+                        else out.links.external++;
+                        if (nav) {
+                            out.navLinkCount++;
+                            if (out.navLinks.length < budget.maxNavLinks) {
+                                out.navLinks.push({text: clip(node.textContent, budget.maxHeadingText), href: node.href});
+                            }
+                        }
+                    }
+                    break;
+                case 'img': {
+                    out.images.total++;
+                    const alt = node.getAttribute('alt');
+                    if (alt === null) out.images.missingAlt++;
+                    else if (alt.trim() === '') out.images.emptyAlt++;
+                    else out.images.withAlt++;
+                    break;
+                }
+                case 'form':
+                    out.forms.forms++;
+                    break;
+                case 'label':
+                    if (node.htmlFor) labelFor.add(node.htmlFor);
+                    break;
+                case 'input': case 'select': case 'textarea':
+                    if (node.type === 'hidden' || node.type === 'submit' || node.type === 'button') break;
+                    out.forms.inputs++;
+                    if (node.getAttribute('aria-label') || node.getAttribute('aria-labelledby') || node.closest('label')) {
+                        out.forms.labelled++;
+                    } else if (node.id) {
+                        unlabelledIds.push(node.id);
+                    }
+                    break;
+            }
+
+            if (STYLED.has(tag) && styleSamples < budget.maxStyleSamples) {
+                styleSamples++;
+                const style = getComputedStyle(node);
+                bump(fonts, style.fontFamily.split(',')[0].replace(/["']/g, '').trim());
+                bump(colors, style.color);
+                if (style.backgroundColor !== 'rgba(0, 0, 0, 0)') bump(colors, style.backgroundColor);
+            }
+
+            for (let c = node.lastChild; c; c = c.previousSibling) {
+                nodes.push(c); depths.push(depth + 1); inNav.push(childNav);
+            }
+        }
+
+        // <label for> may come after its input
+        out.forms.labelled += unlabelledIds.filter(id => labelFor.has(id)).length;
+        const top = map => Array.from(map.entries())
+            .sort((a, b) => b[1] - a[1])
+            .slice(0, budget.maxStyles)
+            .map(([value, count]) => ({value, count}));
+        out.fonts = top(fonts);
+        out.colors = top(colors);
+        out.visibleText = text.join(' ').slice(0, budget.maxText);
+        out.dom.extractMs = Math.round(performance.now() - started);
+        return out;
+    }
+"""
+
+
+class Headings(TypedDict):
+    h1: List[str]
+    h2: List[str]
+    h3: List[str]
+
+
+class NavLink(TypedDict):
+    text: str
+    href: str
+
+
+class StyleCount(TypedDict):
+    value: str
+    count: int
+
+
+class PageStructure(TypedDict):
+    """Extracted page structure as stored in structure.json and passed to the judge."""
+    title: str
+    metaDescription: str
+    lang: str
+    headings: Headings
+    headingCounts: Dict[str, int]
+    navLinks: List[NavLink]
+    navLinkCount: int
+    landmarks: Dict[str, int]
+    links: Dict[str, int]
+    images: Dict[str, int]
+    forms: Dict[str, int]
+    fonts: List[StyleCount]
+    colors: List[StyleCount]
+    dom: Dict[str, Any]
+    visibleText: str
+
+
+def _clip(value: Any, limit: int) -> str:
+    return str(value or '')[:limit]
+
+
+def _int_map(value: Any) -> Dict[str, int]:
+    if not isinstance(value, dict):
+        return {}
+    return {str(k): int(v) for k, v in value.items() if isinstance(v, (int, float))}
+
+
+def normalize_structure(raw: Dict[str, Any], max_bytes: int = MAX_STRUCTURE_BYTES) -> PageStructure:
+    """
+    Coerce extractor output (or an older structure.json) to PageStructure
+    and enforce the size budget.
+    """
+    raw = raw or {}
+    budget = EXTRACT_BUDGET
+    headings = raw.get('headings') or {}
+    nav_links = raw.get('navLinks') or []
+    structure: PageStructure = {
+        'title': _clip(raw.get('title'), budget['maxTitle']),
+        'metaDescription': _clip(raw.get('metaDescription'), budget['maxTitle'] * 2),
+        'lang': _clip(raw.get('lang'), 16),
+        'headings': {
+            level: [_clip(h, budget['maxHeadingText']) for h in (headings.get(level) or [])[:budget['maxHeadings']]]
+            for level in ('h1', 'h2', 'h3')
+        },
+        'headingCounts': _int_map(raw.get('headingCounts')),
+        'navLinks': [
+            {'text': _clip(link.get('text'), budget['maxHeadingText']), 'href': _clip(link.get('href'), 300)}
+            for link in nav_links[:budget['maxNavLinks']] if isinstance(link, dict)
+        ],
+        'navLinkCount': int(raw.get('navLinkCount', len(nav_links))),
+        'landmarks': _int_map(raw.get('landmarks')),
+        'links': _int_map(raw.get('links')),
+        'images': _int_map(raw.get('images')),
+        'forms': _int_map(raw.get('forms')),
+        'fonts': [
+            {'value': _clip(s.get('value'), 80), 'count': int(s.get('count', 0))}
+            for s in (raw.get('fonts') or [])[:budget['maxStyles']]
+        ],
+        'colors': [
+            {'value': _clip(s.get('value'), 40), 'count': int(s.get('count', 0))}
+            for s in (raw.get('colors') or [])[:budget['maxStyles']]
+        ],
+        'dom': dict(raw.get('dom') or {}),
+        'visibleText': _clip(raw.get('visibleText'), budget['maxText'])
+    }
+
+    # Trim the largest free-text fields until the structure fits
+    while len(json.dumps(structure, ensure_ascii=False).encode('utf-8')) > max_bytes:
+        if len(structure['visibleText']) > 200:
+            structure['visibleText'] = structure['visibleText'][:len(structure['visibleText']) // 2]
+        elif structure['navLinks']:
+            structure['navLinks'] = structure['navLinks'][:len(structure['navLinks']) // 2]
+        elif any(structure['headings'].values()):
+            structure['headings'] = {level: items[:len(items) // 2] for level, items in structure['headings'].items()}
+        else:
+            break
+    return structure
+
+
+def alt_text_coverage(structure: Dict[str, Any]) -> float:
+    """Share of images with an alt attribute (empty alt counts as decorative)."""
+    images = structure.get('images') or {}
+    total = images.get('total', 0)
+    if not total:
+        return 1.0
+    return round((total - images.get('missingAlt', 0)) / total, 3)
+
+
+def structure_section(structure: Dict[str, Any]) -> PromptSection:
+    """Prompt lines for a structure, by priority (see PromptBudget)."""
+    s = normalize_structure(structure)
+    limits = PROMPT_TOKEN_LIMITS
+    section = PromptSection('structure')
+    section.line('Page Title: ', s['title'] or 'N/A', dedupe=bool(s['title']))
+    section.line('Meta Description: ', s['metaDescription'] or 'N/A', priority=1, dedupe=bool(s['metaDescription']))
+    section.values('H1 Headings: ', s['headings']['h1'], priority=1, max_tokens=limits['h1'])
+    section.values('H2 Headings: ', s['headings']['h2'], priority=2, max_tokens=limits['h2'])
+    section.values('H3 Headings: ', s['headings']['h3'], priority=3, max_tokens=limits['h3'], empty=None)
+    section.line('Navigation Links: ', f"{s['navLinkCount']} links found", priority=1)
+    section.values('Navigation: ', [link['text'] for link in s['navLinks']], priority=3, max_tokens=limits['nav'], empty=None)
+    if s['landmarks']:
+        section.line('Landmarks: ', ', '.join(sorted(s['landmarks'])), priority=2)
+    if s['links']:
+        section.line(
+            'Links: ',
+            f"{s['links'].get('total', 0)} "
+            f"({s['links'].get('internal', 0)} internal, {s['links'].get('external', 0)} external)",
+            priority=2
+        )
+    if s['images']:
+        section.line(
+            'Images: ',
+            f"{s['images'].get('total', 0)}, alt text coverage {alt_text_coverage(s):.0%}",
+            priority=2
+        )
+    if s['forms'].get('inputs'):
+        section.line(
+            'Forms: ',
+            f"{s['forms'].get('forms', 0)} with {s['forms']['inputs']} inputs, "
+            f"{s['forms'].get('labelled', 0)} labelled",
+            priority=2
+        )
+    if s['fonts']:
+        section.line('Fonts: ', ', '.join(f['value'] for f in s['fonts'][:4]), priority=2)
+    if s['colors']:
+        section.line('Main Colors: ', ', '.join(c['value'] for c in s['colors'][:5]), priority=2)
+    if s['dom'].get('elements'):
+        section.line('DOM: ', f"{s['dom']['elements']} elements, depth {s['dom'].get('maxDepth', 0)}", priority=2)
+    section.text('Visible Text Sample: ', s['visibleText'], priority=4, max_tokens=limits['visibleText'])
+    return section
@@ -1,16 +1,80 @@
 """Playwright-based website evidence capture."""
+import asyncio
 import json
 import logging
 from pathlib import Path
 from typing import Dict, Any, List
-from playwright.sync_api import sync_playwright, Page, Browser
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from playwright.sync_api import sync_playwright
 from config import Config
+from judge_worker.page_structure import EXTRACT_SCRIPT, EXTRACT_BUDGET, normalize_structure
+from judge_worker.viewports import DESKTOP_CONTEXT, MOBILE_CONTEXT
 
 logger = logging.getLogger(__name__)
 
+BROWSER_ARGS = ['--no-sandbox', '--disable-gpu']
+
+
+def _new_evidence(url: str, submission_id: str) -> Dict[str, Any]:
+    return {
+        'url': url,
+        'submission_id': submission_id,
+        'screenshots': {},
+        'extracted': {},
+        'console': [],
+        'network_errors': [],
+        'failed_requests': []
+    }
+
+
+def _attach_listeners(page, console_logs: List[Dict[str, Any]], failed_requests: List[Dict[str, Any]]):
+    """Record console messages and failed responses from page."""
+    def handle_console(msg):
+        console_logs.append({
+            'type': msg.type,
+            'text': msg.text,
+            'location': str(msg.location) if msg.location else None
+        })
+
+    def handle_response(response):
+        if response.status >= 400:
+            failed_requests.append({
+                'url': response.url,
+                'status': response.status,
+                'method': response.request.method
+            })
+
+    page.on('console', handle_console)
+    page.on('response', handle_response)
+
+
+def _finish_evidence(
+    evidence: Dict[str, Any],
+    artifacts_dir: Path,
+    submission_id: str,
+    extracted: Dict[str, Any],
+    console_logs: List[Dict[str, Any]],
+    network_errors: List[Dict[str, Any]],
+    failed_requests: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Fill in logs and counts and save the extracted structure JSON."""
+    evidence['extracted'] = extracted
+    evidence['console'] = console_logs
+    evidence['network_errors'] = network_errors
+    evidence['failed_requests'] = failed_requests
+
+    # Count console errors
+    console_error_count = len([log for log in console_logs if log['type'] == 'error'])
+    evidence['console_error_count'] = console_error_count
+    evidence['failed_request_count'] = len(failed_requests)
+
+    # Save extracted structure JSON
+    structure_path = artifacts_dir / f"{submission_id}_structure.json"
+    with open(structure_path, 'w', encoding='utf-8') as f:
+        json.dump(extracted, f, indent=2, ensure_ascii=False)
+    evidence['structure_json'] = str(structure_path)
+    return evidence
+
+
 class PlaywrightCapture:
     """Capture website evidence using Playwright."""
     
@@ -25,7 +89,7 @@ class PlaywrightCapture:
         self.playwright = sync_playwright().start()
         self.browser = self.playwright.chromium.launch(
             headless=True,
-            args=['--no-sandbox', '--disable-gpu']
+            args=BROWSER_ARGS
         )
         return self
     
@@ -41,45 +105,17 @@ class PlaywrightCapture:
         Capture evidence from website.
         Returns dict with screenshots, extracted data, console logs, network errors.
         """
-        context = self.browser.new_context(
-            viewport={'width': 1440, 'height': 900},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        )
+        context = self.browser.new_context(**DESKTOP_CONTEXT)
         page = context.new_page()
         
-        evidence = {
-            'url': url,
-            'submission_id': submission_id,
-            'screenshots': {},
-            'extracted': {},
-            'console': [],
-            'network_errors': [],
-            'failed_requests': []
-        }
+        evidence = _new_evidence(url, submission_id)
         
         try:
             # Set up console and network listeners
             console_logs = []
             network_errors = []
             failed_requests = []
-            
-            def handle_console(msg):
-                console_logs.append({
-                    'type': msg.type,
-                    'text': msg.text,
-                    'location': str(msg.location) if msg.location else None
-                })
-            
-            def handle_response(response):
-                if response.status >= 400:
-                    failed_requests.append({
-                        'url': response.url,
-                        'status': response.status,
-                        'method': response.request.method
-                    })
-            
-            page.on('console', handle_console)
-            page.on('response', handle_response)
+            _attach_listeners(page, console_logs, failed_requests)
             
             # Navigate with timeout
             logger.info(f"Navigating to {url}")
@@ -104,32 +140,10 @@ class PlaywrightCapture:
             evidence['screenshots']['desktop'] = str(desktop_path)
             
             # Extract page structure
-            extracted = page.evaluate("""
-                () => {
-                    const data = {
-                        title: document.title,
-                        metaDescription: document.querySelector('meta[name="description"]')?.content || '',
-                        headings: {
-                            h1: Array.from(document.querySelectorAll('h1')).map(h => h.textContent.trim()),
-                            h2: Array.from(document.querySelectorAll('h2')).map(h => h.textContent.trim()),
-                            h3: Array.from(document.querySelectorAll('h3')).map(h => h.textContent.trim())
-                        },
-                        navLinks: Array.from(document.querySelectorAll('nav a, header a')).map(a => ({
-                            text: a.textContent.trim(),
-                            href: a.href
-                        })).slice(0, 20),
-                        visibleText: document.body.innerText.substring(0, 2000)
-                    };
-                    return data;
-                }
-            """)
-            evidence['extracted'] = extracted
+            extracted = normalize_structure(page.evaluate(EXTRACT_SCRIPT, EXTRACT_BUDGET))
             
             # Switch to mobile viewport
-            mobile_context = self.browser.new_context(
-                viewport={'width': 390, 'height': 844},  # iPhone 12 size
-                user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15'
-            )
+            mobile_context = self.browser.new_context(**MOBILE_CONTEXT)
             mobile_page = mobile_context.new_page()
             mobile_page.goto(url, wait_until='networkidle', timeout=Config.NAVIGATION_TIMEOUT_MS)
             mobile_page.wait_for_timeout(2000)
@@ -141,20 +155,10 @@ class PlaywrightCapture:
             mobile_context.close()
             
             # Collect console and network data
-            evidence['console'] = console_logs
-            evidence['network_errors'] = network_errors
-            evidence['failed_requests'] = failed_requests
-            
-            # Count console errors
-            console_error_count = len([log for log in console_logs if log['type'] == 'error'])
-            evidence['console_error_count'] = console_error_count
-            evidence['failed_request_count'] = len(failed_requests)
-            
-            # Save extracted structure JSON
-            structure_path = self.artifacts_dir / f"{submission_id}_structure.json"
-            with open(structure_path, 'w', encoding='utf-8') as f:
-                json.dump(extracted, f, indent=2, ensure_ascii=False)
-            evidence['structure_json'] = str(structure_path)
+            _finish_evidence(
+                evidence, self.artifacts_dir, submission_id,
+                extracted, console_logs, network_errors, failed_requests
+            )
             
             logger.info(f"Capture completed for {url}")
             return evidence
@@ -166,3 +170,101 @@ class PlaywrightCapture:
         finally:
             context.close()
 
+
+class AsyncPlaywrightCapture:
+    """
+    Capture website evidence with playwright.async_api.
+
+    One browser is shared by every capture made while the context manager
+    is open; each capture gets its own browser contexts, and the desktop
+    and mobile passes run concurrently.
+    """
+
+    def __init__(self, artifacts_dir: Path):
+        """Initialize capture with artifacts directory."""
+        self.artifacts_dir = artifacts_dir
+        self.playwright = None
+        self.browser = None
+
+    async def __aenter__(self):
+        """Start Playwright and launch the shared browser."""
+        from playwright.async_api import async_playwright
+
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(
+            headless=True,
+            args=BROWSER_ARGS
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Close the shared browser."""
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    async def _capture_desktop(self, url: str, submission_id: str, evidence: Dict[str, Any]):
+        context = await self.browser.new_context(**DESKTOP_CONTEXT)
+        try:
+            page = await context.new_page()
+            console_logs = []
+            network_errors = []
+            failed_requests = []
+            _attach_listeners(page, console_logs, failed_requests)
+
+            logger.info(f"Navigating to {url}")
+            await page.goto(url, wait_until='networkidle', timeout=Config.NAVIGATION_TIMEOUT_MS)
+            await page.wait_for_timeout(2000)
+
+            # Scroll to load lazy content
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await page.wait_for_timeout(1000)
+            await page.evaluate("window.scrollTo(0, 0)")
+            await page.wait_for_timeout(500)
+
+            desktop_path = self.artifacts_dir / f"{submission_id}_desktop.png"
+            await page.screenshot(path=str(desktop_path), full_page=True)
+            evidence['screenshots']['desktop'] = str(desktop_path)
+
+            extracted = normalize_structure(await page.evaluate(EXTRACT_SCRIPT, EXTRACT_BUDGET))
+            return extracted, console_logs, network_errors, failed_requests
+        finally:
+            await context.close()
+
+    async def _capture_mobile(self, url: str, submission_id: str, evidence: Dict[str, Any]):
+        context = await self.browser.new_context(**MOBILE_CONTEXT)
+        try:
+            page = await context.new_page()
+            await page.goto(url, wait_until='networkidle', timeout=Config.NAVIGATION_TIMEOUT_MS)
+            await page.wait_for_timeout(2000)
+
+            mobile_path = self.artifacts_dir / f"{submission_id}_mobile.png"
+            await page.screenshot(path=str(mobile_path), full_page=True)
+            evidence['screenshots']['mobile'] = str(mobile_path)
+        finally:
+            await context.close()
+
+    async def capture(self, url: str, submission_id: str) -> Dict[str, Any]:
+        """
+        Capture evidence from website.
+        Returns the same dict shape as PlaywrightCapture.capture.
+        """
+        evidence = _new_evidence(url, submission_id)
+        try:
+            desktop, _ = await asyncio.gather(
+                self._capture_desktop(url, submission_id, evidence),
+                self._capture_mobile(url, submission_id, evidence)
+            )
+            extracted, console_logs, network_errors, failed_requests = desktop
+            await asyncio.to_thread(
+                _finish_evidence,
+                evidence, self.artifacts_dir, submission_id,
+                extracted, console_logs, network_errors, failed_requests
+            )
+            logger.info(f"Capture completed for {url}")
+            return evidence
+
+        except Exception as e:
+            logger.error(f"Error capturing {url}: {e}")
+            raise
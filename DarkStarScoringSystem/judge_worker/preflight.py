@@ -0,0 +1,200 @@
+"""Fast reachability checks run before any browser-based stage."""
+import logging
+import socket
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Statuses that mean there is nothing to judge; other 4xx/5xx are often
+# bot protection and are left for the browser to decide
+FATAL_STATUSES = {404, 410}
+# Statuses of an overloaded or briefly down site; the check is retried
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Resolver errors that may clear up (SERVFAIL, resolver timeout); others, such as NXDOMAIN, are final
+TRANSIENT_DNS_ERRORS = {socket.EAI_AGAIN}
+# Reasons that are retried with the preflight stage's retry policy
+RETRYABLE_REASONS = ('timeout', 'connection')
+
+
+class PreflightError(Exception):
+    """Raised for a URL that cannot be judged, or (retryable) cannot be judged right now."""
+
+    def __init__(self, message: str, reason: str, retryable: bool = False):
+        super().__init__(message)
+        self.reason = reason
+        self.retryable = retryable or reason in RETRYABLE_REASONS
+
+
+class PreflightChecker:
+    """
+    Resolve, connect and follow redirects with short timeouts.
+
+    Connections are pooled across checks and DNS answers (including
+    failures) are cached for `dns_cache_ttl` seconds, so a queue full of
+    entries for the same dead host costs one lookup.
+    """
+
+    USER_AGENT = 'Mozilla/5.0 (compatible; DarkStarScoringSystem preflight)'
+
+    def __init__(self, timeout: int = 5, max_redirects: int = 5, dns_cache_ttl: int = 300):
+        """Initialize checker with a pooled HTTP session."""
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.dns_cache_ttl = dns_cache_ttl
+        self._dns_cache: Dict[str, Tuple[float, List[str], Optional[str], Optional[str], bool]] = {}
+        self._dns_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = self.USER_AGENT
+
+    def resolve(self, host: str) -> List[str]:
+        """Resolve host to addresses, using the cache when fresh."""
+        now = time.time()
+        with self._dns_lock:
+            cached = self._dns_cache.get(host)
+        if cached and now - cached[0] < self.dns_cache_ttl:
+            addresses, error, reason, transient = cached[1:]
+        else:
+            transient = False
+            try:
+                infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+                addresses = sorted({info[4][0] for info in infos})
+                error = reason = None
+            except socket.gaierror as e:
+                addresses, error, reason = [], str(e), 'dns'
+                transient = e.errno in TRANSIENT_DNS_ERRORS
+            except (UnicodeError, ValueError) as e:
+                # IDNA encoding rejects hosts such as "a..b.com"
+                addresses, error, reason = [], str(e), 'invalid_url'
+            if not transient:
+                # A resolver hiccup is asked again on the next check
+                with self._dns_lock:
+                    self._dns_cache[host] = (now, addresses, error, reason, transient)
+
+        if error:
+            if reason == 'invalid_url':
+                raise PreflightError(f"Invalid host name {host!r}: {error}", reason)
+            raise PreflightError(f"DNS resolution failed for {host}: {error}", reason, retryable=transient)
+        return addresses
+
+    def _request(self, url: str) -> requests.Response:
+        """HEAD the URL, falling back to a streamed GET when HEAD isn't supported."""
+        timeout = (self.timeout, self.timeout)
+        response = self.session.head(url, allow_redirects=False, timeout=timeout)
+        if response.status_code in (403, 405, 501):
+            response.close()
+            response = self.session.get(url, allow_redirects=False, timeout=timeout, stream=True)
+            # Only headers are needed; don't download the body
+            response.close()
+        return response
+
+    def check(self, url: str) -> Dict[str, Any]:
+        """
+        Check that url is reachable and serves HTML.
+        Returns a dict with ok, finalUrl, redirectChain, status, contentType,
+        addresses, elapsedMs and, when not ok, error, reason and whether
+        the failure is retryable (timeouts, transient DNS errors, 429/5xx).
+        """
+        start_time = time.time()
+        result = {
+            'ok': False,
+            'url': url,
+            'finalUrl': url,
+            'redirectChain': [],
+            'status': None,
+            'contentType': None,
+            'addresses': [],
+            'elapsedMs': 0,
+            'error': None,
+            'reason': None,
+            'retryable': False
+        }
+
+        try:
+            current = url
+            seen = set()
+            while True:
+                try:
+                    parts = urlsplit(current)
+                    hostname = parts.hostname
+                except ValueError as e:
+                    # Unbalanced IPv6 brackets and the like
+                    raise PreflightError(f"Invalid URL {current}: {e}", 'invalid_url')
+                if parts.scheme not in ('http', 'https') or not hostname:
+                    raise PreflightError(f"Unsupported URL: {current}", 'invalid_url')
+                if current in seen:
+                    raise PreflightError(f"Redirect loop at {current}", 'redirect_loop')
+                seen.add(current)
+
+                result['addresses'] = self.resolve(hostname)
+
+                try:
+                    response = self._request(current)
+                except requests.exceptions.SSLError as e:
+                    raise PreflightError(f"TLS error for {current}: {e}", 'tls')
+                except requests.exceptions.Timeout:
+                    raise PreflightError(f"Timed out after {self.timeout}s: {current}", 'timeout')
+                except requests.exceptions.ConnectionError as e:
+                    raise PreflightError(f"Connection failed for {current}: {e}", 'connection')
+                except (requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema,
+                        requests.exceptions.MissingSchema) as e:
+                    raise PreflightError(f"Invalid URL {current}: {e}", 'invalid_url')
+                except (requests.RequestException, UnicodeError, ValueError) as e:
+                    # Bad chunked encoding, oversized headers, undecodable URLs
+                    raise PreflightError(f"Request failed for {current}: {e}", 'request_error')
+
+                status = response.status_code
+                location = response.headers.get('Location')
+                if 300 <= status < 400 and location:
+                    result['redirectChain'].append({'url': current, 'status': status})
+                    if len(result['redirectChain']) > self.max_redirects:
+                        raise PreflightError(
+                            f"More than {self.max_redirects} redirects from {url}", 'too_many_redirects'
+                        )
+                    try:
+                        current = urljoin(current, location)
+                    except ValueError as e:
+                        raise PreflightError(f"Invalid redirect from {current} to {location!r}: {e}", 'invalid_url')
+                    continue
+
+                result['finalUrl'] = current
+                result['status'] = status
+                content_type = response.headers.get('Content-Type', '')
+                result['contentType'] = content_type or None
+
+                if status in FATAL_STATUSES:
+                    raise PreflightError(f"HTTP {status} for {current}", 'http_status')
+                if status in RETRY_STATUSES:
+                    raise PreflightError(f"HTTP {status} for {current}", 'http_status', retryable=True)
+                media_type = content_type.split(';')[0].strip().lower()
+                if media_type and media_type not in HTML_CONTENT_TYPES:
+                    raise PreflightError(f"Not an HTML page ({media_type}): {current}", 'content_type')
+                break
+
+            result['ok'] = True
+
+        except PreflightError as e:
+            result['error'] = str(e)
+            result['reason'] = e.reason
+            result['retryable'] = e.retryable
+
+        result['elapsedMs'] = int((time.time() - start_time) * 1000)
+        if result['ok']:
+            logger.info(
+                f"Preflight ok for {url} -> {result['finalUrl']} "
+                f"({len(result['redirectChain'])} redirects, {result['elapsedMs']}ms)"
+            )
+        else:
+            logger.warning(f"Preflight failed for {url}: {result['error']}")
+        return result
@@ -0,0 +1,206 @@
+"""On-demand profiling of single jobs."""
+import cProfile
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sample', 'cprofile')
+# Allocation sites listed in the memory report
+TOP_ALLOCATIONS = 25
+
+
+def profile_mode(value: Any, default: str = 'sample') -> Optional[str]:
+    """Mode requested by an entry's `profile` field: true, or a mode name."""
+    if value is True:
+        return default
+    if isinstance(value, str) and value in PROFILE_MODES:
+        return value
+    return None
+
+
+class StackSampler:
+    """
+    Sampling profiler writing collapsed stacks (flamegraph.pl / speedscope).
+
+    A daemon thread reads every thread's current frame each interval.
+    Only the job's thread and threads started after it (executor workers
+    for Lighthouse waves, ensemble members) are sampled, so idle heartbeat
+    and governor threads don't show up. Each stack starts with its thread
+    name.
+    """
+
+    def __init__(self, interval_ms: float = 10.0):
+        """Initialize sampler."""
+        self.interval = interval_ms / 1000.0
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ignored: set = set()
+        self._names: Dict[int, str] = {}
+
+    def start(self):
+        """Start sampling the calling thread and threads it starts."""
+        own = threading.get_ident()
+        self._ignored = {thread.ident for thread in threading.enumerate() if thread.ident != own}
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+        self._ignored.add(self._thread.ident)
+
+    def stop(self):
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _thread_name(self, ident: int) -> str:
+        if ident not in self._names:
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+        return self._names.get(ident, str(ident)).replace(';', ':').replace(' ', '_')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident in self._ignored:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(self._thread_name(ident))
+                self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path: Path):
+        """One `frame;frame;frame count` line per distinct stack."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class JobProfiler:
+    """
+    Profile one job and write its artifacts to the artifacts directory:
+
+    - sample: collapsed stacks, `<id>_profile.collapsed`
+    - cprofile: deterministic profile of the job's thread, `<id>_profile.pstats`
+    - memory (either mode): tracemalloc peak and top allocation sites,
+      `<id>_profile_memory.txt`
+
+    Use as a context manager or call start() and stop(). Errors while
+    writing artifacts are logged and never fail the job.
+    """
+
+    def __init__(
+        self,
+        submission_id: str,
+        artifacts_dir: Path,
+        mode: str = 'sample',
+        interval_ms: float = 10.0,
+        memory: bool = False,
+        memory_frames: int = 5
+    ):
+        """Initialize profiler for one job."""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of {', '.join(PROFILE_MODES)})")
+        self.submission_id = submission_id
+        self.artifacts_dir = Path(artifacts_dir)
+        self.mode = mode
+        self.interval_ms = interval_ms
+        self.memory = memory
+        self.memory_frames = memory_frames
+        self.paths: List[Path] = []
+        self._sampler: Optional[StackSampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._started_tracemalloc = False
+        self._start_time = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        """Start profiling; nothing is left running if this raises."""
+        self._start_time = time.perf_counter()
+        try:
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start(self.memory_frames)
+                self._started_tracemalloc = True
+            if self.mode == 'sample':
+                self._sampler = StackSampler(self.interval_ms)
+                self._sampler.start()
+            else:
+                # Fails while another profiler is active on this thread
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+        except Exception:
+            self._sampler = self._profile = None
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            raise
+
+    def stop(self) -> List[Path]:
+        """Stop profiling and write the artifacts; returns their paths."""
+        if self._profile:
+            self._profile.disable()
+        if self._sampler:
+            self._sampler.stop()
+        self.elapsed = time.perf_counter() - self._start_time
+        try:
+            self._write(self.elapsed)
+        except Exception as e:
+            logger.warning(f"Error writing profile for {self.submission_id}: {e}")
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        logger.info(
+            f"Profiled {self.submission_id} ({self.mode}, {self.elapsed:.1f}s): "
+            f"{', '.join(str(path) for path in self.paths) or 'no artifacts'}"
+        )
+        return self.paths
+
+    def __enter__(self) -> 'JobProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _write(self, elapsed: float):
+        self.artifacts_dir.mkdir(parents=True, exist_ok=True)
+        prefix = f"{self.submission_id}_profile"
+        if self._sampler:
+            path = self.artifacts_dir / f"{prefix}.collapsed"
+            self._sampler.write(path)
+            self.paths.append(path)
+        if self._profile:
+            path = self.artifacts_dir / f"{prefix}.pstats"
+            self._profile.dump_stats(str(path))
+            self.paths.append(path)
+        if self._started_tracemalloc:
+            path = self.artifacts_dir / f"{prefix}_memory.txt"
+            self._write_memory(path, elapsed)
+            self.paths.append(path)
+
+    def _write_memory(self, path: Path, elapsed: float):
+        """Peak traced memory and the largest allocation sites still live."""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+        ))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"job {self.submission_id}: {elapsed:.1f}s\n")
+            f.write(f"traced memory: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n\n")
+            f.write(f"Top {TOP_ALLOCATIONS} allocation sites live at job end:\n")
+            for stat in snapshot.statistics('traceback')[:TOP_ALLOCATIONS]:
+                f.write(f"{stat.size / 1e3:10.1f} KB in {stat.count} blocks\n")
+                for line in stat.traceback.format(most_recent_first=True):
+                    f.write(f"    {line}\n")
@@ -0,0 +1,307 @@
+"""Token-budgeted assembly of the judging prompt."""
+import logging
+import math
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pieces a BPE tokenizer rarely merges across: letter runs, digit runs,
+# punctuation runs, line breaks and single non-ASCII characters
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d\x80-\U0010ffff]+|\n+|[\x80-\U0010ffff]")
+_WORD = re.compile(r'\w+', re.UNICODE)
+_SENTENCE = re.compile(r'(?<=[.!?])\s+')
+
+# Visible text shorter than this is not worth including
+MIN_TEXT_TOKENS = 16
+# Rendered in place of a section with no lines
+EMPTY_SECTION = 'Not available'
+
+
+def raw_token_estimate(text: str) -> int:
+    """
+    Token count estimate tuned to Llama-style BPE vocabularies: a short
+    word is one token, long words and numbers split every 7 letters or
+    3 digits, punctuation pairs up, and non-ASCII is about one per character.
+    """
+    tokens = 0
+    for piece in _PIECE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += 1 + (len(piece) - 1) // 7
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif first == '\n' or not first.isascii():
+            tokens += 1
+        else:
+            tokens += math.ceil(len(piece) / 2)
+    return tokens
+
+
+def normalize(text: str) -> str:
+    """Lower-cased words only; equal for text that differs in case, spacing or punctuation."""
+    return ' '.join(_WORD.findall(text.casefold()))
+
+
+class TokenEstimator:
+    """
+    Fast token counter calibrated per model.
+
+    Ollama reports the true prompt length (prompt_eval_count) with every
+    full response; observe() folds the ratio between that and the raw
+    estimate into a moving average, so counts converge on the model's own
+    tokenizer after a few judgments.
+    """
+
+    ALPHA = 0.2
+    # Samples outside this ratio come from cached prefixes or truncated prompts
+    MIN_RATIO = 0.5
+    MAX_RATIO = 2.0
+
+    def __init__(self):
+        """Initialize with no calibration (ratio 1.0 for every model)."""
+        self._ratios: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def ratio(self, model: Optional[str]) -> float:
+        """Current calibration factor for model."""
+        return self._ratios.get(model or '', 1.0)
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        """Estimated tokens of text for model."""
+        return math.ceil(raw_token_estimate(text) * self.ratio(model))
+
+    def observe(self, model: str, text: str, actual: Optional[int]):
+        """Calibrate model's ratio from the token count Ollama reported for text."""
+        estimate = raw_token_estimate(text)
+        if not actual or not estimate:
+            return
+        sample = actual / estimate
+        if not self.MIN_RATIO <= sample <= self.MAX_RATIO:
+            return
+        with self._lock:
+            current = self._ratios.get(model)
+            self._ratios[model] = sample if current is None else current + self.ALPHA * (sample - current)
+        logger.debug(f"Token estimate for {model}: {estimate} raw, {actual} actual, ratio {self._ratios[model]:.3f}")
+
+
+class PromptSection:
+    """
+    Named block of prompt lines.
+
+    Every line has a priority (0 = always included, higher = dropped
+    first). Values of lines marked dedupe are compared across the whole
+    prompt, so the same heading, link text or sentence is only sent once.
+    """
+
+    def __init__(self, name: str):
+        """Initialize empty section."""
+        self.name = name
+        self.items: List[Dict[str, Any]] = []
+
+    def line(self, prefix: str, value: Any = '', priority: int = 0, dedupe: bool = False) -> 'PromptSection':
+        """A line kept or dropped as a whole."""
+        self.items.append({'kind': 'line', 'prefix': prefix, 'value': str(value), 'priority': priority, 'dedupe': dedupe})
+        return self
+
+    def values(
+        self,
+        prefix: str,
+        values: List[str],
+        priority: int = 1,
+        max_tokens: Optional[int] = None,
+        empty: Optional[str] = 'N/A'
+    ) -> 'PromptSection':
+        """
+        A comma-separated list filled value by value up to max_tokens.
+        An empty list renders as empty, or not at all when that is None.
+        """
+        self.items.append({
+            'kind': 'values', 'prefix': prefix, 'values': [str(v) for v in values if v],
+            'priority': priority, 'max_tokens': max_tokens, 'empty': empty, 'dedupe': True
+        })
+        return self
+
+    def text(self, prefix: str, value: str, priority: int = 3, max_tokens: Optional[int] = None) -> 'PromptSection':
+        """Free text cut at a word boundary to whatever budget is left."""
+        self.items.append({
+            'kind': 'text', 'prefix': prefix, 'value': value or '',
+            'priority': priority, 'max_tokens': max_tokens, 'dedupe': True
+        })
+        return self
+
+
+class PromptBudget:
+    """
+    Fit prompt sections into a token budget.
+
+    The template (everything outside the sections) is always sent. The
+    rest of the budget goes to section lines in priority order, each list
+    and free-text line capped by its own max_tokens; lines are rendered
+    back in their original order.
+    """
+
+    def __init__(self, budget_tokens: int, estimator: Optional[TokenEstimator] = None):
+        """Initialize with a total prompt budget."""
+        self.budget_tokens = budget_tokens
+        self.estimator = estimator or TokenEstimator()
+
+    def build(
+        self,
+        template: str,
+        sections: List[PromptSection],
+        model: Optional[str] = None,
+        **fields: Any
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Render template with fields and one placeholder per section name.
+        Returns the prompt and its stats (estimated tokens, build time,
+        dropped and duplicate values).
+        """
+        start = time.perf_counter()
+        count = lambda text: self.estimator.count(text, model)
+        # Measured with every section empty, so a section that stays empty
+        # costs nothing extra and one with lines is slightly overestimated
+        fixed = count(template.format(**fields, **{section.name: EMPTY_SECTION for section in sections}))
+        remaining = self.budget_tokens - fixed
+
+        if remaining < 0:
+            logger.warning(f"Prompt template alone is ~{fixed} tokens, over the {self.budget_tokens} token budget")
+        # Everything sent so far, and the subset that came from value lists.
+        # Lists only skip values repeated from other lists (an H1 equal to
+        # the title is still listed); free text skips anything sent before.
+        seen: Dict[str, str] = {}
+        listed = set()
+        rendered: Dict[int, str] = {}
+        dropped = duplicates = 0
+        order = [
+            (item['priority'], position, item)
+            for position, item in enumerate(item for section in sections for item in section.items)
+        ]
+        for priority, position, item in sorted(order, key=lambda entry: entry[:2]):
+            if item['kind'] == 'line':
+                key = normalize(item['value'])
+                if item['dedupe'] and key and key in seen:
+                    duplicates += 1
+                    continue
+                line = f"{item['prefix']}{item['value']}"
+                cost = count(line + '\n')
+                if cost > remaining and priority > 0:
+                    dropped += 1
+                    continue
+                remaining -= cost
+                rendered[position] = line
+                if item['dedupe'] and key:
+                    seen[key] = item['value']
+
+            elif item['kind'] == 'values':
+                line, cost, left_out, repeated = self._fill_values(item, seen, listed, min(remaining, item['max_tokens'] or remaining), count)
+                dropped += left_out
+                duplicates += repeated
+                if line is not None:
+                    remaining -= cost
+                    rendered[position] = line
+
+            else:
+                line, cost, repeated = self._fill_text(item, seen, min(remaining, item['max_tokens'] or remaining), count)
+                duplicates += repeated
+                if line is None:
+                    dropped += bool(item['value'])
+                    continue
+                remaining -= cost
+                rendered[position] = line
+
+        blocks: Dict[str, str] = {}
+        position = 0
+        for section in sections:
+            lines = [rendered[p] for p in range(position, position + len(section.items)) if p in rendered]
+            position += len(section.items)
+            blocks[section.name] = '\n'.join(lines) if lines else EMPTY_SECTION
+        prompt = template.format(**fields, **blocks)
+
+        stats = {
+            'tokens': count(prompt),
+            'budgetTokens': self.budget_tokens,
+            'buildMs': round((time.perf_counter() - start) * 1000, 2),
+            'dropped': dropped,
+            'duplicates': duplicates
+        }
+        return prompt, stats
+
+    def _fill_values(self, item, seen, listed, limit, count):
+        """Add list values until limit; returns (line or None, cost, dropped, duplicates)."""
+        prefix = item['prefix']
+        if not item['values']:
+            if item['empty'] is None:
+                return None, 0, 0, 0
+            line = f"{prefix}{item['empty']}"
+            cost = count(line + '\n')
+            return (line, cost, 0, 0) if cost <= limit else (None, 0, 0, 0)
+        cost = count(prefix + '\n')
+        kept, repeated = [], 0
+        for index, value in enumerate(item['values']):
+            key = normalize(value)
+            if not key or key in listed:
+                repeated += 1
+                continue
+            value_cost = count(value + ', ')
+            if cost + value_cost > limit:
+                return (
+                    (f"{prefix}{', '.join(kept)}", cost, len(item['values']) - index, repeated)
+                    if kept else (None, 0, len(item['values']) - index, repeated)
+                )
+            cost += value_cost
+            kept.append(value)
+            seen[key] = value
+            listed.add(key)
+        if not kept:
+            return None, 0, 0, repeated
+        return f"{prefix}{', '.join(kept)}", cost, 0, repeated
+
+    def _fill_text(self, item, seen, limit, count):
+        """Deduplicated text cut to limit; returns (line or None, cost, duplicates)."""
+        text = item['value']
+        # Headings and link text usually reappear verbatim in page text
+        for value in sorted(seen.values(), key=len, reverse=True):
+            if len(value) >= 12:
+                text = text.replace(value, ' ', 1)
+        sentences, repeated = [], 0
+        for sentence in _SENTENCE.split(' '.join(text.split())):
+            key = normalize(sentence)
+            if not key:
+                continue
+            if key in seen:
+                repeated += 1
+                continue
+            seen[key] = sentence
+            sentences.append(sentence)
+
+        prefix = item['prefix']
+        cost = count(prefix + '\n')
+        if not sentences or limit - cost < MIN_TEXT_TOKENS:
+            return None, 0, repeated
+        kept = []
+        for sentence in sentences:
+            sentence_cost = count(' ' + sentence)
+            if cost + sentence_cost <= limit:
+                kept.append(sentence)
+                cost += sentence_cost
+                continue
+            # Cut the first sentence that doesn't fit at a word boundary
+            words = sentence.split(' ')
+            low, high = 0, len(words)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if cost + count(' ' + ' '.join(words[:middle]) + '...') <= limit:
+                    low = middle
+                else:
+                    high = middle - 1
+            if low:
+                kept.append(' '.join(words[:low]) + '...')
+                cost += count(' ' + kept[-1])
+            break
+        if not kept:
+            return None, 0, repeated
+        return f"{prefix}{' '.join(kept)}", cost, repeated
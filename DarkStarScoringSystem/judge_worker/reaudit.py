@@ -0,0 +1,379 @@
+"""Change detection for scored entries and rejudging of sites that changed."""
+import codecs
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from judge_worker.similarity import minhash_signature, signature_similarity
+
+logger = logging.getLogger(__name__)
+
+# Content of these elements is neither structure nor visible text
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'canvas'}
+
+
+class _SkeletonParser(HTMLParser):
+    """Collect the tag sequence and visible text of an HTML document."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tags: List[str] = []
+        self.text: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag in SKIPPED_TAGS:
+                self._skip_depth += 1
+            return
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = 1
+            return
+        self.tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip_depth:
+            self.tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if self._skip_depth and tag in SKIPPED_TAGS:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth and data.strip():
+            self.text.append(data)
+
+
+def page_fingerprint(html: str) -> Dict[str, Any]:
+    """
+    Fingerprint of a page's DOM: an exact hash of tag sequence and text,
+    plus MinHash signatures of each so small edits can be told from
+    material ones. Attributes are ignored; generated class names and
+    nonces change on every deploy.
+    """
+    parser = _SkeletonParser()
+    parser.feed(html)
+    parser.close()
+    skeleton = ' '.join(parser.tags)
+    text = ' '.join(' '.join(parser.text).split())
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(skeleton.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    structure_signature = minhash_signature(skeleton)
+    text_signature = minhash_signature(text)
+    return {
+        'domHash': digest.hexdigest(),
+        'elements': len(parser.tags),
+        'structureSignature': structure_signature.tolist() if structure_signature is not None else None,
+        'textSignature': text_signature.tolist() if text_signature is not None else None
+    }
+
+
+def _similarity(a: Optional[List[int]], b: Optional[List[int]]) -> float:
+    """Estimated Jaccard similarity of two stored signatures (1.0 if both are missing)."""
+    if a is None and b is None:
+        return 1.0
+    if a is None or b is None:
+        return 0.0
+    return signature_similarity(np.array(a, dtype=np.uint64), np.array(b, dtype=np.uint64))
+
+
+def _decoder(encoding: Optional[str]) -> str:
+    """encoding if Python knows it, otherwise utf-8."""
+    try:
+        return codecs.lookup(encoding).name if encoding else 'utf-8'
+    except LookupError:
+        return 'utf-8'
+
+
+def _error_state(state: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    """Reaudit state after a failed check; the fingerprint is kept."""
+    return {
+        **state,
+        'errorCount': state.get('errorCount', 0) + 1,
+        'lastError': str(error)[:300]
+    }
+
+
+def next_check_at(submission_id: str, now: datetime, interval_seconds: float, spread_seconds: float) -> datetime:
+    """
+    Next slot for an entry's check after now. Slots repeat every interval
+    at a fixed phase within the first spread_seconds of it, derived from
+    the entry id, so checks stay evenly spread however entries arrive.
+    """
+    digest = hashlib.blake2b(submission_id.encode('utf-8'), digest_size=8).digest()
+    phase = int.from_bytes(digest, 'big') % max(1, int(min(spread_seconds, interval_seconds)))
+    epoch = now.timestamp()
+    slot = (epoch - phase) // interval_seconds * interval_seconds + phase + interval_seconds
+    return datetime.fromtimestamp(slot, timezone.utc)
+
+
+class ChangeDetector:
+    """
+    Conditional GET of an entry's URL and comparison with its last fingerprint.
+
+    A 304 or an identical DOM hash means unchanged. Otherwise the page
+    counts as changed when its text or tag structure similarity falls
+    below the thresholds. Connections are pooled across checks.
+    """
+
+    USER_AGENT = 'Mozilla/5.0 (compatible; DarkStarScoringSystem reaudit)'
+
+    def __init__(
+        self,
+        timeout: int = 10,
+        max_bytes: int = 2 * 1024 * 1024,
+        min_text_similarity: float = 0.85,
+        min_structure_similarity: float = 0.8,
+        pool_size: int = 8
+    ):
+        """Initialize detector with a pooled HTTP session."""
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.min_text_similarity = min_text_similarity
+        self.min_structure_similarity = min_structure_similarity
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = self.USER_AGENT
+
+    def _fetch(self, url: str, state: Dict[str, Any]) -> Tuple[int, Dict[str, str], Optional[str]]:
+        """(status, validators, body); body is None for a 304."""
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('lastModified'):
+            headers['If-Modified-Since'] = state['lastModified']
+        with self.session.get(url, headers=headers, timeout=(self.timeout, self.timeout), stream=True) as response:
+            validators = {
+                'etag': response.headers.get('ETag') or state.get('etag'),
+                'lastModified': response.headers.get('Last-Modified') or state.get('lastModified')
+            }
+            if response.status_code == 304:
+                return 304, validators, None
+            response.raise_for_status()
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) >= self.max_bytes:
+                    break
+            # requests assumes ISO-8859-1 for text/html without a charset
+            has_charset = 'charset' in response.headers.get('Content-Type', '').lower()
+            # Unknown charsets (e.g. a misspelled one) fall back to utf-8
+            encoding = _decoder(response.encoding if has_charset else None)
+            return response.status_code, validators, bytes(body[:self.max_bytes]).decode(encoding, errors='replace')
+
+    def check(self, url: str, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Check url against its stored reaudit state.
+        Returns outcome (baseline, unchanged, changed or error), the new
+        state to store and, for a 200 compared with a fingerprint, the
+        text and structure similarities.
+        """
+        state = dict(state or {})
+        start_time = time.time()
+        result: Dict[str, Any] = {'outcome': 'unchanged', 'status': None}
+        try:
+            status, validators, body = self._fetch(url, state)
+        except (requests.exceptions.RequestException, UnicodeError, ValueError) as e:
+            result.update(
+                outcome='error', error=str(e), state=_error_state(state, e),
+                elapsedMs=int((time.time() - start_time) * 1000)
+            )
+            return result
+
+        state.update(validators)
+        state.pop('lastError', None)
+        state['errorCount'] = 0
+        result['status'] = status
+        if body is not None:
+            fingerprint = page_fingerprint(body)
+            if not state.get('domHash'):
+                result['outcome'] = 'baseline'
+            elif fingerprint['domHash'] != state['domHash']:
+                text_similarity = _similarity(fingerprint['textSignature'], state.get('textSignature'))
+                structure_similarity = _similarity(fingerprint['structureSignature'], state.get('structureSignature'))
+                result['textSimilarity'] = round(text_similarity, 3)
+                result['structureSimilarity'] = round(structure_similarity, 3)
+                if text_similarity < self.min_text_similarity or structure_similarity < self.min_structure_similarity:
+                    result['outcome'] = 'changed'
+            # Small edits keep the old fingerprint, so they add up against
+            # the page as last judged until they become material
+            if result['outcome'] != 'unchanged' or not state.get('textSignature'):
+                state.update(fingerprint)
+        result['state'] = state
+        result['elapsedMs'] = int((time.time() - start_time) * 1000)
+        return result
+
+
+class ReauditScheduler:
+    """
+    Periodically re-check scored entries and send materially changed ones
+    back to the queue as rejudges.
+
+    Each entry carries a `reaudit` map with its HTTP validators, DOM
+    fingerprint and nextCheckAt. Due entries are checked with bounded
+    concurrency; slots are spread over the interval by entry id.
+    """
+
+    def __init__(
+        self,
+        firebase,
+        detector: ChangeDetector,
+        interval_seconds: float = 86400,
+        spread_seconds: float = 86400,
+        concurrency: int = 8,
+        batch_size: int = 200
+    ):
+        """Initialize scheduler."""
+        self.firebase = firebase
+        self.detector = detector
+        self.interval_seconds = interval_seconds
+        self.spread_seconds = spread_seconds
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._stats_lock = threading.Lock()
+
+    def backfill(self) -> int:
+        """Schedule a first check for scored entries that have never had one. Returns the count."""
+        scheduled = 0
+        now = datetime.now(timezone.utc)
+        for entry in self.firebase.iter_entries(status='scored'):
+            if (entry.get('reaudit') or {}).get('nextCheckAt'):
+                continue
+            self.firebase.save_reaudit(entry['id'], {
+                'nextCheckAt': next_check_at(entry['id'], now, self.interval_seconds, self.spread_seconds)
+            })
+            scheduled += 1
+        if scheduled:
+            logger.info(f"Scheduled first re-audit for {scheduled} scored entries")
+        return scheduled
+
+    def _check_entry(self, entry: Dict[str, Any], stats: Dict[str, int]):
+        """Check one entry and store the outcome."""
+        submission_id = entry['id']
+        url = ((entry.get('result') or {}).get('metrics') or {}).get('finalUrl') or entry.get('url')
+        state = dict(entry.get('reaudit') or {})
+        try:
+            result = self.detector.check(url, state)
+        except Exception as e:
+            # Still reschedule, or the entry would fail on every pass
+            logger.error(f"Re-audit check of {submission_id} failed: {e}", exc_info=True)
+            result = {'outcome': 'error', 'error': str(e), 'state': _error_state(state, e)}
+        now = datetime.now(timezone.utc)
+        new_state = {
+            **{k: v for k, v in result['state'].items() if k not in ('textSimilarity', 'structureSimilarity')},
+            'checkedAt': now,
+            'outcome': result['outcome'],
+            'nextCheckAt': next_check_at(submission_id, now, self.interval_seconds, self.spread_seconds)
+        }
+        for key in ('textSimilarity', 'structureSimilarity'):
+            if key in result:
+                new_state[key] = result[key]
+
+        if result['outcome'] == 'changed':
+            reason = (
+                f"Content changed (text {result['textSimilarity']:.0%}, "
+                f"structure {result['structureSimilarity']:.0%} similar)"
+            )
+            if self.firebase.request_rejudge(submission_id, reason, new_state):
+                logger.info(f"Re-audit: {submission_id} changed, queued for rejudge: {reason}")
+                outcome = 'requeued'
+            else:
+                # Claimed or reset meanwhile; its next judgment covers the change
+                outcome = 'skipped'
+        else:
+            self.firebase.save_reaudit(submission_id, new_state)
+            outcome = result['outcome']
+        with self._stats_lock:
+            stats[outcome] = stats.get(outcome, 0) + 1
+
+    def run_pass(self) -> Dict[str, int]:
+        """Check every entry that is due now. Returns counts by outcome."""
+        stats: Dict[str, int] = {}
+        start_time = time.time()
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='reaudit') as executor:
+            while True:
+                batch = self.firebase.get_reaudit_due(datetime.now(timezone.utc), limit=self.batch_size)
+                # Entries whose update failed come back; leave them for the next pass
+                due = [entry for entry in batch if entry['id'] not in seen]
+                if not due:
+                    break
+                seen.update(entry['id'] for entry in due)
+                futures = [executor.submit(self._check_entry, entry, stats) for entry in due]
+                for future, entry in zip(futures, due):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Re-audit of {entry['id']} failed: {e}")
+                        with self._stats_lock:
+                            stats['failed'] = stats.get('failed', 0) + 1
+                if len(batch) < self.batch_size:
+                    break
+        if stats:
+            logger.info(
+                f"Re-audit pass: {sum(stats.values())} entries in {time.time() - start_time:.1f}s "
+                f"({', '.join(f'{k} {v}' for k, v in sorted(stats.items()))})"
+            )
+        return stats
+
+    def run_loop(self, poll_seconds: int):
+        """Backfill, then run a pass every poll_seconds until interrupted."""
+        self.backfill()
+        while True:
+            try:
+                self.run_pass()
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                logger.error(f"Error in re-audit loop: {e}", exc_info=True)
+            time.sleep(poll_seconds)
+
+
+def run():
+    """Start the re-audit loop."""
+    from config import Config
+    from judge_worker.firebase_client import FirebaseClient
+
+    Config.validate()
+    firebase = FirebaseClient(
+        Config.FIREBASE_PROJECT_ID,
+        Config.FIREBASE_CREDENTIALS_JSON,
+        Config.STORAGE_BUCKET
+    )
+    detector = ChangeDetector(
+        timeout=Config.REAUDIT_TIMEOUT_SECONDS,
+        max_bytes=Config.REAUDIT_MAX_BYTES,
+        min_text_similarity=Config.REAUDIT_MIN_TEXT_SIMILARITY,
+        min_structure_similarity=Config.REAUDIT_MIN_STRUCTURE_SIMILARITY,
+        pool_size=Config.REAUDIT_CONCURRENCY
+    )
+    scheduler = ReauditScheduler(
+        firebase,
+        detector,
+        interval_seconds=Config.REAUDIT_INTERVAL_HOURS * 3600,
+        spread_seconds=Config.REAUDIT_SPREAD_HOURS * 3600,
+        concurrency=Config.REAUDIT_CONCURRENCY,
+        batch_size=Config.REAUDIT_BATCH_SIZE
+    )
+    logger.info(
+        f"Starting re-audit loop (every {Config.REAUDIT_INTERVAL_HOURS}h per entry, "
+        f"{Config.REAUDIT_CONCURRENCY} concurrent checks)"
+    )
+    try:
+        scheduler.run_loop(Config.REAUDIT_POLL_SECONDS)
+    except KeyboardInterrupt:
+        logger.info("Re-audit stopped by user")
@@ -0,0 +1,165 @@
+"""Offline replay of the judging stages from evidence bundles."""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Optional
+
+import sys
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from judge_worker.evidence_bundle import EvidenceBundle, EvidenceBundleError
+from judge_worker.ollama_judge import OllamaJudge, parse_ensemble
+from judge_worker.ollama_pool import OllamaPool, NoHealthyBackendError
+from judge_worker.scoring import ScoringEngine
+
+logger = logging.getLogger(__name__)
+
+
+def find_bundles(paths: Iterable[str]) -> List[Path]:
+    """Expand files and directories into a sorted list of bundle paths."""
+    bundles = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            bundles.extend(sorted(path.glob('*_evidence.zip')))
+        else:
+            bundles.append(path)
+    return bundles
+
+
+def replay_bundle(
+    bundle: EvidenceBundle,
+    judge: OllamaJudge,
+    scoring: ScoringEngine
+) -> Dict[str, Any]:
+    """
+    Run the LLM judgment and score combination for one bundle.
+    Nothing here touches the submitted site; only the Ollama host is called.
+    """
+    evidence = bundle.evidence
+    lighthouse_metrics = bundle.lighthouse_metrics
+    axe_summary = bundle.axe_summary
+
+    start_time = time.time()
+    objective_scores = scoring.calculate_objective_scores(lighthouse_metrics, axe_summary)
+    ollama_result = judge.judge(
+        url=bundle.url,
+        category=bundle.category,
+        extracted_structure=evidence['extracted'],
+        lighthouse_metrics=lighthouse_metrics,
+        axe_summary=axe_summary,
+        console_error_count=evidence.get('console_error_count', 0),
+        failed_request_count=evidence.get('failed_request_count', 0),
+        visual_features=evidence.get('visual_features') or _bundle_visual_features(bundle)
+    )
+
+    record = {
+        'submissionId': bundle.submission_id,
+        'url': bundle.url,
+        'category': bundle.category,
+        'model': judge.model,
+        'bundleJudgeVersion': bundle.manifest.get('judgeVersion', ''),
+        'elapsedSeconds': round(time.time() - start_time, 2)
+    }
+
+    if not ollama_result:
+        record['error'] = 'Ollama judgment failed'
+        return record
+
+    record['scores'] = scoring.calculate_total_score(objective_scores, ollama_result['scores'])
+    record['notes'] = ollama_result['notes']
+    record['flags'] = ollama_result.get('flags', {})
+    if 'ensemble' in ollama_result:
+        record['ensemble'] = ollama_result['ensemble']
+    if 'prompt' in ollama_result:
+        record['prompt'] = ollama_result['prompt']
+    return record
+
+
+def _bundle_visual_features(bundle: EvidenceBundle) -> Optional[Dict[str, Any]]:
+    """Analyze bundled screenshots for bundles written without visual.json."""
+    from judge_worker.viewports import VIEWPORTS
+    from judge_worker.visual_features import analyze_screenshots
+
+    screenshots = {name: bundle.read_screenshot(name) for name in ('desktop', 'mobile')}
+    screenshots = {name: payload for name, payload in screenshots.items() if payload}
+    if not screenshots:
+        return None
+    return analyze_screenshots(screenshots, VIEWPORTS)
+
+
+def main():
+    """Entry point for `python -m judge_worker.replay`."""
+    parser = argparse.ArgumentParser(description='Re-judge evidence bundles without recapturing sites.')
+    parser.add_argument('bundles', nargs='+', help='Bundle files or directories containing *_evidence.zip')
+    parser.add_argument('--hosts', default=','.join(Config.OLLAMA_HOSTS), help='Comma-separated Ollama hosts')
+    parser.add_argument('--model', default=Config.OLLAMA_MODEL, help='Ollama model to judge with')
+    parser.add_argument('--ensemble', default=Config.OLLAMA_ENSEMBLE, help='Ensemble spec, e.g. "llama3.1:8b@1,llama3.1:8b@2"')
+    parser.add_argument('--prompt-budget', type=int, default=Config.PROMPT_TOKEN_BUDGET, help='Prompt token budget')
+    parser.add_argument('--output', help='Write JSON lines here instead of stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    hosts = [h.strip() for h in args.hosts.split(',') if h.strip()]
+    ensemble = parse_ensemble(args.ensemble)
+    pool = OllamaPool(
+        hosts,
+        model=args.model,
+        models=[member['model'] for member in ensemble],
+        failure_threshold=Config.OLLAMA_CIRCUIT_FAILURES,
+        reset_seconds=Config.OLLAMA_CIRCUIT_RESET_SECONDS,
+        health_timeout=Config.OLLAMA_HEALTH_TIMEOUT_SECONDS
+    )
+    judge = OllamaJudge(
+        hosts[0],
+        args.model,
+        pool=pool,
+        ensemble=ensemble,
+        aggregation=Config.OLLAMA_ENSEMBLE_AGGREGATION,
+        quorum=Config.OLLAMA_ENSEMBLE_QUORUM,
+        agreement_tolerance=Config.OLLAMA_ENSEMBLE_TOLERANCE,
+        prompt_budget_tokens=args.prompt_budget
+    )
+    scoring = ScoringEngine()
+    bundles = find_bundles(args.bundles)
+    logger.info(f"Replaying {len(bundles)} bundle(s) with {args.model}")
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    failures = 0
+    try:
+        for path in bundles:
+            try:
+                bundle = EvidenceBundle.load(path)
+            except EvidenceBundleError as e:
+                logger.error(str(e))
+                failures += 1
+                continue
+
+            try:
+                record = replay_bundle(bundle, judge, scoring)
+            except NoHealthyBackendError as e:
+                logger.error(f"Stopping replay, no Ollama backend available: {e}")
+                failures += 1
+                break
+            if 'error' in record:
+                failures += 1
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    logger.info(f"Replay finished: {len(bundles) - failures} ok, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Priority classes, weighted fair ordering and wait-time stats for the queue."""
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CLASSES = ('new', 'resubmission', 'rejudge')
+STAGES = ('preflight', 'audits', 'judge', 'upload')
+
+# Used until a stage has been timed at least once
+DEFAULT_STAGE_SECONDS = {
+    'preflight': 1.0,
+    'audits': 60.0,
+    'judge': 30.0,
+    'upload': 5.0
+}
+
+
+def parse_class_weights(spec: str) -> Dict[str, float]:
+    """
+    Parse "new:3,resubmission:2,rejudge:2" into a weight per class.
+    Classes left out get weight 1.
+    """
+    weights = {name: 1.0 for name in PRIORITY_CLASSES}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, value = item.partition(':')
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown priority class '{name}' (expected one of {', '.join(PRIORITY_CLASSES)})")
+        weight = float(value)
+        if weight <= 0:
+            raise ValueError(f"Weight for '{name}' must be positive")
+        weights[name] = weight
+    return weights
+
+
+def classify(submission: Dict[str, Any]) -> str:
+    """Priority class of a pending entry."""
+    if submission.get('rejudgeRequestedAt'):
+        return 'rejudge'
+    if submission.get('resubmittedAt'):
+        return 'resubmission'
+    if submission.get('result'):
+        # Scored (or failed) before and put back to pending
+        return 'rejudge'
+    return 'new'
+
+
+def _as_utc(value: Any) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def enqueued_at(submission: Dict[str, Any]) -> Optional[datetime]:
+    """When the entry last entered the queue."""
+    stamps = [
+        _as_utc(submission.get(field))
+        for field in ('createdAt', 'resubmittedAt', 'rejudgeRequestedAt', 'requeuedAt')
+    ]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else None
+
+
+def wait_seconds(submission: Dict[str, Any], now: Optional[datetime] = None) -> float:
+    """Seconds the entry has been waiting, 0 if unknown."""
+    since = enqueued_at(submission)
+    if since is None:
+        return 0.0
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (now - since).total_seconds())
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class StageTimer:
+    """Wall-clock milliseconds per pipeline stage of one job."""
+
+    def __init__(self):
+        """Initialize with no stages timed."""
+        self.ms: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block (also around awaits) as stage name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = self.ms.get(name, 0) + int((time.perf_counter() - start) * 1000)
+
+
+class CostModel:
+    """
+    Expected job duration from past stage timings.
+
+    Keeps an EWMA of every stage per category and overall. An entry that
+    was scored before carries its own stageMs in result.metrics, which is
+    the best guess for the site-dependent stages.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        """Initialize an empty model."""
+        self.alpha = alpha
+        self._by_category: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._overall: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _update(self, table: Dict[str, float], stage: str, seconds: float):
+        previous = table.get(stage)
+        table[stage] = seconds if previous is None else (1 - self.alpha) * previous + self.alpha * seconds
+
+    def record(self, category: str, stage_ms: Dict[str, int]):
+        """Fold one finished job's stage timings into the model."""
+        with self._lock:
+            for stage, ms in stage_ms.items():
+                self._update(self._by_category[category], stage, ms / 1000)
+                self._update(self._overall, stage, ms / 1000)
+
+    def estimate(self, submission: Dict[str, Any], audits_cached: bool = False) -> float:
+        """Expected seconds to process submission."""
+        previous = ((submission.get('result') or {}).get('metrics') or {}).get('stageMs') or {}
+        category = submission.get('category', 'Unknown')
+        total = 0.0
+        with self._lock:
+            for stage in STAGES:
+                if stage == 'audits' and audits_cached:
+                    continue
+                if stage in previous and stage in ('preflight', 'audits', 'upload'):
+                    total += previous[stage] / 1000
+                elif stage in self._by_category.get(category, {}):
+                    total += self._by_category[category][stage]
+                else:
+                    total += self._overall.get(stage, DEFAULT_STAGE_SECONDS[stage])
+        return total
+
+
+class QueueScheduler:
+    """
+    Orders pending entries by priority class and fair share.
+
+    Service already given is tracked at three levels - priority class,
+    category and submitter - as estimated job seconds that decay with
+    `half_life_seconds`. The next entry comes from the class furthest
+    below its weighted share, then the least-served category, then the
+    least-served submitter; the cheapest expected job breaks the remaining
+    ties, so a bulk import is interleaved with everyone else's entries and
+    quick sites don't wait behind slow ones. Entries waiting longer than
+    `max_wait_seconds` go first regardless, so no class starves.
+    """
+
+    def __init__(
+        self,
+        class_weights: Optional[Dict[str, float]] = None,
+        max_wait_seconds: int = 1800,
+        half_life_seconds: int = 3600,
+        audits_cached: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        history_size: int = 1000
+    ):
+        """Initialize scheduler with no service history."""
+        self.class_weights = class_weights or {name: 1.0 for name in PRIORITY_CLASSES}
+        self.max_wait_seconds = max_wait_seconds
+        self.half_life_seconds = half_life_seconds
+        self.audits_cached = audits_cached or (lambda submission: False)
+        self.costs = CostModel()
+        self._usage = {level: defaultdict(float) for level in ('class', 'category', 'submitter')}
+        self._decayed_at = time.time()
+        self._waits = {name: deque(maxlen=history_size) for name in PRIORITY_CLASSES}
+        self._charged: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _flows(submission: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            'class': classify(submission),
+            'category': submission.get('category', 'Unknown'),
+            'submitter': submission.get('submitterId', 'unknown')
+        }
+
+    def _decay(self):
+        """Age service history. Caller holds self._lock."""
+        now = time.time()
+        factor = 0.5 ** ((now - self._decayed_at) / self.half_life_seconds)
+        self._decayed_at = now
+        for usage in self._usage.values():
+            for key in list(usage):
+                usage[key] *= factor
+                if usage[key] < 0.01:
+                    del usage[key]
+
+    def estimate(self, submission: Dict[str, Any]) -> float:
+        """Expected seconds for submission given current caches."""
+        return self.costs.estimate(submission, audits_cached=self.audits_cached(submission))
+
+    def order(self, submissions: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Pick up to limit submissions in the order they should be claimed."""
+        now = datetime.now(timezone.utc)
+        candidates = [
+            (submission, self._flows(submission), self.estimate(submission), wait_seconds(submission, now))
+            for submission in submissions
+        ]
+        with self._lock:
+            self._decay()
+            # Charge picks within this batch too, so one batch is already fair
+            usage = {level: defaultdict(float, values) for level, values in self._usage.items()}
+
+        picked = []
+        while candidates and len(picked) < limit:
+            overdue = [c for c in candidates if c[3] > self.max_wait_seconds]
+            if overdue:
+                choice = max(overdue, key=lambda c: c[3])
+            else:
+                choice = min(candidates, key=lambda c: (
+                    usage['class'][c[1]['class']] / self.class_weights.get(c[1]['class'], 1.0),
+                    usage['category'][c[1]['category']],
+                    usage['submitter'][c[1]['submitter']],
+                    c[2],
+                    -c[3]
+                ))
+            candidates.remove(choice)
+            picked.append(choice[0])
+            for level, key in choice[1].items():
+                usage[level][key] += choice[2]
+        return picked
+
+    def started(self, submission: Dict[str, Any]) -> str:
+        """Charge a claimed submission to its flows and record its queue wait."""
+        flows = self._flows(submission)
+        cost = self.estimate(submission)
+        with self._lock:
+            self._charged[submission['id']] = cost
+            for level, key in flows.items():
+                self._usage[level][key] += cost
+            self._waits[flows['class']].append(wait_seconds(submission))
+        return flows['class']
+
+    def finished(self, submission: Dict[str, Any], stage_ms: Dict[str, int], completed: bool = True):
+        """
+        Replace a job's estimated charge with the time it really took, on
+        every exit path so failed and requeued jobs don't keep their charge.
+        Only completed jobs teach the cost model.
+        """
+        if completed:
+            self.costs.record(submission.get('category', 'Unknown'), stage_ms)
+        with self._lock:
+            correction = sum(stage_ms.values()) / 1000 - self._charged.pop(submission['id'], 0.0)
+            for level, key in self._flows(submission).items():
+                self._usage[level][key] = max(0.0, self._usage[level][key] + correction)
+
+    def wait_report(self) -> Dict[str, Dict[str, float]]:
+        """Queue wait percentiles (seconds) per priority class."""
+        with self._lock:
+            samples = {name: sorted(waits) for name, waits in self._waits.items()}
+        return {
+            name: {
+                'count': len(values),
+                'p50': round(percentile(values, 0.50), 1),
+                'p90': round(percentile(values, 0.90), 1),
+                'p99': round(percentile(values, 0.99), 1)
+            }
+            for name, values in samples.items()
+        }
+
+    def log_wait_report(self) -> Dict[str, Dict[str, float]]:
+        """Log and return the wait report."""
+        report = self.wait_report()
+        summary = ', '.join(
+            f"{name} n={stats['count']} p50={stats['p50']}s p90={stats['p90']}s p99={stats['p99']}s"
+            for name, stats in report.items() if stats['count']
+        )
+        logger.info(f"Queue wait by class: {summary or 'no jobs yet'}")
+        return report
@@ -1,6 +1,9 @@
 """Scoring logic for objective and subjective metrics."""
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from audits.lighthouse_runner import KEY_AUDITS
+from judge_worker.page_structure import alt_text_coverage
 
 logger = logging.getLogger(__name__)
 
@@ -71,10 +74,13 @@ class ScoringEngine:
         lighthouse_metrics: Dict[str, int],
         axe_summary: Dict[str, Any],
         console_error_count: int,
-        failed_request_count: int
+        failed_request_count: int,
+        judge_ensemble: Optional[Dict[str, Any]] = None,
+        page_structure: Optional[Dict[str, Any]] = None,
+        visual_features: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Prepare metrics dict for Firestore."""
-        return {
+        metrics = {
             'lighthousePerformance': lighthouse_metrics.get('lighthousePerformance', 0),
             'lighthouseSEO': lighthouse_metrics.get('lighthouseSEO', 0),
             'lighthouseBestPractices': lighthouse_metrics.get('lighthouseBestPractices', 0),
@@ -83,4 +89,35 @@ class ScoringEngine:
             'consoleErrorCount': console_error_count,
             'failedRequestsCount': failed_request_count
         }
+        
+        # Key audits, present when the report was parsed
+        for key in KEY_AUDITS.values():
+            if lighthouse_metrics.get(key) is not None:
+                metrics[key] = lighthouse_metrics[key]
+        if lighthouse_metrics.get('lighthouseRuns'):
+            metrics['lighthouseRuns'] = lighthouse_metrics['lighthouseRuns']
+            metrics['lighthouseRunStdev'] = lighthouse_metrics['lighthouseRunStdev']
+        
+        if page_structure and page_structure.get('dom'):
+            metrics['imageAltCoverage'] = alt_text_coverage(page_structure)
+            metrics['domElementCount'] = page_structure['dom'].get('elements', 0)
+            metrics['domDepth'] = page_structure['dom'].get('maxDepth', 0)
+            metrics['landmarkCount'] = sum((page_structure.get('landmarks') or {}).values())
+        
+        desktop = (visual_features or {}).get('desktop')
+        if desktop:
+            metrics['visualWhitespaceRatio'] = desktop['whitespaceRatio']
+            metrics['visualEdgeDensity'] = desktop['edgeDensity']
+            metrics['visualLowContrastEdges'] = desktop['lowContrastEdges']
+            metrics['screenshotHash'] = desktop['phash']
+        mobile = (visual_features or {}).get('mobile')
+        if mobile:
+            metrics['mobileOverflowPx'] = mobile['overflowPx']
+        
+        if judge_ensemble:
+            metrics['judgeConfidence'] = judge_ensemble.get('confidence', 1.0)
+            metrics['judgeDisagreement'] = judge_ensemble.get('disagreement', {})
+            metrics['judgeEnsembleSize'] = judge_ensemble.get('responded', 0)
+        
+        return metrics
 
@@ -0,0 +1,270 @@
+"""Near-duplicate and template detection across judged entries."""
+import hashlib
+import json
+import logging
+import re
+import threading
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+LSH_BANDS = 16             # 16 bands x 4 rows: ~50% match probability at Jaccard 0.5
+SHINGLE_WORDS = 3
+_PRIME = np.uint64(4294967291)  # largest prime below 2^32
+_rng = np.random.RandomState(1729)  # fixed so signatures stay comparable across runs
+_PERM_A = _rng.randint(1, int(_PRIME), size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, int(_PRIME), size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two 64-bit hashes."""
+    return bin(a ^ b).count('1')
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of the word shingles of text, or None if too short."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return None
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'big') for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    ) % _PRIME
+    # (a * h + b) mod p with a, b, h < p < 2^32 stays inside uint64; a spans
+    # the whole field so each permutation orders the shingles independently
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+
+def signature_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(a == b))
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit perceptual hashes.
+
+    Each hash is split into four 16-bit chunks with one table per chunk.
+    Two hashes within distance d agree to within d // 4 bits on at least
+    one chunk, so a lookup only probes the chunk values near the query's
+    and verifies the few entries found there.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self, max_distance: int = 8):
+        """Initialize empty tables for lookups up to max_distance."""
+        self.max_distance = max_distance
+        self._tables: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self.CHUNKS)]
+        radius = max_distance // self.CHUNKS
+        self._masks = [0]
+        for bits in range(1, radius + 1):
+            self._masks += [sum(1 << b for b in combo) for combo in combinations(range(self.CHUNK_BITS), bits)]
+
+    def _chunks(self, value: int):
+        mask = (1 << self.CHUNK_BITS) - 1
+        for i in range(self.CHUNKS):
+            yield i, (value >> (i * self.CHUNK_BITS)) & mask
+
+    def add(self, value: int, key: str):
+        """Insert value under key."""
+        for i, chunk in self._chunks(value):
+            self._tables[i].setdefault(chunk, []).append((value, key))
+
+    def remove(self, value: int, key: str):
+        """Remove value stored under key."""
+        for i, chunk in self._chunks(value):
+            entries = self._tables[i].get(chunk)
+            if not entries:
+                continue
+            entries[:] = [entry for entry in entries if entry != (value, key)]
+            if not entries:
+                del self._tables[i][chunk]
+
+    def search(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, str]]:
+        """All (distance, key) within max_distance of value, nearest first."""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        found: Dict[str, int] = {}
+        for i, chunk in self._chunks(value):
+            table = self._tables[i]
+            for flip in self._masks:
+                for candidate, key in table.get(chunk ^ flip, ()):
+                    if key not in found:
+                        found[key] = hamming(value, candidate)
+        return sorted((distance, key) for key, distance in found.items() if distance <= max_distance)
+
+
+def text_of(structure: Dict[str, Any]) -> str:
+    """Text used for MinHash: title, headings and visible text."""
+    headings = structure.get('headings') or {}
+    parts = [structure.get('title', '')]
+    for level in ('h1', 'h2', 'h3'):
+        parts.extend(headings.get(level) or [])
+    parts.append(structure.get('visibleText', ''))
+    return ' '.join(parts)
+
+
+class SimilarityIndex:
+    """
+    Persistent index of screenshot pHashes and text MinHash signatures.
+
+    Records are appended to a JSON-lines file and loaded into a
+    multi-index Hamming table (pHash) and MinHash LSH buckets at startup,
+    so each lookup only compares against a handful of candidates. A
+    rejudged entry's new record replaces its old one; the file is
+    rewritten once superseded lines outnumber live ones.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_phash_distance: int = 8, min_text_similarity: float = 0.7):
+        """Initialize index, loading existing records from path."""
+        self.path = Path(path) if path else None
+        self.max_phash_distance = max_phash_distance
+        self.min_text_similarity = min_text_similarity
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._phashes = HammingIndex(max_phash_distance)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        self._superseded = 0
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _load(self):
+        loaded = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self._insert(json.loads(line))
+                    loaded += 1
+                except (json.JSONDecodeError, KeyError, ValueError) as e:
+                    logger.warning(f"Skipping bad similarity index record: {e}")
+        logger.info(f"Similarity index loaded: {loaded} entries from {self.path}")
+
+    def _bands(self, signature: np.ndarray):
+        rows = NUM_PERM // LSH_BANDS
+        for band in range(LSH_BANDS):
+            yield band, signature[band * rows:(band + 1) * rows].tobytes()
+
+    def _remove(self, key: str):
+        """Drop a record from the in-memory structures. Caller holds the lock or is loading."""
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        self._superseded += 1
+        if record.get('phash'):
+            self._phashes.remove(int(record['phash'], 16), key)
+        signature = self._signatures.pop(key, None)
+        if signature is not None:
+            for bucket in self._bands(signature):
+                keys = self._buckets.get(bucket)
+                if keys and key in keys:
+                    keys.remove(key)
+                    if not keys:
+                        del self._buckets[bucket]
+
+    def _insert(self, record: Dict[str, Any]):
+        """
+        Add a record to the in-memory structures, replacing an earlier one
+        for the same submission. Caller holds the lock or is loading.
+        """
+        key = record['submissionId']
+        self._remove(key)
+        self.records[key] = record
+        if record.get('phash'):
+            self._phashes.add(int(record['phash'], 16), key)
+        if record.get('minhash'):
+            signature = np.array(record['minhash'], dtype=np.uint64)
+            self._signatures[key] = signature
+            for bucket in self._bands(signature):
+                self._buckets.setdefault(bucket, []).append(key)
+
+    def fingerprint(self, evidence: Dict[str, Any]) -> Dict[str, Any]:
+        """pHash and MinHash signature for a captured site."""
+        visual = (evidence.get('visual_features') or {}).get('desktop') or {}
+        signature = minhash_signature(text_of(evidence.get('extracted') or {}))
+        return {
+            'phash': visual.get('phash'),
+            'minhash': signature.tolist() if signature is not None else None
+        }
+
+    def query(self, fingerprint: Dict[str, Any], limit: int = 3, exclude: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        """Nearest prior entries by screenshot and text, best first."""
+        matches: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            if fingerprint.get('phash'):
+                for distance, key in self._phashes.search(int(fingerprint['phash'], 16), self.max_phash_distance):
+                    matches.setdefault(key, {})['phashDistance'] = distance
+            if fingerprint.get('minhash'):
+                signature = np.array(fingerprint['minhash'], dtype=np.uint64)
+                candidates = set()
+                for bucket in self._bands(signature):
+                    candidates.update(self._buckets.get(bucket, ()))
+                for key in candidates:
+                    similarity = signature_similarity(signature, self._signatures[key])
+                    if similarity >= self.min_text_similarity:
+                        matches.setdefault(key, {})['textSimilarity'] = round(similarity, 3)
+                # Visual matches also get a text score when both have one
+                for key, match in matches.items():
+                    if 'textSimilarity' not in match and key in self._signatures:
+                        match['textSimilarity'] = round(signature_similarity(signature, self._signatures[key]), 3)
+            records = {key: self.records[key] for key in matches if key not in exclude}
+
+        results = []
+        for key, record in records.items():
+            match = matches[key]
+            visual = 1 - match['phashDistance'] / 64 if 'phashDistance' in match else 0.0
+            similarity = max(visual, match.get('textSimilarity', 0.0))
+            results.append({
+                'submissionId': key,
+                'url': record.get('url', ''),
+                'similarity': round(similarity, 3),
+                **match
+            })
+        results.sort(key=lambda m: m['similarity'], reverse=True)
+        return results[:limit]
+
+    @staticmethod
+    def is_exact(match: Dict[str, Any]) -> bool:
+        """True for an identical screenshot and (near) identical text."""
+        return match.get('phashDistance') == 0 and match.get('textSimilarity', 0.0) >= 0.98
+
+    def add(self, submission_id: str, url: str, fingerprint: Dict[str, Any], extra: Optional[Dict[str, Any]] = None):
+        """Add a judged entry, replacing its earlier record, and append it to the index file."""
+        record = {'submissionId': submission_id, 'url': url, **fingerprint, **(extra or {})}
+        with self._lock:
+            self._insert(record)
+            if not self.path:
+                return
+            if self._superseded > len(self.records):
+                self._compact()
+            else:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def _compact(self):
+        """Rewrite the index file with live records only. Caller holds the lock."""
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        tmp_path.replace(self.path)
+        self._superseded = 0
+
+    def get(self, submission_id: str) -> Optional[Dict[str, Any]]:
+        """Stored record for a submission."""
+        with self._lock:
+            return self.records.get(submission_id)
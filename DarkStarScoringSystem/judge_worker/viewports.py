@@ -0,0 +1,17 @@
+"""Browser contexts used for capture, shared with code that runs without Playwright."""
+
+DESKTOP_CONTEXT = {
+    'viewport': {'width': 1440, 'height': 900},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+MOBILE_CONTEXT = {
+    'viewport': {'width': 390, 'height': 844},  # iPhone 12 size
+    'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15'
+}
+
+# Viewport of each screenshot, by screenshot name
+VIEWPORTS = {
+    'desktop': DESKTOP_CONTEXT['viewport'],
+    'mobile': MOBILE_CONTEXT['viewport']
+}
@@ -0,0 +1,166 @@
+"""Cheap numeric visual features from screenshots (Pillow + NumPy)."""
+import io
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, Union
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Screenshots are downscaled to this width before analysis
+ANALYSIS_WIDTH = 320
+# Full-page screenshots are cut to this many viewport heights
+MAX_VIEWPORTS = 6
+# Fraction of an 8x8 block's luminance spread below which it counts as empty
+FLAT_BLOCK_STD = 0.02
+# Luminance step that counts as an edge
+EDGE_THRESHOLD = 0.08
+PALETTE_SIZE = 5
+
+ImageSource = Union[str, Path, bytes]
+
+
+def _load(source: ImageSource) -> Image.Image:
+    if isinstance(source, bytes):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+# sRGB channel value (0-255) -> linear light, for WCAG relative luminance
+_SRGB = np.arange(256) / 255.0
+_LINEAR = np.where(_SRGB <= 0.03928, _SRGB / 12.92, ((_SRGB + 0.055) / 1.055) ** 2.4).astype(np.float32)
+_LUMA = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+
+def _relative_luminance(rgb8: np.ndarray) -> np.ndarray:
+    """WCAG relative luminance (0..1) of an (..., 3) uint8 array."""
+    return _LINEAR[rgb8] @ _LUMA
+
+
+def _palette(rgb8: np.ndarray) -> list:
+    """Dominant colors by 4-bit-per-channel binning, with mean color per bin."""
+    pixels = rgb8.reshape(-1, 3).astype(np.int32)
+    bins = ((pixels[:, 0] >> 4) << 8) | ((pixels[:, 1] >> 4) << 4) | (pixels[:, 2] >> 4)
+    counts = np.bincount(bins, minlength=4096)
+    sums = [np.bincount(bins, weights=pixels[:, channel], minlength=4096) for channel in range(3)]
+    top = np.argsort(counts)[::-1][:PALETTE_SIZE]
+    palette = []
+    for b in top:
+        if counts[b] == 0:
+            break
+        mean = [int(round(s[b] / counts[b])) for s in sums]
+        palette.append({
+            'color': '#{:02x}{:02x}{:02x}'.format(*mean),
+            'share': round(float(counts[b]) / len(pixels), 3)
+        })
+    return palette
+
+
+def _phash(gray: np.ndarray) -> str:
+    """64-bit DCT perceptual hash of a grayscale image, as hex."""
+    size = 32
+    small = np.asarray(
+        Image.fromarray((gray * 255).astype(np.uint8)).resize((size, size), Image.BILINEAR),
+        dtype=np.float64
+    )
+    n = np.arange(size)
+    dct = np.cos(np.pi / size * (n[None, :] + 0.5) * n[:, None])
+    coeffs = (dct @ small @ dct.T)[:8, :8].flatten()
+    bits = coeffs[1:] > np.median(coeffs[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+def analyze_image(
+    source: ImageSource,
+    viewport_width: int,
+    viewport_height: int,
+    device_scale_factor: float = 1.0
+) -> Dict[str, Any]:
+    """
+    Compute palette, contrast, whitespace, edge density, horizontal overflow
+    and a perceptual hash for one screenshot.
+    """
+    with _load(source) as image:
+        width, height = image.size
+        # Analyse at most MAX_VIEWPORTS screens of the page
+        crop_height = min(height, int(viewport_height * device_scale_factor * MAX_VIEWPORTS))
+        image = image.crop((0, 0, width, crop_height)).convert('RGB')
+        target = (ANALYSIS_WIDTH, max(1, round(crop_height * ANALYSIS_WIDTH / width)))
+        rgb8 = np.asarray(image.resize(target, Image.BILINEAR, reducing_gap=2.0))
+        fold_rows = max(1, round(viewport_height * device_scale_factor * ANALYSIS_WIDTH / width))
+
+    lum = _relative_luminance(rgb8)
+
+    # Edges: luminance steps between horizontal and vertical neighbours
+    dx = np.abs(np.diff(lum, axis=1))
+    dy = np.abs(np.diff(lum, axis=0))
+    edge_density = float(((dx[:-1, :] > EDGE_THRESHOLD) | (dy[:, :-1] > EDGE_THRESHOLD)).mean()) if lum.shape[0] > 1 else 0.0
+
+    # Contrast: WCAG ratio across horizontal edges
+    left, right = lum[:, :-1], lum[:, 1:]
+    ratio = (np.maximum(left, right) + 0.05) / (np.minimum(left, right) + 0.05)
+    edge_ratios = ratio[dx > EDGE_THRESHOLD]
+    if edge_ratios.size:
+        low = float((edge_ratios < 3.0).mean())
+        high = float((edge_ratios >= 4.5).mean())
+    else:
+        low, high = 0.0, 0.0
+
+    # Whitespace: share of 8x8 blocks with (almost) no luminance variation
+    rows, cols = (lum.shape[0] // 8) * 8, (lum.shape[1] // 8) * 8
+    if rows and cols:
+        blocks = lum[:rows, :cols].reshape(rows // 8, 8, cols // 8, 8)
+        whitespace = float((blocks.std(axis=(1, 3)) < FLAT_BLOCK_STD).mean())
+    else:
+        whitespace = 0.0
+
+    # Overflow: page wider than the viewport, or content pressed against the right edge
+    overflow_px = max(0, round(width / device_scale_factor) - viewport_width)
+    edge_touch = float((dx[:, -4:] > EDGE_THRESHOLD).any(axis=1).mean()) if dx.shape[1] >= 4 else 0.0
+
+    return {
+        'width': width,
+        'height': height,
+        'palette': _palette(rgb8[::2, ::2]),
+        'meanLuminance': round(float(lum.mean()), 3),
+        'rmsContrast': round(float(lum.std()), 3),
+        'lowContrastEdges': round(low, 3),
+        'highContrastEdges': round(high, 3),
+        'whitespaceRatio': round(whitespace, 3),
+        'edgeDensity': round(edge_density, 3),
+        'overflowPx': overflow_px,
+        'rightEdgeTouch': round(edge_touch, 3),
+        'phash': _phash(lum[:fold_rows])
+    }
+
+
+def analyze_screenshots(
+    screenshots: Dict[str, ImageSource],
+    viewports: Dict[str, Dict[str, int]]
+) -> Dict[str, Any]:
+    """
+    Analyze each named screenshot (desktop, mobile) with its viewport.
+    Failures are logged and leave that screenshot out.
+    """
+    features: Dict[str, Any] = {}
+    start = time.perf_counter()
+    for name, source in screenshots.items():
+        viewport = viewports.get(name)
+        if not source or not viewport:
+            continue
+        try:
+            features[name] = analyze_image(
+                source, viewport['width'], viewport['height'],
+                device_scale_factor=viewport.get('deviceScaleFactor', 1.0)
+            )
+        except Exception as e:
+            logger.warning(f"Visual analysis failed for {name} screenshot: {e}")
+    features['analysisMs'] = round((time.perf_counter() - start) * 1000)
+    return features
+
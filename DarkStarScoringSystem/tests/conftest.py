@@ -0,0 +1,5 @@
+"""Make the worker packages importable when running pytest from any directory."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
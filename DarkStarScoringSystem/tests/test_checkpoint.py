@@ -0,0 +1,95 @@
+"""Tests for retry policies and stage checkpoints."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from judge_worker.checkpoint import (
+    DEFAULT_RETRY, STAGES, CheckpointStore, JobCheckpoint, parse_retry_policy, retry_delay, retry_due
+)
+
+
+def test_parse_retry_policy():
+    policy = parse_retry_policy(' capture:5:10 , judge:2:0,')
+    assert policy['capture'] == (5, 10)
+    assert policy['judge'] == (2, 0)
+    assert policy['upload'] == DEFAULT_RETRY
+    assert set(policy) == set(STAGES)
+    assert parse_retry_policy('') == {stage: DEFAULT_RETRY for stage in STAGES}
+
+
+@pytest.mark.parametrize('spec', ['render:3:60', 'capture:3', 'capture:0:60', 'capture:3:-1', 'capture:x:1'])
+def test_parse_retry_policy_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_retry_policy(spec)
+
+
+def test_default_retry_policy_parses():
+    spec = 'preflight:3:60,capture:3:60,lighthouse:3:60,axe:2:30,judge:4:30,upload:5:15,write:5:15'
+    assert parse_retry_policy(spec)['write'] == (5, 15)
+
+
+def test_retry_delay_doubles_up_to_the_cap():
+    assert [retry_delay(30, attempt, 100) for attempt in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+def test_retry_due():
+    now = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+    assert retry_due({}, now)
+    assert retry_due({'retryAfter': now - timedelta(seconds=1)}, now)
+    assert not retry_due({'retryAfter': now + timedelta(seconds=1)}, now)
+    # Naive timestamps are UTC
+    assert not retry_due({'retryAfter': datetime(2024, 5, 1, 12, 0, 1)}, now)
+    assert retry_due({'retryAfter': 'soon'}, now)
+
+
+def test_failure_is_charged_to_the_stage_it_came_from():
+    checkpoint = JobCheckpoint({'id': 's1'}, 'v1')
+    with pytest.raises(RuntimeError):
+        with checkpoint.running('judge'):
+            raise RuntimeError('boom')
+    assert checkpoint.current is None
+    with checkpoint.running('write'):
+        pass
+    stage, attempts, retry_at = checkpoint.failed(parse_retry_policy('judge:2:30'), 3600)
+    assert (stage, attempts) == ('judge', 1)
+    assert retry_at > datetime.now(timezone.utc)
+    stage, attempts, retry_at = checkpoint.failed(parse_retry_policy('judge:2:30'), 3600)
+    assert (stage, attempts, retry_at) == ('judge', 2, None)
+
+
+def test_nested_stage_restores_the_outer_one():
+    checkpoint = JobCheckpoint({'id': 's1'}, 'v1')
+    with checkpoint.running('capture'):
+        with checkpoint.running('lighthouse'):
+            assert checkpoint.current == 'lighthouse'
+        assert checkpoint.current == 'capture'
+
+
+def test_remote_checkpoint_of_the_same_version_is_resumed():
+    submission = {'id': 's1', 'checkpoint': {
+        'judgeVersion': 'v1',
+        'attempts': {'judge': 1},
+        'stages': {'lighthouse': {'data': {'lighthousePerformance': 80}}, 'capture': {'data': {'x': 1}}}
+    }}
+    checkpoint = JobCheckpoint(submission, 'v1')
+    assert checkpoint.resumed == ('lighthouse',)
+    assert checkpoint.attempts == {'judge': 1}
+    assert not checkpoint.reset_remote
+
+    stale = JobCheckpoint(submission, 'v2')
+    assert stale.resumed == ()
+    assert stale.attempts == {}
+    assert stale.reset_remote
+
+
+def test_store_round_trip(tmp_path):
+    store = CheckpointStore(tmp_path)
+    store.save('s1', 'dsss/v1', 'capture', {'screenshotPath': 'a.png'})
+    (tmp_path / 's1' / 'dsss_v1' / 'judge.json').write_text('{not json')
+    assert store.load('s1', 'dsss/v1') == {'capture': {'screenshotPath': 'a.png'}}
+    assert store.load('s1', 'dsss/v2') == {}
+    checkpoint = JobCheckpoint({'id': 's1'}, 'dsss/v1', store=store)
+    checkpoint.save('axe', {'violations': 0})
+    assert checkpoint.resumed == ('capture', 'axe')
+    checkpoint.clear()
+    assert store.load('s1', 'dsss/v1') == {}
@@ -0,0 +1,75 @@
+"""Tests for rendezvous sharding and claim selection."""
+from datetime import datetime, timedelta, timezone
+
+from judge_worker.cluster import ClusterMembership, pending_since, rendezvous_owner
+
+KEYS = [f"entry-{i}" for i in range(200)]
+
+
+class FakeFirebase:
+    """Serves a fixed set of live workers."""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def get_live_workers(self, ttl_seconds):
+        return self.workers
+
+    def release_claims(self, worker_id):
+        return 0
+
+
+def membership(worker_id, workers, steal_after_seconds=900):
+    cluster = ClusterMembership(FakeFirebase(workers), worker_id, steal_after_seconds=steal_after_seconds)
+    cluster.refresh()
+    return cluster
+
+
+def test_owner_is_deterministic_and_independent_of_order():
+    workers = ['a', 'b', 'c']
+    for key in KEYS:
+        assert rendezvous_owner(key, workers) == rendezvous_owner(key, list(reversed(workers)))
+    assert rendezvous_owner('x', []) is None
+
+
+def test_keys_spread_over_workers():
+    owners = {rendezvous_owner(key, ['a', 'b', 'c']) for key in KEYS}
+    assert owners == {'a', 'b', 'c'}
+
+
+def test_joining_worker_only_takes_keys():
+    before = {key: rendezvous_owner(key, ['a', 'b']) for key in KEYS}
+    after = {key: rendezvous_owner(key, ['a', 'b', 'c']) for key in KEYS}
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert moved
+    assert all(after[key] == 'c' for key in moved)
+
+
+def test_pending_since_is_latest_requeue():
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    requeued = datetime(2024, 1, 2)
+    assert pending_since({'createdAt': created, 'requeuedAt': requeued}) == requeued.replace(tzinfo=timezone.utc)
+    assert pending_since({}) is None
+
+
+def test_select_keeps_own_shard_in_queue_order():
+    now = datetime.now(timezone.utc)
+    cluster = membership('a', {'a': {'lastClaimAt': now}, 'b': {'lastClaimAt': now}})
+    submissions = [{'id': key, 'createdAt': now} for key in KEYS]
+    mine = [s for s in submissions if rendezvous_owner(s['id'], ['a', 'b']) == 'a']
+    assert cluster.select(submissions, 5) == mine[:5]
+    assert cluster.select(submissions, len(KEYS)) == mine
+
+
+def test_steals_only_overdue_entries_of_stalled_owners():
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(hours=1)
+    theirs = [key for key in KEYS if rendezvous_owner(key, ['a', 'b']) == 'b']
+    overdue = {'id': theirs[0], 'createdAt': old}
+    fresh = {'id': theirs[1], 'createdAt': now}
+
+    stalled = membership('a', {'a': {'lastClaimAt': now}, 'b': {'lastClaimAt': old}})
+    assert stalled.select([overdue, fresh], 5) == [overdue]
+
+    busy = membership('a', {'a': {'lastClaimAt': now}, 'b': {'lastClaimAt': now}})
+    assert busy.select([overdue, fresh], 5) == []
@@ -0,0 +1,112 @@
+"""Tests for URL canonicalization and the shared audit cache."""
+import asyncio
+
+import pytest
+
+from judge_worker.dedupe import SharedAuditCache, canonicalize_url, url_error
+
+
+def test_scheme_host_case_and_www_are_ignored():
+    assert canonicalize_url('http://WWW.Example.com') == 'https://example.com/'
+    assert canonicalize_url('example.com') == 'https://example.com/'
+    assert canonicalize_url('  https://example.com/  ') == 'https://example.com/'
+
+
+def test_default_ports_dropped_other_ports_kept():
+    assert canonicalize_url('http://example.com:80/a') == 'https://example.com/a'
+    assert canonicalize_url('https://example.com:443/a') == 'https://example.com/a'
+    assert canonicalize_url('https://example.com:8080/a') == 'https://example.com:8080/a'
+
+
+def test_path_slashes_and_index_pages():
+    assert canonicalize_url('https://example.com/blog/') == 'https://example.com/blog'
+    assert canonicalize_url('https://example.com//blog//post') == 'https://example.com/blog/post'
+    assert canonicalize_url('https://example.com/index.html') == 'https://example.com/'
+    assert canonicalize_url('https://example.com/docs/INDEX.PHP') == 'https://example.com/docs'
+
+
+def test_fragment_and_tracking_params_dropped_query_sorted():
+    assert canonicalize_url(
+        'https://example.com/?utm_source=x&b=2&fbclid=y&a=1#top'
+    ) == 'https://example.com/?a=1&b=2'
+    assert canonicalize_url('https://example.com/?UTM_Medium=x&ref=z') == 'https://example.com/'
+
+
+def test_blank_values_are_kept():
+    assert canonicalize_url('https://example.com/?q=') == 'https://example.com/?q='
+
+
+@pytest.mark.parametrize('url', ['example.com:abc', 'http://[::1', 'https://ex.com:99999/'])
+def test_malformed_urls_fall_back_to_the_raw_url(url):
+    assert url_error(url)
+    assert canonicalize_url(f"  {url} ") == url
+
+
+def test_url_error_accepts_valid_urls():
+    assert url_error('example.com') is None
+    assert url_error('http://[::1]:8080/') is None
+
+
+def test_cache_computes_once_per_key():
+    cache = SharedAuditCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'lighthouseSummaryPath': 'x'}
+
+    assert cache.get_or_compute('k', compute) == ({'lighthouseSummaryPath': 'x'}, False)
+    assert cache.get_or_compute('k', compute) == ({'lighthouseSummaryPath': 'x'}, True)
+    assert len(calls) == 1
+
+
+def test_rejected_values_are_not_shared():
+    cache = SharedAuditCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'lighthouseSummaryPath': None}
+
+    def ok(value):
+        return bool(value['lighthouseSummaryPath'])
+
+    assert cache.get_or_compute('k', compute, cacheable=ok) == ({'lighthouseSummaryPath': None}, False)
+    assert cache.get_or_compute('k', compute, cacheable=ok) == ({'lighthouseSummaryPath': None}, False)
+    assert len(calls) == 2
+    assert cache.get('k') is None
+
+
+def test_key_locks_are_dropped_when_computation_fails():
+    cache = SharedAuditCache()
+
+    def compute():
+        raise RuntimeError('capture failed')
+
+    async def compute_async():
+        raise RuntimeError('capture failed')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', compute)
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_compute_async('k', compute_async))
+    assert cache._key_locks == {}
+    assert cache._async_key_locks == {}
+
+
+def test_waiters_share_the_async_key_lock():
+    cache = SharedAuditCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'lighthouseSummaryPath': 'x'}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute_async('k', compute) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert [shared for _, shared in results] == [False, True, True]
+    assert len(calls) == 1
+    assert cache._async_key_locks == {}
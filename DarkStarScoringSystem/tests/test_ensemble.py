@@ -0,0 +1,54 @@
+"""Tests for ensemble parsing and score aggregation."""
+import pytest
+
+pytest.importorskip('jsonschema')
+pytest.importorskip('dotenv')
+
+from judge_worker.ollama_judge import (  # noqa: E402
+    OllamaJudge, aggregate_scores, ensemble_confidence, parse_ensemble, score_disagreement
+)
+
+
+def member(design, ux=10, creativity=10, content=3):
+    return {'scores': {'design': design, 'ux': ux, 'creativity': creativity, 'content': content}}
+
+
+def test_parse_ensemble_seeds_and_blanks():
+    assert parse_ensemble('llama3.1:8b@1, mistral:7b,,') == [
+        {'model': 'llama3.1:8b', 'seed': 1},
+        {'model': 'mistral:7b', 'seed': None}
+    ]
+    assert parse_ensemble('') == []
+
+
+def test_single_member_ensemble_is_the_model():
+    judge = OllamaJudge('http://localhost:11434', 'default:7b', pool=object(), ensemble=parse_ensemble('mistral:7b@3'))
+    assert (judge.model, judge.seed) == ('mistral:7b', 3)
+
+
+def test_median_ignores_one_outlier():
+    scores = aggregate_scores([member(20), member(22), member(0)])
+    assert scores['design'] == 20
+    assert scores['ux'] == 10
+
+
+def test_trimmed_mean_drops_extremes():
+    results = [member(v) for v in (0, 18, 20, 22, 25)]
+    # 20% of five members trimmed from each end
+    assert aggregate_scores(results, method='trimmed_mean')['design'] == 20
+    # Three or four members: one trimmed from each end
+    assert aggregate_scores([member(0), member(20), member(21)], method='trimmed_mean')['design'] == 20
+
+
+def test_scores_are_clamped_to_the_schema_range():
+    assert aggregate_scores([member(500), member(500)])['design'] == 25
+    assert aggregate_scores([member(-5)])['design'] == 0
+
+
+def test_disagreement_and_confidence():
+    results = [member(10), member(14)]
+    assert score_disagreement(results)['design'] == 4
+    assert score_disagreement(results)['ux'] == 0
+    assert ensemble_confidence([member(10)]) == 1.0
+    assert ensemble_confidence([member(10), member(10)]) == 1.0
+    assert ensemble_confidence(results) < 1.0
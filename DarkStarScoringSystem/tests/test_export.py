@@ -0,0 +1,135 @@
+"""Tests for flattening entries and writing export parts."""
+import csv
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip('dotenv')
+
+from judge_worker.export import (  # noqa: E402
+    BASE_COLUMNS, STATE_FILE, PartWriter, ResultsExporter, coerce, column_type, flatten_entry, read_export
+)
+
+SCORED = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def entry(entry_id, **metrics):
+    return {
+        'id': entry_id,
+        'url': f"https://{entry_id}.example",
+        'category': 'Portfolio',
+        'status': 'scored',
+        'createdAt': datetime(2024, 5, 1, 10),
+        'result': {
+            'judgeVersion': 'v1',
+            'scoredAt': SCORED,
+            'scores': {'design': 20, 'total': 81.5},
+            'metrics': dict({'lighthousePerformance': 90, 'flags': {'nearDuplicate': False}, 'tags': ['a', 'b']}, **metrics)
+        }
+    }
+
+
+def test_flatten_entry():
+    row = flatten_entry(entry('e1'))
+    assert list(row)[:len(BASE_COLUMNS)] == list(BASE_COLUMNS)
+    assert row['judgeVersion'] == 'v1'
+    assert row['score.total'] == 81.5
+    assert row['metrics.flags.nearDuplicate'] is False
+    assert row['metrics.tags'] == '["a","b"]'
+    failed = flatten_entry({'id': 'e2', 'status': 'error', 'error': {'stage': 'capture', 'message': 'timeout'}})
+    assert failed['errorStage'] == 'capture' and failed['scoredAt'] is None
+
+
+def test_column_types_and_coercion():
+    assert column_type(True) == 'bool'
+    assert column_type(3) == column_type(2.5) == 'float'
+    assert column_type(SCORED) == 'timestamp'
+    assert column_type(None) is None
+    assert coerce(3, 'float') == 3.0
+    assert coerce('fast', 'float') is None
+    assert coerce(datetime(2024, 1, 1), 'timestamp').tzinfo is timezone.utc
+    assert coerce(SCORED, 'string') == SCORED.isoformat()
+
+
+def write_parts(tmp_path, fmt):
+    writer = PartWriter(tmp_path, fmt, dict(BASE_COLUMNS), 0)
+    writer.write([flatten_entry(entry('e1')), flatten_entry(entry('e2'))])
+    writer.write([flatten_entry(entry('e3'))])
+    # A new column closes the part and continues in the next one
+    writer.write([flatten_entry(entry('e4', lighthouseLcpMs=1800))])
+    writer.close()
+    (tmp_path / STATE_FILE).write_text(json.dumps({'format': fmt}))
+    return writer
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_columnar_round_trip(tmp_path, fmt):
+    pytest.importorskip('pyarrow')
+    writer = write_parts(tmp_path, fmt)
+    assert len(writer.files) == 2
+    table = read_export(str(tmp_path)).to_pylist()
+    assert [row['id'] for row in table] == ['e1', 'e2', 'e3', 'e4']
+    assert table[0]['score.design'] == 20.0
+    assert table[0]['metrics.flags.nearDuplicate'] is False
+    assert table[0]['createdAt'] == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert table[0]['metrics.lighthouseLcpMs'] is None
+    assert table[3]['metrics.lighthouseLcpMs'] == 1800.0
+
+
+def test_csv_parts(tmp_path):
+    writer = write_parts(tmp_path, 'csv')
+    assert len(writer.files) == 2
+    with gzip.open(writer.files[1], 'rt', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]['id'] == 'e4'
+    assert rows[0]['metrics.lighthouseLcpMs'] == '1800.0'
+    assert rows[0]['scoredAt'] == SCORED.isoformat()
+    with pytest.raises(ValueError):
+        read_export(str(tmp_path))
+
+
+class FakeFirebase:
+    """Entries in (scoredAt, id) order, resumed like iter_entries' cursor."""
+
+    def __init__(self, entries, fail_after=None):
+        self.entries = entries
+        self.fail_after = fail_after
+
+    def iter_entries(self, page_size, order_field, start_after=None, start_after_id=None):
+        for count, item in enumerate(self.entries):
+            if count == self.fail_after:
+                raise RuntimeError('connection reset')
+            key = (item['result']['scoredAt'], item['id'])
+            if start_after is None or key > (start_after, start_after_id or ''):
+                yield item
+
+
+def exported_ids(directory):
+    ids = []
+    for path in sorted(directory.glob('part-*.csv.gz')):
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            ids.extend(row['id'] for row in csv.DictReader(f))
+    return ids
+
+
+def test_failed_full_export_keeps_the_previous_one(tmp_path):
+    directory = tmp_path / 'results'
+    ResultsExporter(FakeFirebase([entry('e1')]), directory, fmt='csv').export()
+    with pytest.raises(RuntimeError):
+        ResultsExporter(FakeFirebase([entry('e1'), entry('e2')], fail_after=1), directory, fmt='csv').export()
+    assert exported_ids(directory) == ['e1']
+    assert (directory / STATE_FILE).exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['results']
+
+
+def test_incremental_export_keeps_entries_scored_in_the_same_instant(tmp_path):
+    directory = tmp_path / 'results'
+    firebase = FakeFirebase([entry('e1'), entry('e2')])
+    ResultsExporter(firebase, directory, fmt='csv').export()
+    firebase.entries.append(entry('e3'))
+    result = ResultsExporter(firebase, directory, fmt='csv').export(incremental=True)
+    assert result['rows'] == 1
+    assert exported_ids(directory) == ['e1', 'e2', 'e3']
+    assert json.loads((directory / STATE_FILE).read_text())['lastId'] == 'e3'
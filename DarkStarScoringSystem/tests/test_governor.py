@@ -0,0 +1,36 @@
+"""Tests for process RSS sampling from /proc."""
+from judge_worker import governor
+
+
+def fake_proc(root, processes):
+    """processes: pid -> (comm, ppid, rss_kb, children)."""
+    for pid, (comm, ppid, rss_kb, children) in processes.items():
+        entry = root / str(pid)
+        (entry / 'task' / str(pid)).mkdir(parents=True)
+        (entry / 'stat').write_text(f"{pid} ({comm}) S {ppid} 0 0")
+        (entry / 'status').write_text(f"Name:\t{comm}\nVmRSS:\t{rss_kb} kB\n")
+        (entry / 'task' / str(pid) / 'children').write_text(' '.join(map(str, children)))
+
+
+def test_tree_rss_follows_children_only(tmp_path, monkeypatch):
+    fake_proc(tmp_path, {
+        10: ('python', 1, 100 * 1024, [11]),
+        11: ('chrome', 10, 200 * 1024, [12]),
+        12: ('chrome renderer', 11, 50 * 1024, []),
+        20: ('postgres', 1, 900 * 1024, [])
+    })
+    monkeypatch.setattr(governor, 'PROC', tmp_path)
+    assert governor.read_tree_rss(10) == 350
+
+
+def test_ollama_rss_counts_server_and_runners(tmp_path, monkeypatch):
+    fake_proc(tmp_path, {
+        10: ('python', 1, 100 * 1024, []),
+        30: ('ollama', 1, 300 * 1024, [31]),
+        31: ('ollama_llama_se', 30, 2000 * 1024, [])
+    })
+    monkeypatch.setattr(governor, 'PROC', tmp_path)
+    monkeypatch.setattr(governor, '_ollama_pids', [])
+    monkeypatch.setattr(governor, '_ollama_scanned_at', 0.0)
+    assert governor.read_process_rss(10) == (100, 2300)
+    assert governor.read_process_rss(10, ollama=False) == (100, None)
@@ -0,0 +1,84 @@
+"""Tests for combining parallel Lighthouse runs."""
+import json
+
+from audits.lighthouse_runner import LighthouseRunner, cpu_groups
+
+
+def summary(performance, lcp, cls):
+    return {
+        'categories': {'performance': performance, 'accessibility': 0.9, 'seo': 1, 'best-practices': 0.8},
+        'audits': {
+            'largest-contentful-paint': {'numericValue': lcp},
+            'cumulative-layout-shift': {'numericValue': cls}
+        }
+    }
+
+
+def run_files(tmp_path, count):
+    paths = [tmp_path / f"s1_lighthouse_{run}.json" for run in range(count)]
+    for run, path in enumerate(paths):
+        path.write_text(json.dumps({'run': run}))
+    return paths
+
+
+def test_median_of_runs_and_report_of_the_median_run(tmp_path):
+    runner = LighthouseRunner(tmp_path, runs=3, pin_cpus=False)
+    paths = run_files(tmp_path, 3)
+    metrics = runner._finish('s1', list(zip(paths, [
+        summary(0.50, 4000.0, 0.30),
+        summary(0.91, 1500.0, 0.01),
+        summary(0.72, 2500.4, 0.12345)
+    ])))
+    assert metrics['lighthousePerformance'] == 72
+    assert metrics['lighthouseAccessibility'] == 90
+    assert metrics['lighthouseLcpMs'] == 2500
+    assert metrics['lighthouseCls'] == 0.123
+    assert metrics['lighthouseRuns'] == 3
+    assert metrics['lighthouseRunStdev']['lighthouseAccessibility'] == 0
+    assert metrics['lighthouseRunStdev']['lighthousePerformance'] > 0
+
+    report = tmp_path / 's1_lighthouse.json'
+    assert metrics['lighthouseReportPath'] == str(report)
+    assert json.loads(report.read_text()) == {'run': 2}
+    assert not any(path.exists() for path in paths)
+    saved = json.loads((tmp_path / 's1_lighthouse_summary.json').read_text())
+    assert [run['lighthousePerformance'] for run in saved['runs']] == [50, 91, 72]
+
+
+def test_failed_runs_are_dropped(tmp_path):
+    runner = LighthouseRunner(tmp_path, runs=3, keep_full_report=False, pin_cpus=False)
+    paths = run_files(tmp_path, 3)
+    metrics = runner._finish('s1', list(zip(paths, [summary(0.6, 3000.0, 0.1), None, summary(0.8, 2000.0, 0.1)])))
+    assert metrics['lighthousePerformance'] == 70
+    assert metrics['lighthouseRuns'] == 2
+    assert metrics['lighthouseReportPath'] is None
+    assert not any(path.exists() for path in paths)
+
+
+def test_single_run_has_no_spread(tmp_path):
+    runner = LighthouseRunner(tmp_path, pin_cpus=False)
+    path = tmp_path / 's1_lighthouse.json'
+    path.write_text('{}')
+    metrics = runner._finish('s1', [(path, summary(0.5, 1000.0, 0.0))])
+    assert metrics['lighthousePerformance'] == 50
+    assert 'lighthouseRuns' not in metrics
+    assert path.exists()
+
+
+def test_all_runs_failed(tmp_path):
+    runner = LighthouseRunner(tmp_path, runs=2, pin_cpus=False)
+    paths = run_files(tmp_path, 2)
+    metrics = runner._finish('s1', [(path, None) for path in paths])
+    assert metrics == runner._default_metrics()
+    assert not any(path.exists() for path in paths)
+
+
+def test_plan_waves_fit_the_cpu_groups(tmp_path):
+    runner = LighthouseRunner(tmp_path, runs=5, cores_per_run=2, pin_cpus=False)
+    waves = runner._plan('s1')
+    slots = len(cpu_groups(5, 2))
+    assert sum(len(wave) for wave in waves) == 5
+    assert all(len(wave) <= slots for wave in waves)
+    groups = [cpus for cpus in cpu_groups(5, 2) if cpus]
+    flat = [cpu for cpus in groups for cpu in cpus]
+    assert len(flat) == len(set(flat))
@@ -0,0 +1,66 @@
+"""Tests for the streaming Lighthouse report summary."""
+import json
+
+import pytest
+
+from audits.lighthouse_runner import read_summary
+
+
+def report(**extra):
+    return dict({
+        'lighthouseVersion': '12.0.0',
+        'requestedUrl': 'https://example.com/',
+        'finalDisplayedUrl': 'https://example.com/',
+        'runtimeError': None,
+        'i18n': {'rendererFormattedStrings': {'note': 'Braces } { ] [ and "quotes" \\ in strings'}},
+        'audits': {
+            'final-screenshot': {
+                'score': None,
+                'details': {'data': 'data:image/jpeg;base64,' + 'A{[' * 5000}
+            },
+            'first-contentful-paint': {'score': 0.9, 'numericValue': 812.5, 'displayValue': '0.8 s'},
+            'cumulative-layout-shift': {'score': 1, 'numericValue': 0.0123, 'displayValue': '0.012'},
+            'script-treemap-data': {'details': {'nodes': [{'name': 'a}b', 'children': [[], {}]}]}}
+        },
+        'categories': {
+            'performance': {'title': 'Performance', 'score': 0.87, 'auditRefs': [{'id': 'x', 'weight': 10}]},
+            'accessibility': {'score': 1},
+            'seo': {'score': None}
+        },
+        'timing': {'total': 1234.5}
+    }, **extra)
+
+
+def write(tmp_path, data, indent=None):
+    path = tmp_path / 'report.json'
+    path.write_text(json.dumps(data, indent=indent), encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_summary_matches_full_parse(tmp_path, indent):
+    summary = read_summary(write(tmp_path, report(), indent))
+    assert summary['categories'] == {'performance': 0.87, 'accessibility': 1, 'seo': None}
+    assert summary['audits'] == {
+        'first-contentful-paint': {'score': 0.9, 'numericValue': 812.5, 'displayValue': '0.8 s'},
+        'cumulative-layout-shift': {'score': 1, 'numericValue': 0.0123, 'displayValue': '0.012'}
+    }
+    assert summary['lighthouseVersion'] == '12.0.0'
+    assert summary['requestedUrl'] == 'https://example.com/'
+    assert summary['runtimeError'] is None
+    assert 'timing' not in summary and 'i18n' not in summary
+
+
+def test_runtime_error_report(tmp_path):
+    data = {'runtimeError': {'code': 'NO_FCP', 'message': 'The page did not paint'}, 'audits': {}, 'categories': {}}
+    summary = read_summary(write(tmp_path, data))
+    assert summary == {'categories': {}, 'audits': {}, 'runtimeError': data['runtimeError']}
+
+
+def test_truncated_report_raises_value_error(tmp_path):
+    text = json.dumps(report(), indent=2)
+    path = tmp_path / 'report.json'
+    for end in range(1, len(text), 97):
+        path.write_text(text[:end], encoding='utf-8')
+        with pytest.raises(ValueError):
+            read_summary(path)
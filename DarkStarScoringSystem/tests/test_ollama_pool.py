@@ -0,0 +1,104 @@
+"""Tests for Ollama pool failover and failure classification."""
+import threading
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from judge_worker import ollama_pool  # noqa: E402
+from judge_worker.ollama_pool import GenerationCancelled, NoHealthyBackendError, OllamaPool  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status, body=None):
+        self.status_code = status
+        self._body = body or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self._body
+
+
+def pool_answering(monkeypatch, answers):
+    """Pool whose hosts answer (or raise) per host name."""
+    def post(url, json=None, timeout=None):
+        answer = answers[url.split('/')[2]]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    monkeypatch.setattr(ollama_pool.requests, 'post', post)
+    return OllamaPool([f"http://{host}" for host in answers])
+
+
+def test_fails_over_to_a_working_host(monkeypatch):
+    pool = pool_answering(monkeypatch, {
+        'a': requests.ConnectionError('refused'),
+        'b': FakeResponse(200, {'response': '{}'})
+    })
+    assert pool.generate({}) == {'response': '{}'}
+
+
+def test_all_hosts_down_means_no_healthy_backend(monkeypatch):
+    pool = pool_answering(monkeypatch, {'a': requests.ConnectionError('refused'), 'b': FakeResponse(503)})
+    with pytest.raises(NoHealthyBackendError) as raised:
+        pool.generate({})
+    assert raised.value.__cause__ is not None
+
+
+def test_bad_request_is_raised_as_is(monkeypatch):
+    pool = pool_answering(monkeypatch, {'a': requests.ConnectionError('refused'), 'b': FakeResponse(404)})
+    with pytest.raises(requests.HTTPError):
+        pool.generate({})
+
+
+def test_open_circuits_mean_no_healthy_backend(monkeypatch):
+    pool = pool_answering(monkeypatch, {'a': FakeResponse(200)})
+    pool.failure_threshold = 1
+    pool.record_failure(pool.backends[0])
+    with pytest.raises(NoHealthyBackendError):
+        pool.generate({})
+
+
+class StreamingResponse(FakeResponse):
+    def __init__(self, lines):
+        super().__init__(200)
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        yield from self.lines
+
+
+def test_cancelled_call_stops_reading_and_keeps_the_circuit_closed(monkeypatch):
+    cancel = threading.Event()
+
+    def lines():
+        yield b'{"response": "{"}'
+        cancel.set()
+        yield b'{"response": "}"}'
+        raise AssertionError("read past cancellation")
+
+    pool = pool_answering(monkeypatch, {'a': None})
+    monkeypatch.setattr(ollama_pool.requests, 'post', lambda *a, **k: StreamingResponse(lines()))
+    with pytest.raises(GenerationCancelled):
+        pool.generate({}, cancel=cancel)
+    assert pool.backends[0].consecutive_failures == 0
+    assert pool.backends[0].in_flight == 0
+
+
+def test_streamed_call_joins_the_response(monkeypatch):
+    pool = pool_answering(monkeypatch, {'a': None})
+    monkeypatch.setattr(ollama_pool.requests, 'post', lambda *a, **k: StreamingResponse([
+        b'{"response": "{\\"a\\""}', b'', b'{"response": ": 1}", "done": true, "eval_count": 2}'
+    ]))
+    result = pool.generate({}, cancel=threading.Event())
+    assert result['response'] == '{"a": 1}'
+    assert result['eval_count'] == 2
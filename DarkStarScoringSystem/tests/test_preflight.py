@@ -0,0 +1,77 @@
+"""Tests for classifying pre-flight failures."""
+import socket
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from judge_worker.preflight import PreflightChecker  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {'Content-Type': 'text/html'}
+
+    def close(self):
+        pass
+
+
+def checker(monkeypatch, respond, dns_error=None):
+    preflight = PreflightChecker()
+
+    def getaddrinfo(host, *args, **kwargs):
+        if dns_error:
+            raise socket.gaierror(dns_error, 'resolver says no')
+        return [(None, None, None, None, ('192.0.2.1', 0))]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    monkeypatch.setattr(preflight, '_request', respond)
+    return preflight
+
+
+def respond_with(status):
+    return lambda url: FakeResponse(status)
+
+
+def test_ok(monkeypatch):
+    result = checker(monkeypatch, respond_with(200)).check('https://example.com/')
+    assert result['ok'] and not result['retryable']
+
+
+@pytest.mark.parametrize('status,retryable', [(404, False), (410, False), (429, True), (503, True)])
+def test_status_failures(monkeypatch, status, retryable):
+    result = checker(monkeypatch, respond_with(status)).check('https://example.com/')
+    assert not result['ok']
+    assert result['reason'] == 'http_status'
+    assert result['retryable'] is retryable
+
+
+def test_other_client_errors_are_left_to_the_browser(monkeypatch):
+    assert checker(monkeypatch, respond_with(403)).check('https://example.com/')['ok']
+
+
+def test_timeout_is_retryable(monkeypatch):
+    def respond(url):
+        raise requests.exceptions.Timeout('slow')
+    result = checker(monkeypatch, respond).check('https://example.com/')
+    assert (result['reason'], result['retryable']) == ('timeout', True)
+
+
+def test_nxdomain_is_final_and_cached(monkeypatch):
+    preflight = checker(monkeypatch, respond_with(200), dns_error=socket.EAI_NONAME)
+    result = preflight.check('https://missing.example/')
+    assert (result['reason'], result['retryable']) == ('dns', False)
+    assert 'missing.example' in preflight._dns_cache
+
+
+def test_resolver_failure_is_retryable_and_not_cached(monkeypatch):
+    preflight = checker(monkeypatch, respond_with(200), dns_error=socket.EAI_AGAIN)
+    result = preflight.check('https://flaky.example/')
+    assert (result['reason'], result['retryable']) == ('dns', True)
+    assert 'flaky.example' not in preflight._dns_cache
+
+
+def test_invalid_url_is_final(monkeypatch):
+    result = checker(monkeypatch, respond_with(200)).check('ftp://example.com/')
+    assert (result['reason'], result['retryable']) == ('invalid_url', False)
@@ -0,0 +1,82 @@
+"""Tests for token estimation and budgeted prompt assembly."""
+from judge_worker.prompt_budget import PromptBudget, PromptSection, TokenEstimator, normalize, raw_token_estimate
+
+TEMPLATE = "Judge {url}.\n{page}\n{extra}\nAnswer in JSON."
+LONG_TEXT = ' '.join(f"Sentence number {i} talks about the studio portfolio." for i in range(400))
+
+
+def test_raw_token_estimate():
+    assert raw_token_estimate('') == 0
+    assert raw_token_estimate('hello world') == 2
+    assert raw_token_estimate('internationalization') == 3
+    assert raw_token_estimate('2024') == 2
+    assert raw_token_estimate('héllo') >= 3
+
+
+def test_normalize():
+    assert normalize('  Hello,   WORLD! ') == normalize('hello world') == 'hello world'
+
+
+def test_estimator_calibrates_and_ignores_outliers():
+    estimator = TokenEstimator()
+    text = 'one two three four'
+    assert estimator.count(text, 'm') == 4
+    estimator.observe('m', text, 6)
+    assert estimator.ratio('m') == 1.5
+    estimator.observe('m', text, 100)
+    assert estimator.ratio('m') == 1.5
+    estimator.observe('m', text, 4)
+    assert 1.0 < estimator.ratio('m') < 1.5
+    assert estimator.ratio('other') == 1.0
+
+
+def build(budget, sections):
+    return PromptBudget(budget).build(TEMPLATE, sections, url='https://example.com')
+
+
+def test_everything_fits_in_a_large_budget():
+    page = PromptSection('page').line('Title: ', 'Acme').values('H1: ', ['Welcome', 'Work'])
+    prompt, stats = build(1000, [page, PromptSection('extra')])
+    assert 'Title: Acme\nH1: Welcome, Work' in prompt
+    assert 'Not available' in prompt
+    assert stats['dropped'] == 0 and stats['tokens'] <= 1000
+
+
+def test_text_is_cut_to_the_budget_at_a_word_boundary():
+    page = PromptSection('page').line('Title: ', 'Acme').text('Text: ', LONG_TEXT)
+    prompt, stats = build(300, [page, PromptSection('extra')])
+    assert stats['tokens'] <= 300
+    text_line = next(line for line in prompt.splitlines() if line.startswith('Text: '))
+    assert text_line.endswith('...')
+    assert LONG_TEXT.startswith(text_line[len('Text: '):-3])
+
+
+def test_required_lines_stay_and_low_priority_goes_first():
+    page = PromptSection('page').line('Title: ', 'Acme ' * 40, priority=0)
+    extra = PromptSection('extra').line('Note: ', 'keep me', priority=1).line('Aside: ', 'drop me ' * 20, priority=2)
+    prompt, stats = build(70, [page, extra])
+    assert 'Title: ' in prompt and 'Note: keep me' in prompt
+    assert 'Aside: ' not in prompt
+    assert stats['dropped'] == 1
+    # Rendered in section order, not priority order
+    assert prompt.index('Title: ') < prompt.index('Note: ')
+
+
+def test_values_are_listed_once_and_capped():
+    page = PromptSection('page').values('H1: ', ['Our Work', 'About']).values('Links: ', ['our work', 'Contact'])
+    extra = PromptSection('extra').values('Tags: ', [f"tag{i}" for i in range(100)], max_tokens=20)
+    prompt, stats = build(1000, [page, extra])
+    assert 'Links: Contact' in prompt
+    assert stats['duplicates'] == 1
+    tags = next(line for line in prompt.splitlines() if line.startswith('Tags: '))
+    assert 0 < len(tags.split(', ')) < 100
+    assert stats['dropped'] > 0
+
+
+def test_text_skips_sentences_already_sent():
+    page = PromptSection('page').line('Title: ', 'Handmade furniture from Oslo', dedupe=True)
+    page.text('Text: ', 'Handmade furniture from Oslo. We build tables. We build chairs.')
+    prompt, _ = build(1000, [page, PromptSection('extra')])
+    text_line = next(line for line in prompt.splitlines() if line.startswith('Text: '))
+    assert 'Oslo' not in text_line
+    assert 'We build tables.' in text_line
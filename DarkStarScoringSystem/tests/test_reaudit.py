@@ -0,0 +1,65 @@
+"""Tests for re-audit scheduling and page fingerprints."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('requests')
+
+from judge_worker.reaudit import _decoder, _similarity, next_check_at, page_fingerprint  # noqa: E402
+
+DAY = 86400.0
+NOW = datetime(2024, 6, 1, 15, 30, tzinfo=timezone.utc)
+PAGE = '<html><body><h1 class="{cls}">Studio</h1><p>' + ' '.join(f"word{i}" for i in range(60)) + '</p></body></html>'
+
+
+def test_next_check_is_within_one_interval():
+    for i in range(50):
+        at = next_check_at(f"entry-{i}", NOW, DAY, DAY)
+        assert NOW < at <= NOW + timedelta(seconds=DAY)
+
+
+def test_slots_keep_their_phase():
+    first = next_check_at('entry-1', NOW, DAY, DAY)
+    assert next_check_at('entry-1', first, DAY, DAY) == first + timedelta(seconds=DAY)
+    later = NOW + timedelta(hours=5)
+    assert next_check_at('entry-1', later, DAY, DAY) in (first, first + timedelta(seconds=DAY))
+
+
+def test_phases_stay_within_the_spread():
+    hour = 3600.0
+    for i in range(50):
+        at = next_check_at(f"entry-{i}", NOW, DAY, hour)
+        assert at.timestamp() % DAY < hour
+
+
+def test_phases_are_spread_out():
+    slots = {next_check_at(f"entry-{i}", NOW, DAY, DAY).hour for i in range(200)}
+    assert len(slots) > 12
+
+
+def test_fingerprint_ignores_attributes():
+    a = page_fingerprint(PAGE.format(cls='x1'))
+    b = page_fingerprint(PAGE.format(cls='css-9f8e7d'))
+    assert a['domHash'] == b['domHash']
+    assert a['elements'] == 4
+
+
+def test_fingerprint_tells_small_from_material_edits():
+    base = page_fingerprint(PAGE.format(cls=''))
+    small = page_fingerprint(PAGE.format(cls='').replace('word59', 'changed'))
+    rewritten = page_fingerprint('<html><body><main><p>' + 'entirely new copy here ' * 20 + '</p></main></body></html>')
+    assert small['domHash'] != base['domHash']
+    assert _similarity(base['textSignature'], small['textSignature']) > 0.8
+    assert _similarity(base['textSignature'], rewritten['textSignature']) < 0.2
+
+
+def test_similarity_of_missing_signatures():
+    assert _similarity(None, None) == 1.0
+    assert _similarity(None, [1, 2]) == 0.0
+
+
+def test_decoder_falls_back_to_utf8():
+    assert _decoder('ISO-8859-1') == 'iso8859-1'
+    assert _decoder('x-unknown-charset') == 'utf-8'
+    assert _decoder(None) == 'utf-8'
@@ -0,0 +1,96 @@
+"""Tests for queue classification and fair ordering."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from judge_worker.scheduler import QueueScheduler, classify, parse_class_weights, percentile
+
+
+def entry(entry_id, submitter='s1', category='Portfolio', minutes_ago=1, **fields):
+    created = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    return dict({'id': entry_id, 'submitterId': submitter, 'category': category, 'createdAt': created}, **fields)
+
+
+def ids(submissions):
+    return [s['id'] for s in submissions]
+
+
+def test_parse_class_weights():
+    assert parse_class_weights('new:3, rejudge:0.5') == {'new': 3.0, 'resubmission': 1.0, 'rejudge': 0.5}
+    with pytest.raises(ValueError):
+        parse_class_weights('urgent:2')
+    with pytest.raises(ValueError):
+        parse_class_weights('new:0')
+
+
+def test_classify():
+    assert classify({}) == 'new'
+    assert classify({'resubmittedAt': datetime.now(timezone.utc)}) == 'resubmission'
+    assert classify({'result': {'total': 50}}) == 'rejudge'
+    assert classify({'rejudgeRequestedAt': datetime.now(timezone.utc), 'resubmittedAt': 1}) == 'rejudge'
+
+
+def test_bulk_submitter_is_interleaved():
+    bulk = [entry(f"bulk-{i}", submitter='bulk', minutes_ago=10 - i) for i in range(4)]
+    other = entry('other', submitter='other')
+    order = ids(QueueScheduler().order(bulk + [other], 5))
+    assert order.index('other') <= 1
+    assert sorted(order) == sorted(ids(bulk + [other]))
+
+
+def test_categories_are_interleaved():
+    submissions = [entry(f"p{i}", submitter=f"p{i}") for i in range(3)]
+    submissions += [entry(f"g{i}", submitter=f"g{i}", category='Game') for i in range(3)]
+    order = QueueScheduler().order(submissions, 6)
+    categories = [s['category'] for s in order]
+    assert all(categories[i] != categories[i + 1] for i in range(5))
+
+
+def test_class_weights_set_the_share():
+    submissions = [entry(f"new-{i}", submitter=f"n{i}") for i in range(6)]
+    submissions += [entry(f"old-{i}", submitter=f"o{i}", result={'total': 1}) for i in range(6)]
+    scheduler = QueueScheduler(class_weights=parse_class_weights('new:2,rejudge:1'))
+    order = scheduler.order(submissions, 6)
+    assert [classify(s) for s in order].count('new') == 4
+
+
+def test_overdue_entries_go_first():
+    submissions = [entry(f"n{i}", submitter='n') for i in range(3)]
+    waiting = entry('waiting', submitter='n', minutes_ago=120, result={'total': 1})
+    scheduler = QueueScheduler(max_wait_seconds=1800)
+    assert ids(scheduler.order(submissions + [waiting], 2))[0] == 'waiting'
+
+
+def test_cheaper_job_breaks_ties():
+    scheduler = QueueScheduler(audits_cached=lambda s: s['id'] == 'cached')
+    order = scheduler.order([entry('slow', submitter='a'), entry('cached', submitter='b')], 2)
+    assert ids(order) == ['cached', 'slow']
+
+
+def test_started_charges_the_flows():
+    scheduler = QueueScheduler()
+    scheduler.started(entry('first', submitter='a'))
+    order = scheduler.order([entry('again', submitter='a'), entry('new', submitter='b')], 2)
+    assert ids(order) == ['new', 'again']
+    assert scheduler.wait_report()['new']['count'] == 1
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.9) == 90.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
+    assert percentile([1.0, 2.0, 3.0], 0.5) == 2.0
+
+
+def test_failed_job_releases_its_charge():
+    scheduler = QueueScheduler()
+    failing = entry('failing', submitter='a')
+    scheduler.started(failing)
+    scheduler.finished(failing, {}, completed=False)
+    order = scheduler.order([entry('again', submitter='a', minutes_ago=2), entry('new', submitter='b')], 2)
+    assert ids(order) == ['again', 'new']
+    # Nothing learned from the failed run
+    assert scheduler.costs.estimate(failing) == QueueScheduler().costs.estimate(failing)
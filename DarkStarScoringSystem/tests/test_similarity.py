@@ -0,0 +1,91 @@
+"""Tests for the pHash and MinHash near-duplicate index."""
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from judge_worker.similarity import (  # noqa: E402
+    HammingIndex, SimilarityIndex, hamming, minhash_signature, signature_similarity
+)
+
+TEXT = ' '.join(f"word{i}" for i in range(200))
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+
+
+def test_hamming_index_matches_brute_force():
+    rng = random.Random(7)
+    index = HammingIndex(max_distance=8)
+    values = {f"k{i}": rng.getrandbits(64) for i in range(300)}
+    base = values['k0']
+    values['near'] = flip(base, [0, 17, 33, 50, 63])
+    values['edge'] = flip(base, range(0, 64, 8))
+    for key, value in values.items():
+        index.add(value, key)
+    expected = sorted((hamming(base, v), k) for k, v in values.items() if hamming(base, v) <= 8)
+    assert index.search(base) == expected
+    assert (5, 'near') in expected and (8, 'edge') in expected
+    assert index.search(base, max_distance=5) == [(d, k) for d, k in expected if d <= 5]
+
+
+def test_hamming_index_remove():
+    index = HammingIndex()
+    index.add(42, 'a')
+    index.add(42, 'b')
+    index.remove(42, 'a')
+    assert index.search(42) == [(0, 'b')]
+
+
+def test_minhash_estimates_jaccard():
+    assert minhash_signature('too short') is None
+    a = minhash_signature(TEXT)
+    assert signature_similarity(a, minhash_signature(TEXT.upper())) == 1.0
+    other = ' '.join(f"other{i}" for i in range(200))
+    assert signature_similarity(a, minhash_signature(other)) < 0.1
+    half = ' '.join(TEXT.split()[:100] + other.split()[:100])
+    # 98 shared of 298 distinct shingles
+    assert 0.2 < signature_similarity(a, minhash_signature(half)) < 0.45
+
+
+def fingerprint(phash, text=TEXT):
+    return {'phash': f"{phash:016x}", 'minhash': minhash_signature(text).tolist()}
+
+
+def test_query_finds_visual_and_text_matches():
+    index = SimilarityIndex()
+    index.add('a', 'https://a.example', fingerprint(0x0F0F0F0F0F0F0F0F))
+    index.add('b', 'https://b.example', fingerprint(0x1234, 'unrelated copy ' * 20))
+    matches = index.query(fingerprint(0x0F0F0F0F0F0F0F0E))
+    assert [m['submissionId'] for m in matches] == ['a']
+    assert matches[0]['phashDistance'] == 1
+    assert matches[0]['textSimilarity'] == 1.0
+    assert index.query(fingerprint(0x0F0F0F0F0F0F0F0F), exclude=('a',)) == []
+    assert SimilarityIndex.is_exact(index.query(fingerprint(0x0F0F0F0F0F0F0F0F))[0])
+
+
+def test_readd_replaces_record_and_compacts(tmp_path):
+    path = tmp_path / 'index.jsonl'
+    index = SimilarityIndex(path)
+    index.add('a', 'https://a.example', fingerprint(0xAAAA))
+    index.add('a', 'https://a.example', fingerprint(0x5555))
+    assert len(index) == 1
+    assert index.query(fingerprint(0xAAAA), limit=5)[0].get('phashDistance') is None
+    assert index.query(fingerprint(0x5555))[0]['phashDistance'] == 0
+    # One superseded line against one live record: still appended
+    assert len(path.read_text().splitlines()) == 2
+    index.add('a', 'https://a.example', fingerprint(0x5555))
+    assert len(path.read_text().splitlines()) == 1
+
+    reloaded = SimilarityIndex(path)
+    assert len(reloaded) == 1
+    assert reloaded.get('a')['phash'] == f"{0x5555:016x}"